@@ -1,9 +1,11 @@
 import os
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, Response
 from typing import List, Optional, Dict, Any, Literal
+from urllib.parse import unquote
 import json
 from datetime import datetime
 from pydantic import BaseModel, Field
@@ -12,10 +14,27 @@ import asyncio
 # Get a logger for this module
 logger = logging.getLogger(__name__)
 
+from api.client_pool import close_clients
+from api.data_pipeline import shutdown_ingestion_pool
+from api.executors import shutdown_executors
+from api.index_jobs import shutdown_index_job_queue
+from api.query_embedder import shutdown_query_embedding_batcher
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop background indexing and release pooled connections, worker threads and processes
+    shutdown_index_job_queue()
+    shutdown_ingestion_pool()
+    shutdown_query_embedding_batcher()
+    await close_clients()
+    shutdown_executors()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Streaming API",
-    description="API for streaming chat completions"
+    description="API for streaming chat completions",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -87,6 +106,17 @@ class WikiExportRequest(BaseModel):
     pages: List[WikiPage] = Field(..., description="List of wiki pages to export")
     format: Literal["markdown", "json"] = Field(..., description="Export format (markdown or json)")
 
+class IndexRequest(BaseModel):
+    """
+    Model for requesting a background indexing job.
+    """
+    repo_url: str = Field(..., description="URL or local path of the repository to index")
+    type: Optional[str] = Field("github", description="Type of repository (e.g., 'github', 'gitlab', 'bitbucket')")
+    token: Optional[str] = Field(None, description="Personal access token for private repositories")
+    ref: Optional[str] = Field(None, description="Branch, tag or commit to index (defaults to the remote HEAD)")
+    excluded_dirs: Optional[str] = Field(None, description="Newline-separated list of directories to exclude from processing")
+    excluded_files: Optional[str] = Field(None, description="Newline-separated list of file patterns to exclude from processing")
+
 # --- Model Configuration Models ---
 class Model(BaseModel):
     """
@@ -331,6 +361,61 @@ from api.simple_chat import chat_completions_stream
 # Add the chat_completions_stream endpoint to the main app
 app.add_api_route("/chat/completions/stream", chat_completions_stream, methods=["POST"])
 
+# --- Indexing Job Endpoints ---
+
+from api.index_jobs import get_index_job_queue
+
+@app.post("/api/index", status_code=202)
+async def create_index_job(request: IndexRequest):
+    """
+    Enqueue a repository for background indexing, or return the job already indexing it.
+    """
+    excluded_dirs = [unquote(d) for d in request.excluded_dirs.split('\n') if d.strip()] if request.excluded_dirs else None
+    excluded_files = [unquote(f) for f in request.excluded_files.split('\n') if f.strip()] if request.excluded_files else None
+    job = get_index_job_queue().submit(
+        request.repo_url, request.type, request.token, request.ref, excluded_dirs, excluded_files
+    )
+    return job.to_dict()
+
+@app.get("/api/index/{job_id}")
+async def get_index_job(job_id: str):
+    """
+    Get the status and per-stage progress of an indexing job.
+    """
+    job = get_index_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Indexing job not found")
+    return job.to_dict()
+
+@app.delete("/api/index/{job_id}")
+async def cancel_index_job(job_id: str):
+    """
+    Cancel a queued or running indexing job.
+    """
+    job = get_index_job_queue().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Indexing job not found")
+    return job.to_dict()
+
+# --- Cache Statistics Endpoint ---
+
+from api.embedding_cache import get_embedding_cache
+from api.query_cache import get_query_embedding_cache, get_query_result_cache
+from api.retriever_registry import get_retriever_registry
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Get the size and hit rate of the query, retrieval and embedding caches.
+    """
+    embedding_cache = get_embedding_cache()
+    return {
+        "query_embeddings": get_query_embedding_cache().stats(),
+        "query_results": get_query_result_cache().stats(),
+        "retrievers": get_retriever_registry().stats(),
+        "chunk_embeddings": await asyncio.to_thread(embedding_cache.stats) if embedding_cache else None,
+    }
+
 # --- Wiki Cache Helper Functions ---
 
 WIKI_CACHE_DIR = os.path.join(get_adalflow_default_root_path(), "wikicache")
@@ -453,6 +538,12 @@ async def root():
             "Chat": [
                 "POST /chat/completions/stream - Streaming chat completion",
             ],
+            "Indexing": [
+                "POST /api/index - Start indexing a repository in the background",
+                "GET /api/index/{job_id} - Get indexing progress",
+                "DELETE /api/index/{job_id} - Cancel an indexing job",
+                "GET /api/cache/stats - Get query, retrieval and embedding cache hit rates",
+            ],
             "Wiki": [
                 "POST /export/wiki - Export wiki content as Markdown or JSON",
                 "GET /api/wiki_cache - Retrieve cached wiki data",
@@ -0,0 +1,324 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from adalflow.core.model_client import ModelClient
+from adalflow.core.types import ModelType
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from api.client_pool import close_async_clients
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Transport errors, timeouts, 5xx and 429 responses, after which a batch is sent again; anything
+# else, such as a malformed request, fails the job at once
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+def run_coroutine_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+
+    When the calling thread already runs an event loop, e.g. a FastAPI handler,
+    the coroutine runs on a fresh loop in a helper thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Read the delay requested by the server from the `retry-after-ms` or `retry-after` header.
+
+    Args:
+        error (Exception): The error raised by the API client.
+
+    Returns:
+        Optional[float]: The delay in seconds, or None if the server did not send one.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """
+    Token bucket limiter for requests per minute and tokens per minute.
+
+    Each bucket refills continuously and holds at most one minute of allowance.
+    `pause` blocks every caller until a server-requested delay has passed. One limiter
+    can be shared by callers on different threads and event loops, see `get_rate_limiter`.
+
+    Args:
+        requests_per_minute (int, optional): Request limit; None disables it.
+        tokens_per_minute (int, optional): Token limit; None disables it.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Consume one request of `tokens` tokens if it fits, otherwise return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            # A single request larger than the whole budget waits for a full bucket
+            needed_tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+            wait = 0.0
+            if self.requests_per_minute and self._requests < 1:
+                wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+            if needed_tokens and self._tokens < needed_tokens:
+                wait = max(wait, (needed_tokens - self._tokens) * 60 / self.tokens_per_minute)
+            if wait <= 0:
+                if self.requests_per_minute:
+                    self._requests -= 1
+                self._tokens -= needed_tokens
+            return wait
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until one request of `tokens` tokens fits in both budgets, then consume it."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for `seconds`, e.g. after a 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+_rate_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(base_url: str, api_key: str, requests_per_minute: Optional[int] = None,
+                     tokens_per_minute: Optional[int] = None) -> RateLimiter:
+    """
+    Get the process-wide rate limiter for an endpoint and key.
+
+    Provider limits apply per key, so every job embedding with the same key, e.g.
+    concurrent indexing jobs of different repositories, shares one budget.
+
+    Args:
+        base_url (str): The API base URL.
+        api_key (str): The API key.
+        requests_per_minute (int, optional): Request limit; None disables it.
+        tokens_per_minute (int, optional): Token limit; None disables it.
+
+    Returns:
+        RateLimiter: The shared limiter, created on first use; its limits follow the latest call.
+    """
+    key = (base_url, api_key)
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = _rate_limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+        else:
+            limiter.requests_per_minute = requests_per_minute
+            limiter.tokens_per_minute = tokens_per_minute
+        return limiter
+
+class AsyncBatchEmbedder:
+    """
+    Embed many texts with concurrent `acall` requests.
+
+    Texts are packed into batches by token count, see `make_batches`. Batches
+    are sent with at most `max_in_flight` requests outstanding and within
+    the request and token rate limits, which are shared with every other embedder
+    using the same endpoint and key. A failed batch is retried on its own, after
+    the server's Retry-After delay when one is given, so one error does not restart
+    the whole job. Vectors are returned in input order.
+
+    Args:
+        model_client (ModelClient): The client, e.g. `OpenAIClient`.
+        model_kwargs (Dict): Embedding arguments such as model and dimensions.
+        batch_size (int): Maximum number of texts per request.
+        max_tokens_per_batch (int, optional): Maximum number of tokens per request.
+        max_in_flight (int): Maximum number of concurrent requests.
+        requests_per_minute (int, optional): Request rate limit.
+        tokens_per_minute (int, optional): Token rate limit.
+        max_retries (int): Retries per batch before the job fails.
+    """
+
+    def __init__(self, model_client: ModelClient, model_kwargs: Dict[str, Any], batch_size: int = 500,
+                 max_tokens_per_batch: Optional[int] = None, max_in_flight: int = 4,
+                 requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 max_retries: int = 5):
+        self.model_client = model_client
+        self.model_kwargs = model_kwargs
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_in_flight = max_in_flight
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+
+    def make_batches(self, token_counts: Sequence[int]) -> List[List[int]]:
+        """
+        Pack text indices into request batches.
+
+        Consecutive texts are added to a batch until the next one would exceed
+        `max_tokens_per_batch` tokens or `batch_size` texts. A text larger than the
+        token ceiling is sent on its own.
+
+        Args:
+            token_counts (Sequence[int]): Token count of each text.
+
+        Returns:
+            List[List[int]]: The text indices of each batch.
+        """
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for i, tokens in enumerate(token_counts):
+            if current and (len(current) >= self.batch_size
+                            or (self.max_tokens_per_batch and current_tokens + tokens > self.max_tokens_per_batch)):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+
+        if batches:
+            total_tokens = sum(token_counts)
+            message = (f"Packed {len(token_counts)} texts ({total_tokens} tokens) into {len(batches)} batches, "
+                       f"{len(token_counts) / len(batches):.1f} texts per batch")
+            if self.max_tokens_per_batch:
+                efficiency = total_tokens / (len(batches) * self.max_tokens_per_batch)
+                message += f", {efficiency:.1%} of the token ceiling used"
+            logger.info(message)
+        return batches
+
+    def _get_limiter(self) -> RateLimiter:
+        # Resolved like `OpenAIClient.init_async_client`; clients without an endpoint and key
+        # of their own are limited per call
+        base_url = getattr(self.model_client, "base_url", None)
+        api_key = getattr(self.model_client, "_api_key", None) or os.getenv(
+            getattr(self.model_client, "_env_api_key_name", "OPENAI_API_KEY"))
+        if not (base_url and api_key):
+            return RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+        return get_rate_limiter(base_url, api_key, self.requests_per_minute, self.tokens_per_minute)
+
+    async def _embed_batch(self, texts: List[str], tokens: int, limiter: RateLimiter,
+                           semaphore: asyncio.Semaphore) -> List[List[float]]:
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire(tokens)
+                try:
+                    api_kwargs = self.model_client.convert_inputs_to_api_kwargs(
+                        input=texts, model_kwargs=self.model_kwargs, model_type=ModelType.EMBEDDER
+                    )
+                    response = await self.model_client.acall(api_kwargs=api_kwargs, model_type=ModelType.EMBEDDER)
+                    output = self.model_client.parse_embedding_response(response)
+                    if output.error:
+                        raise ValueError(f"Invalid embedding response: {output.error}")
+                    if len(output.data) != len(texts):
+                        raise ValueError(f"Got {len(output.data)} embeddings for {len(texts)} texts")
+                    # The API reports each embedding's position in the request
+                    return [item.embedding for item in sorted(output.data, key=lambda item: item.index)]
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = get_retry_after(e)
+                    if delay is not None:
+                        limiter.pause(delay)
+                    else:
+                        delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+                    logger.warning(f"Embedding batch of {len(texts)} texts failed ({e}), "
+                                   f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    async def aembed(self, texts: Sequence[str], token_counts: Optional[Sequence[int]] = None,
+                     on_batch: Optional[Callable[[List[int], List[List[float]]], None]] = None) -> List[List[float]]:
+        """
+        Embed texts concurrently.
+
+        Args:
+            texts (Sequence[str]): The texts to embed.
+            token_counts (Sequence[int], optional): Token count of each text, used for batch
+                packing and the token rate limit. Estimated from the text length if omitted.
+            on_batch (Callable, optional): Called with the text indices and vectors of every
+                finished batch, e.g. to persist progress.
+
+        Returns:
+            List[List[float]]: The vector of each text, in input order.
+        """
+        if token_counts is None:
+            token_counts = [len(text) // 4 for text in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        limiter = self._get_limiter()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def run_batch(batch: List[int]) -> None:
+            batch_vectors = await self._embed_batch(
+                [texts[i] for i in batch], sum(token_counts[i] for i in batch), limiter, semaphore
+            )
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+            if on_batch is not None:
+                on_batch(batch, batch_vectors)
+
+        batches = self.make_batches(token_counts)
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(run_batch(batch)) for batch in batches]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        logger.info(f"Embedded {len(texts)} texts in {len(batches)} batches "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return vectors
+
+    def embed(self, texts: Sequence[str], token_counts: Optional[Sequence[int]] = None,
+              on_batch: Optional[Callable[[List[int], List[List[float]]], None]] = None) -> List[List[float]]:
+        """Synchronous wrapper around `aembed`."""
+        async def run():
+            try:
+                return await self.aembed(texts, token_counts, on_batch)
+            finally:
+                # The pooled async clients are bound to this short-lived event loop
+                await close_async_clients()
+
+        return run_coroutine_sync(run())
@@ -0,0 +1 @@
+# Benchmark scripts for the api package
@@ -0,0 +1,111 @@
+"""Measure time to first byte of streaming chat for an indexed repository, idle and during a large index build.
+
+The API server runs in-process under uvicorn; embeddings and chat completions are
+answered by the local fake OpenAI server, so the numbers show the server's own
+overhead. The repositories are synthetic local directories.
+
+Usage: python -m api.benchmarks.chat_ttfb [requests] [concurrency] [large_repo_files]
+"""
+import os
+import sys
+import time
+import uuid
+import shutil
+import asyncio
+import tempfile
+import threading
+
+from api.benchmarks.mock_openai import start_mock_server
+
+def write_repo(root, num_files, run_id):
+    os.makedirs(root, exist_ok=True)
+    for i in range(num_files):
+        functions = "\n\n".join(f"def handler_{i}_{j}(request):\n    \"\"\"Handle {run_id} request {j}.\"\"\"\n"
+                                f"    return request.get('value_{j}', {i * j})" for j in range(40))
+        with open(os.path.join(root, f"module_{i}.py"), "w") as f:
+            f.write(functions)
+
+def start_api_server():
+    import uvicorn
+    from api.api import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+async def index(client, repo_path, wait=True):
+    response = await client.post("/api/index", json={"repo_url": repo_path, "type": "local"})
+    job = response.json()
+    while wait and job["status"] in ("queued", "running"):
+        await asyncio.sleep(0.1)
+        job = (await client.get(f"/api/index/{job['job_id']}")).json()
+    return job
+
+async def time_to_first_byte(client, repo_path):
+    body = {"repo_url": repo_path, "type": "local", "provider": "openai", "model": "gpt-4o",
+            "messages": [{"role": "user", "content": "What does handler_1_2 return?"}]}
+    start = time.perf_counter()
+    async with client.stream("POST", "/chat/completions/stream", json=body) as response:
+        chunks = response.aiter_bytes()
+        await anext(chunks)
+        ttfb = time.perf_counter() - start
+        async for _ in chunks:
+            pass
+    return ttfb
+
+async def measure(client, repo_path, num_requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await time_to_first_byte(client, repo_path)
+
+    samples = sorted(await asyncio.gather(*(one() for _ in range(num_requests))))
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+async def main(num_requests, concurrency, large_repo_files):
+    import httpx
+
+    run_id = uuid.uuid4().hex[:8]
+    workdir = tempfile.mkdtemp(prefix="chat-ttfb-")
+    small_repo = os.path.join(workdir, f"small-{run_id}")
+    large_repo = os.path.join(workdir, f"large-{run_id}")
+    write_repo(small_repo, 5, run_id)
+    write_repo(large_repo, large_repo_files, run_id)
+
+    server, base_url = start_api_server()
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+            job = await index(client, small_repo)
+            print(f"small repo indexed: {job['status']}, {job['document_count']} chunks")
+            await measure(client, small_repo, concurrency, concurrency)  # warm up
+
+            p50, p99 = await measure(client, small_repo, num_requests, concurrency)
+            print(f"idle:            p50 {p50 * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms")
+
+            job = await index(client, large_repo, wait=False)
+            p50, p99 = await measure(client, small_repo, num_requests, concurrency)
+            job = (await client.get(f"/api/index/{job['job_id']}")).json()
+            embedded = job["stages"]["chunks_embedded"]
+            print(f"during indexing: p50 {p50 * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms   "
+                  f"(large repo {job['status']}, {embedded['count']}/{embedded['total']} chunks embedded)")
+            await client.delete(f"/api/index/{job['job_id']}")
+    finally:
+        server.should_exit = True
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    large_repo_files = int(sys.argv[3]) if len(sys.argv) > 3 else 400
+
+    mock_server, mock_base_url = start_mock_server(latency=0.05, first_token_latency=0.02)
+    # Must be set before the API modules create their clients
+    os.environ["OPENAI_API_BASE"] = mock_base_url
+    os.environ["OPENAI_API_KEY"] = "fake"
+    asyncio.run(main(num_requests, concurrency, large_repo_files))
+    mock_server.shutdown()
@@ -0,0 +1,96 @@
+"""Compare opening a repository database pickled as a `LocalDB` with opening it as a chunk store.
+
+Synthetic files and chunks with random vectors are written both ways; each database is then
+opened in a fresh process, which reports the load time and the resident memory it added,
+before and after reading a few chunks as a query would.
+
+Usage: python -m api.benchmarks.chunk_store [chunks] [dimensions] [float32|float16]
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import tempfile
+import subprocess
+
+import numpy as np
+from adalflow.core.db import LocalDB
+from adalflow.core.types import Document
+
+from api.chunk_store import ChunkStore
+
+CHUNKS_PER_FILE = 10
+READS = 20
+
+def make_database(num_chunks, dimensions):
+    rng = np.random.default_rng(0)
+    documents, chunks = [], []
+    for f in range(max(1, num_chunks // CHUNKS_PER_FILE)):
+        meta_data = {"file_path": f"pkg/module_{f}.py", "type": "py", "is_code": True,
+                     "is_implementation": True, "title": f"pkg/module_{f}.py", "token_count": 3000}
+        parts = [f"def handler_{f}_{i}(request):\n    return request.get('value_{i}')\n" * 20
+                 for i in range(CHUNKS_PER_FILE)]
+        doc = Document(text="".join(parts), meta_data=meta_data, id=str(uuid.uuid4()), estimated_num_tokens=3000)
+        documents.append(doc)
+        for i, part in enumerate(parts):
+            # Embedders return vectors as lists of Python floats
+            chunks.append(Document(text=part, meta_data=dict(meta_data), id=str(uuid.uuid4()), order=i,
+                                   parent_doc_id=doc.id, estimated_num_tokens=300,
+                                   vector=rng.standard_normal(dimensions).astype(np.float32).tolist()))
+    return documents, chunks
+
+def resident_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def measure(kind, path):
+    """Open one database in this process and print load seconds and resident KB added."""
+    before = resident_kb()
+    start = time.perf_counter()
+    if kind == "pickle":
+        chunks = LocalDB.load_state(path).get_transformed_data(key="split_and_embed")
+    else:
+        chunks = ChunkStore(path)
+    load_seconds = time.perf_counter() - start
+    loaded = resident_kb()
+    for i in random.Random(0).sample(range(len(chunks)), min(READS, len(chunks))):
+        chunks[i].text
+    print(load_seconds, loaded - before, resident_kb() - before)
+
+def run(kind, path):
+    output = subprocess.run([sys.executable, "-m", "api.benchmarks.chunk_store", "--measure", kind, path],
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[-3]), int(output[-2]), int(output[-1])
+
+def disk_bytes(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    vector_dtype = sys.argv[3] if len(sys.argv) > 3 else "float32"
+
+    documents, chunks = make_database(num_chunks, dimensions)
+    with tempfile.TemporaryDirectory() as root:
+        pickle_path = os.path.join(root, "repo.pkl")
+        store_path = os.path.join(root, "repo.store")
+        db = LocalDB()
+        db.load(documents)
+        db.transformed_items["split_and_embed"] = chunks
+        db.save_state(filepath=pickle_path)
+        ChunkStore.write(store_path, documents, chunks, vector_dtype)
+
+        print(f"{len(chunks)} chunks of {len(documents)} files, {dimensions} dimensions, {vector_dtype} store")
+        for name, kind, path in (("pickle", "pickle", pickle_path), ("chunk store", "store", store_path)):
+            load_seconds, loaded_kb, read_kb = run(kind, path)
+            print(f"{name:<12} {disk_bytes(path) / 2**20:8.1f} MB on disk   load {load_seconds * 1000:8.1f} ms   "
+                  f"resident +{loaded_kb / 1024:7.1f} MB after load, +{read_kb / 1024:7.1f} MB after {READS} reads")
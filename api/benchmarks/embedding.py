@@ -0,0 +1,53 @@
+"""Compare sequential batch embedding with the concurrent async embedder.
+
+Both run against a local fake OpenAI-compatible embedding server that answers
+after a fixed latency and rejects a share of requests with 429 and Retry-After.
+
+Usage: python -m api.benchmarks.embedding [num_texts] [latency_ms] [error_rate]
+"""
+import sys
+import time
+
+import adalflow as adal
+from adalflow.core.embedder import BatchEmbedder
+
+from api.async_embedder import AsyncBatchEmbedder
+from api.benchmarks.mock_openai import fake_vector, start_mock_server
+from api.openai_client import OpenAIClient
+
+DIMENSIONS = 8
+
+def run_sequential(client, model_kwargs, texts, batch_size):
+    embedder = BatchEmbedder(embedder=adal.Embedder(model_client=client, model_kwargs=model_kwargs),
+                             batch_size=batch_size)
+    outputs = embedder(input=texts)
+    return [item.embedding for output in outputs for item in output.data]
+
+def run_async(client, model_kwargs, texts, batch_size, max_in_flight):
+    embedder = AsyncBatchEmbedder(client, model_kwargs, batch_size=batch_size, max_in_flight=max_in_flight,
+                                  requests_per_minute=100000, tokens_per_minute=100000000)
+    return embedder.embed(texts)
+
+if __name__ == "__main__":
+    num_texts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    error_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    batch_size = 100
+
+    server, base_url = start_mock_server(latency=latency, error_rate=error_rate)
+    model_kwargs = {"model": "text-embedding-3-small", "dimensions": DIMENSIONS, "encoding_format": "float"}
+    texts = [f"def function_{i}():\n    return {i}\n" for i in range(num_texts)]
+    expected = [fake_vector(text, DIMENSIONS) for text in texts]
+
+    print(f"{num_texts} texts, batch size {batch_size}, {latency * 1000:.0f} ms latency, "
+          f"{error_rate:.0%} rate-limited requests")
+    if error_rate == 0:
+        start = time.perf_counter()
+        vectors = run_sequential(OpenAIClient(api_key="fake", base_url=base_url), model_kwargs, texts, batch_size)
+        print(f"sequential:        {time.perf_counter() - start:.2f}s, ordered: {vectors == expected}")
+    for max_in_flight in (1, 4, 8, 16):
+        start = time.perf_counter()
+        vectors = run_async(OpenAIClient(api_key="fake", base_url=base_url), model_kwargs, texts,
+                            batch_size, max_in_flight)
+        print(f"async x{max_in_flight:<2}         {time.perf_counter() - start:.2f}s, ordered: {vectors == expected}")
+    server.shutdown()
@@ -0,0 +1,81 @@
+"""Compare `ExactRetriever` with the FAISS retrievers on setup time and query latency at several corpus sizes.
+
+Setup is what a request pays when the retriever is not cached: FAISSRetriever builds its
+flat index from document vectors, PrebuiltFAISSRetriever opens the index saved at indexing
+time, ExactRetriever normalizes the vectors of the chunk store into a matrix. Queries are
+given as vectors, so the embedding call is left out; batches search many at once.
+
+Usage: python -m api.benchmarks.exact_search [dimensions] [top_k] [sizes...]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+from adalflow.components.retriever.faiss_retriever import FAISSRetriever
+from adalflow.core.types import Document
+
+from api.chunk_store import ChunkStore, document_vectors
+from api.exact_retriever import ExactRetriever
+from api.vector_index import PrebuiltFAISSRetriever, load_index, save_index
+
+QUERIES = 200
+BATCH = 32
+
+def make_store(root, count, dimensions, rng):
+    """Write a chunk store and its FAISS index; returns the store and the index path."""
+    vectors = rng.standard_normal((count, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    meta_data = {"file_path": "module.py"}
+    documents = [Document(text="", meta_data=meta_data, id="file", estimated_num_tokens=0)]
+    chunks = [Document(text="", meta_data=meta_data, vector=vector, id=f"{i:036d}", order=i,
+                       parent_doc_id="file", estimated_num_tokens=0) for i, vector in enumerate(vectors)]
+    store_path = os.path.join(root, f"repo{count}.store")
+    index_path = os.path.join(root, f"repo{count}.faiss")
+    ChunkStore.write(store_path, documents, chunks)
+    save_index(chunks, index_path)
+    return ChunkStore(store_path), index_path
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def query_latency(retriever, queries, top_k):
+    """Median seconds of a single-query search, and seconds per query in batches."""
+    latencies = sorted(timed(lambda: retriever.retrieve_embedding_queries(query[None, :], top_k))[1]
+                       for query in queries)
+    _, batched = timed(lambda: [retriever.retrieve_embedding_queries(queries[i:i + BATCH], top_k)
+                                for i in range(0, len(queries), BATCH)])
+    return latencies[len(latencies) // 2], batched / len(queries)
+
+if __name__ == "__main__":
+    dimensions = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    top_k = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sizes = [int(size) for size in sys.argv[3:]] or [1000, 5000, 20000, 50000]
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((QUERIES, dimensions)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"{dimensions} dimensions, top {top_k}, {QUERIES} queries, batches of {BATCH}")
+    print(f"{'chunks':>8} {'retriever':<22}{'setup ms':>10}{'query ms':>10}{'batched ms/query':>18}  same results")
+    with tempfile.TemporaryDirectory() as root:
+        for size in sizes:
+            store, index_path = make_store(root, size, dimensions, rng)
+            faiss_retriever = FAISSRetriever(top_k=top_k)
+            _, faiss_setup = timed(lambda: faiss_retriever.build_index_from_documents(document_vectors(store)))
+            prebuilt, prebuilt_setup = timed(lambda: PrebuiltFAISSRetriever(load_index(index_path), top_k=top_k))
+            candidates = [("FAISSRetriever", faiss_retriever, faiss_setup),
+                          ("PrebuiltFAISSRetriever", prebuilt, prebuilt_setup)]
+            for dtype in ("float32", "float16"):
+                retriever, setup = timed(lambda: ExactRetriever(store, top_k=top_k, dtype=dtype))
+                candidates.append((f"Exact {dtype}", retriever, setup))
+
+            expected = [output.doc_indices for output in faiss_retriever.retrieve_embedding_queries(queries, top_k)]
+            for name, retriever, setup in candidates:
+                single, batched = query_latency(retriever, queries, top_k)
+                found = [output.doc_indices for output in retriever.retrieve_embedding_queries(queries, top_k)]
+                same = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(found, expected)])
+                print(f"{size:>8} {name:<22}{setup * 1000:10.1f}{single * 1000:10.3f}{batched * 1000:18.3f}  {same:.3f}")
@@ -0,0 +1,82 @@
+"""Measure the symbol index: build time, size on disk, and the latency of file-focused lookups.
+
+The synthetic repository is a Python package whose modules each define a few functions
+and import names from a few other modules, so every file has imports and importers. The
+index is built twice, the second time reusing the symbols of unchanged files as a
+rebuild after a small change does. Lookups give a file's imported definitions and its
+importers' usages by chunk id, where the chat handler used to embed "Contexts related
+to <path>" and search for it.
+
+Usage: python -m api.benchmarks.file_lookup [files] [imports_per_file] [lookups]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+from adalflow.core.types import Document
+
+from api.chunk_store import ChunkStore
+from api.retrieval_filters import FilterIndex
+from api.symbol_index import load_symbol_index, save_symbol_index
+
+FUNCTIONS_PER_FILE = 6
+
+def module_text(i, imports):
+    lines = [f"from pkg.mod{j} import func_{j}_0, func_{j}_1" for j in imports]
+    for k in range(FUNCTIONS_PER_FILE):
+        calls = " + ".join(f"func_{j}_{k % 2}()" for j in imports) or "0"
+        lines.append(f"\n\ndef func_{i}_{k}():\n    \"\"\"Function {k} of module {i}.\"\"\"\n    return {calls}")
+    return "\n".join(lines) + "\n"
+
+def write_store(path, num_files, imports_per_file, rng):
+    """Write the modules as files with one chunk per function, and open the store."""
+    documents, chunks = [], []
+    for i in range(num_files):
+        imports = sorted(set(rng.integers(0, num_files, imports_per_file).tolist()) - {i})
+        text = module_text(i, imports)
+        meta_data = {"file_path": f"pkg/mod{i}.py", "type": "py", "is_code": True, "title": f"mod{i}.py"}
+        documents.append(Document(text=text, meta_data=meta_data, id=f"file{i}", estimated_num_tokens=0))
+        for order, part in enumerate(text.split("\n\n\n")):
+            chunks.append(Document(text=part, meta_data=meta_data, vector=np.zeros(8, dtype=np.float32),
+                                   id=f"{len(chunks):036d}", order=order, parent_doc_id=f"file{i}",
+                                   estimated_num_tokens=0))
+    ChunkStore.write(path, documents, chunks)
+    return ChunkStore(path)
+
+if __name__ == "__main__":
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    imports_per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    num_lookups = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as root:
+        store = write_store(os.path.join(root, "repo.store"), num_files, imports_per_file, rng)
+        index_path = os.path.join(root, "repo.symbols.json")
+        print(f"{num_files} files, {len(store)} chunks, up to {imports_per_file} imports per file")
+
+        for label in ("build", "rebuild, files unchanged"):
+            start = time.perf_counter()
+            save_symbol_index(store, index_path)
+            print(f"{label:<28}{(time.perf_counter() - start) * 1000:10.1f} ms")
+        start = time.perf_counter()
+        index = load_symbol_index(index_path, expected_files=num_files)
+        load_ms = (time.perf_counter() - start) * 1000
+        print(f"{'load':<28}{load_ms:10.1f} ms, {os.path.getsize(index_path) / 2**20:.1f} MB, "
+              f"{index.num_edges} import edges")
+
+        filter_index = FilterIndex(store)
+        chunk_positions = store.chunk_ids
+        paths = [f"pkg/mod{i}.py" for i in rng.integers(0, num_files, num_lookups)]
+        timings, found = [], []
+        for path in paths:
+            start = time.perf_counter()
+            imports, importers = index.neighbours(path)
+            positions = filter_index.file_chunks(path).tolist()
+            for chunk_ids in list(imports.values()) + list(importers.values()):
+                positions.extend(chunk_positions[chunk_id] for chunk_id in chunk_ids)
+            timings.append(time.perf_counter() - start)
+            found.append(len(positions))
+        print(f"{'lookup p50':<28}{np.median(timings) * 1000:10.3f} ms, "
+              f"{np.mean(found):.1f} chunks per file, no embedding call")
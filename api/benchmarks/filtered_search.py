@@ -0,0 +1,116 @@
+"""Compare query latency with and without metadata filters, for each retriever the chat handler can use.
+
+The synthetic repository has packages of Python modules with tests and Markdown docs, so
+filters keep from most to few of the chunks. Each row gives the chunks a filter allows,
+the time to resolve it to chunk positions the first time (later queries hit the filter
+index cache), and the median single-query latency of each retriever; the first row is
+the unfiltered search. Results are checked to contain only allowed chunks, and the lowest
+recall@k of the FAISS retrievers is given against exact search of the allowed chunks.
+
+Usage: python -m api.benchmarks.filtered_search [chunks] [dimensions] [queries] [top_k]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+from adalflow.core.types import Document
+
+from api.benchmarks.vector_index import CLUSTERS, make_vectors, recall, search_each
+from api.chunk_store import ChunkStore
+from api.exact_retriever import ExactRetriever
+from api.retrieval_filters import FilterIndex, RetrievalFilters
+from api.vector_index import PrebuiltFAISSRetriever, build_index, get_index_config
+
+PACKAGES = 20
+FILES_PER_PACKAGE = 50
+
+def file_table():
+    """Paths and metadata of the synthetic files: per package, modules, their tests and a few docs."""
+    files = []
+    for package in range(PACKAGES):
+        for j in range(FILES_PER_PACKAGE):
+            if j % 10 == 9:
+                path, is_code = f"pkg{package}/docs/page{j}.md", False
+            elif j % 5 == 4:
+                path, is_code = f"pkg{package}/tests/test_module{j}.py", True
+            else:
+                path, is_code = f"pkg{package}/module{j}.py", True
+            files.append({"file_path": path, "type": path.rsplit(".", 1)[1], "is_code": is_code,
+                          "is_implementation": is_code and "test" not in path, "title": path})
+    return files
+
+def write_store(path, vectors, rng):
+    """Write vectors as the chunks of random files, stored file by file as ingestion does, and open the store."""
+    files = file_table()
+    documents = [Document(text="", meta_data=meta_data, id=f"file{j}", estimated_num_tokens=0)
+                 for j, meta_data in enumerate(files)]
+    owners = np.sort(rng.integers(0, len(files), len(vectors)))
+    chunks = [Document(text="", meta_data=files[owner], vector=vector, id=f"{i:036d}", order=i,
+                       parent_doc_id=f"file{owner}", estimated_num_tokens=0)
+              for i, (vector, owner) in enumerate(zip(vectors, owners))]
+    ChunkStore.write(path, documents, chunks)
+    return ChunkStore(path)
+
+class Filtered:
+    """Adapts a retriever to `search_each` with a fixed set of allowed chunks."""
+
+    def __init__(self, retriever, allowed):
+        self.retriever = retriever
+        self.allowed = allowed
+
+    def retrieve_embedding_queries(self, queries, top_k):
+        return self.retriever.retrieve_embedding_queries(queries, top_k, allowed=self.allowed)
+
+if __name__ == "__main__":
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    num_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    top_k = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((CLUSTERS, dimensions)).astype(np.float32)
+    vectors = make_vectors(num_chunks, dimensions, centers, rng)
+    queries = make_vectors(num_queries, dimensions, centers, rng)
+    filter_exact_max_chunks = get_index_config().get("filter_exact_max_chunks", 4096)
+    filters = [("none", None),
+               ("exclude_tests", RetrievalFilters.create(exclude_tests=True)),
+               ("code_only, no tests", RetrievalFilters.create(code_only=True, exclude_tests=True)),
+               ("path_prefix pkg3/", RetrievalFilters.create(path_prefix="pkg3/")),
+               ("extensions md", RetrievalFilters.create(extensions="md")),
+               ("path_glob pkg3/module1*", RetrievalFilters.create(path_glob="pkg3/module1*"))]
+
+    print(f"{num_chunks} chunks, {dimensions} dimensions, {num_queries} queries, top {top_k}, "
+          f"filter_exact_max_chunks={filter_exact_max_chunks}; p50 ms per query")
+    with tempfile.TemporaryDirectory() as root:
+        store = write_store(os.path.join(root, "repo.store"), vectors, rng)
+        start = time.perf_counter()
+        filter_index = FilterIndex(store)
+        print(f"FilterIndex of {filter_index.num_files} files built in {(time.perf_counter() - start) * 1000:.1f} ms")
+        retrievers = [("exact", ExactRetriever(store, top_k=top_k))]
+        for index_type in ("flat", "hnsw", "sq8"):
+            retrievers.append((index_type, PrebuiltFAISSRetriever(
+                build_index(store, index_type=index_type), top_k=top_k, documents=store,
+                rescore_factor=get_index_config().get("rescore_factor", 4),
+                filter_exact_max_chunks=filter_exact_max_chunks)))
+
+        print(f"{'filter':<26}{'chunks':>9}{'resolve ms':>12}" + "".join(f"{name:>10}" for name, _ in retrievers)
+              + f"{'recall':>8}")
+        for label, retrieval_filters in filters:
+            start = time.perf_counter()
+            allowed = filter_index.allowed_chunks(retrieval_filters)
+            resolve_ms = (time.perf_counter() - start) * 1000
+            row = f"{label:<26}{num_chunks if allowed is None else len(allowed):>9}{resolve_ms:12.2f}"
+            truth = None
+            recalls = []
+            for name, retriever in retrievers:
+                ids, p50, _ = search_each(Filtered(retriever, allowed), queries, top_k)
+                if allowed is not None:
+                    assert all(np.isin(found, allowed).all() for found in ids), f"{name} returned filtered-out chunks"
+                if truth is None:
+                    truth = ids
+                else:
+                    recalls.append(recall(ids, truth))
+                row += f"{p50 * 1000:10.3f}"
+            print(row + f"{min(recalls):8.3f}")
@@ -0,0 +1,70 @@
+"""Compare time to first token of streaming completions with a new client per request and with pooled clients.
+
+"new client" builds an `OpenAIClient` with its own `AsyncOpenAI` for every request, as the
+chat handler used to; "pooled" uses the shared clients of `api.client_pool`. Both run against
+the local fake OpenAI server.
+
+Usage: python -m api.benchmarks.llm_ttft [requests] [concurrency] [first_token_ms]
+"""
+import os
+import sys
+import time
+import asyncio
+
+from adalflow.core.types import ModelType
+from openai import AsyncOpenAI, OpenAI
+
+from api.benchmarks.mock_openai import start_mock_server
+from api.openai_client import OpenAIClient
+
+API_KWARGS = {"model": "gpt-4o", "stream": True, "messages": [{"role": "user", "content": "Hello"}]}
+
+async def first_token_new_client(base_url):
+    start = time.perf_counter()
+    client = OpenAIClient()
+    # What the client did before pooling: its own sync client and a fresh async client per instance
+    client.sync_client = OpenAI(api_key="fake", base_url=base_url)
+    async_client = AsyncOpenAI(api_key="fake", base_url=base_url)
+    stream = await async_client.chat.completions.create(**API_KWARGS)
+    await anext(stream)
+    ttft = time.perf_counter() - start
+    async for _ in stream:
+        pass
+    await async_client.close()
+    return ttft
+
+async def first_token_pooled(base_url):
+    start = time.perf_counter()
+    client = OpenAIClient()
+    stream = await client.acall(api_kwargs=API_KWARGS, model_type=ModelType.LLM)
+    await anext(stream)
+    ttft = time.perf_counter() - start
+    async for _ in stream:
+        pass
+    return ttft
+
+async def measure(first_token, base_url, num_requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await first_token(base_url)
+
+    samples = sorted(await asyncio.gather(*(one() for _ in range(num_requests))))
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+if __name__ == "__main__":
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    first_token_latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.02
+
+    server, base_url = start_mock_server(first_token_latency=first_token_latency, chunk_interval=0)
+    os.environ["OPENAI_API_BASE"] = base_url
+    os.environ["OPENAI_API_KEY"] = "fake"
+
+    print(f"{num_requests} streaming completions, concurrency {concurrency}, "
+          f"{first_token_latency * 1000:.0f} ms server time to first token")
+    for name, first_token in (("new client", first_token_new_client), ("pooled", first_token_pooled)):
+        p50, p99 = asyncio.run(measure(first_token, base_url, num_requests, concurrency))
+        print(f"{name:<11} p50 {p50 * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms")
+    server.shutdown()
@@ -0,0 +1,89 @@
+"""A local fake of the OpenAI embeddings and streaming chat completions endpoints for benchmarks.
+
+Embeddings are deterministic per text. Chat completions stream a fixed number of
+chunks after a configurable time to first token.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def fake_vector(text, dimensions=8):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [digest[i % len(digest)] / 255 for i in range(dimensions)]
+
+def make_handler(latency=0.05, error_rate=0.0, first_token_latency=0.05, chunk_interval=0.005, chunks=20):
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path.endswith("/embeddings"):
+                self.embeddings(body)
+            elif self.path.endswith("/chat/completions"):
+                self.chat_completions(body)
+            else:
+                self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def embeddings(self, body):
+            time.sleep(latency)
+            if random.random() < error_rate:
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                               {"Retry-After": "0.05"})
+                return
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            dimensions = body.get("dimensions") or 8
+            self.send_json(200, {
+                "object": "list",
+                "model": body["model"],
+                "data": [{"object": "embedding", "index": i, "embedding": fake_vector(text, dimensions)}
+                         for i, text in enumerate(inputs)],
+                "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+            })
+
+        def chat_completions(self, body):
+            time.sleep(first_token_latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(chunks):
+                event = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": body.get("model") or "mock",
+                         "choices": [{"index": 0, "delta": {"content": f"token{i} "}, "finish_reason": None}]}
+                self.write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+                time.sleep(chunk_interval)
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.write_chunk(b"")
+
+        def write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeOpenAIHandler
+
+def start_mock_server(**handler_options):
+    """Start the fake server on a free port in a daemon thread; returns (server, base_url)."""
+    class MockServer(ThreadingHTTPServer):
+        daemon_threads = True
+        # The default backlog of 5 drops concurrent connects, which then retry after a second
+        request_queue_size = 128
+
+    server = MockServer(("127.0.0.1", 0), make_handler(**handler_options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
@@ -0,0 +1,61 @@
+"""Report the memory per million chunks, recall and query latency of each way of storing vectors.
+
+Chunk store rows are searched exactly by `ExactRetriever` over their decoded vectors.
+FAISS rows search the index codes directly, then optionally re-score candidates by the
+float32 vectors of the chunk store, which stay memory-mapped on disk. Recall@k is measured
+against exact search of float32 vectors. Vectors are the synthetic clusters of
+`api.benchmarks.vector_index`.
+
+Usage: python -m api.benchmarks.quantization [chunks] [dimensions] [queries] [top_k]
+"""
+import os
+import sys
+import tempfile
+
+import faiss
+import numpy as np
+
+from api.benchmarks.vector_index import CLUSTERS, make_vectors, recall, search_each, write_store
+from api.exact_retriever import ExactRetriever
+from api.vector_index import PrebuiltFAISSRetriever, build_index, get_index_config
+
+def vector_bytes(store_path):
+    return sum(os.path.getsize(os.path.join(store_path, name)) for name in ("vectors.npy", "scales.npy")
+               if os.path.exists(os.path.join(store_path, name)))
+
+if __name__ == "__main__":
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    num_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    top_k = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+    rescore_factor = get_index_config().get("rescore_factor", 4)
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((CLUSTERS, dimensions)).astype(np.float32)
+    vectors = make_vectors(num_chunks, dimensions, centers, rng)
+    queries = make_vectors(num_queries, dimensions, centers, rng)
+    per_million = 1e6 / num_chunks
+
+    print(f"{num_chunks} chunks, {dimensions} dimensions, {num_queries} queries, recall@{top_k} against float32 exact search")
+    print(f"{'storage':<30}{'MB per 1M chunks':>18}{'recall':>8}{'p50 ms':>9}")
+    # A pickled Document.vector is a list of Python floats: 8 bytes per pointer and 24 per float
+    print(f"{'pickled float lists':<30}{dimensions * 32 * 1e6 / 2**20:18.0f}{'':>8}{'':>9}")
+    with tempfile.TemporaryDirectory() as root:
+        stores = {dtype: write_store(os.path.join(root, f"{dtype}.store"), vectors, dtype)
+                  for dtype in ("float32", "float16", "int8")}
+        truth = None
+        for dtype, store in stores.items():
+            ids, p50, _ = search_each(ExactRetriever(store, top_k=top_k, metric="cosine"), queries, top_k)
+            truth = ids if truth is None else truth
+            print(f"{'store ' + dtype:<30}{vector_bytes(store.path) * per_million / 2**20:18.0f}"
+                  f"{recall(ids, truth):8.3f}{p50 * 1000:9.3f}")
+
+        for index_type in ("sq8", "ivf_pq"):
+            index = build_index(stores["float32"], metric="cosine", index_type=index_type)
+            size_mb = faiss.serialize_index(index).nbytes * per_million / 2**20
+            for factor in (0, rescore_factor):
+                retriever = PrebuiltFAISSRetriever(index, top_k=top_k, documents=stores["float32"], metric="cosine",
+                                                   rescore_factor=factor)
+                ids, p50, _ = search_each(retriever, queries, top_k)
+                name = f"faiss {index_type}" + (f" rescore={factor}" if factor else "")
+                print(f"{name:<30}{size_mb:18.0f}{recall(ids, truth):8.3f}{p50 * 1000:9.3f}")
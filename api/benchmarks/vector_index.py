@@ -0,0 +1,95 @@
+"""Report recall@k and per-query latency of the index types `build_index` chooses from, against exact search.
+
+Vectors are synthetic: normalized points scattered around random cluster centers, which
+is closer to real embeddings than uniform noise. Queries come from the same distribution
+but are not in the corpus. Each query is searched on its own through the retriever the chat
+handler uses, so quantized indexes re-score their candidates from the chunk store.
+
+Usage: python -m api.benchmarks.vector_index [chunks] [dimensions] [queries] [top_k]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import faiss
+import numpy as np
+from adalflow.core.types import Document
+
+from api.chunk_store import ChunkStore
+from api.vector_index import PrebuiltFAISSRetriever, build_index, get_index_config
+
+CLUSTERS = 1000
+
+def make_vectors(count, dimensions, centers, rng):
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal((count, dimensions))
+    vectors = vectors.astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def write_store(path, vectors, vector_dtype="float32"):
+    """Write vectors as the chunks of one file to a chunk store and open it."""
+    meta_data = {"file_path": "module.py"}
+    documents = [Document(text="", meta_data=meta_data, id="file", estimated_num_tokens=0)]
+    chunks = [Document(text="", meta_data=meta_data, vector=vector, id=f"{i:036d}", order=i,
+                       parent_doc_id="file", estimated_num_tokens=0) for i, vector in enumerate(vectors)]
+    ChunkStore.write(path, documents, chunks, vector_dtype)
+    return ChunkStore(path)
+
+def search_each(retriever, queries, top_k):
+    """Search queries one at a time; returns the result ids and the p50 and p99 latency."""
+    ids = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        ids.append(retriever.retrieve_embedding_queries(query[None, :], top_k)[0].doc_indices)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return ids, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+def recall(ids, truth):
+    return np.mean([len(set(found) & set(expected)) / len(expected) for found, expected in zip(ids, truth)])
+
+if __name__ == "__main__":
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    num_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    top_k = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((CLUSTERS, dimensions)).astype(np.float32)
+    vectors = make_vectors(num_chunks, dimensions, centers, rng)
+    queries = make_vectors(num_queries, dimensions, centers, rng)
+    index_config = get_index_config()
+    rescore_factor = index_config.get("rescore_factor", 4)
+
+    print(f"{num_chunks} chunks, {dimensions} dimensions, {num_queries} queries, recall@{top_k} against flat search")
+    print(f"{'index':<28}{'build s':>9}{'size MB':>9}{'recall':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    truth = None
+    with tempfile.TemporaryDirectory() as root:
+        store = write_store(os.path.join(root, "repo.store"), vectors)
+        for index_type, setting, values in (("flat", None, [None]),
+                                            ("hnsw", "ef_search", [32, 64, 128, 256]),
+                                            ("ivf_pq", "nprobe", [8, 16, 32, 64])):
+            start = time.perf_counter()
+            index = build_index(store, metric="cosine", index_type=index_type)
+            build_seconds = time.perf_counter() - start
+            size_mb = faiss.serialize_index(index).nbytes / 2**20
+            for value in values:
+                if index_type == "hnsw":
+                    index.hnsw.efSearch = value
+                elif index_type == "ivf_pq":
+                    index.nprobe = min(value, index.nlist)
+                for factor in ([0, rescore_factor] if index_type == "ivf_pq" else [0]):
+                    retriever = PrebuiltFAISSRetriever(index, top_k=top_k, documents=store, metric="cosine",
+                                                       rescore_factor=factor)
+                    ids, p50, p99 = search_each(retriever, queries, top_k)
+                    if truth is None:
+                        truth = ids
+                    name = index_type if setting is None else f"{index_type} {setting}={value}"
+                    name += f" rescore={factor}" if factor else ""
+                    print(f"{name:<28}{build_seconds:9.1f}{size_mb:9.1f}{recall(ids, truth):8.3f}"
+                          f"{p50 * 1000:9.3f}{p99 * 1000:9.3f}")
+    configured = {"hnsw": index_config.get("hnsw", {}).get("ef_search"),
+                  "ivf_pq": index_config.get("ivf_pq", {}).get("nprobe")}
+    print(f"Configured: ef_search={configured['hnsw']}, nprobe={configured['ivf_pq']}, rescore_factor={rescore_factor}")
@@ -0,0 +1,62 @@
+"""Compare the single-pass repository walker with the per-extension glob approach.
+
+Usage: python -m api.benchmarks.walker <repo_path> [repeats]
+"""
+import glob
+import os
+import sys
+import time
+
+from api.file_filters import get_file_filter
+from api.file_walker import walk_repository, group_by_extension
+
+CODE_EXTENSIONS = [".py", ".js", ".ts", ".java", ".cpp", ".c", ".go", ".rs",
+                   ".jsx", ".tsx", ".html", ".css", ".php", ".swift", ".cs"]
+DOC_EXTENSIONS = [".md", ".txt", ".rst", ".json", ".yaml", ".yml"]
+EXCLUDED_DIRS = ["./.venv/", "./venv/", "./node_modules/", "./.git/", "./bower_components/"]
+EXCLUDED_FILES = ["yarn.lock", "pnpm-lock.yaml", "package-lock.json"]
+
+def glob_candidates(path):
+    """The previous approach: one recursive glob per extension, then substring filtering."""
+    found = []
+    for ext in CODE_EXTENSIONS + DOC_EXTENSIONS:
+        for file_path in glob.glob(f"{path}/**/*{ext}", recursive=True):
+            if any(excluded in file_path for excluded in EXCLUDED_DIRS):
+                continue
+            if any(os.path.basename(file_path) == excluded for excluded in EXCLUDED_FILES):
+                continue
+            found.append(file_path)
+    return found
+
+def walker_candidates(path):
+    """The single-pass walker, bucketed by extension."""
+    extensions = CODE_EXTENSIONS + DOC_EXTENSIONS
+    file_filter = get_file_filter(EXCLUDED_DIRS, EXCLUDED_FILES)
+    buckets = group_by_extension(walk_repository(path, extensions, file_filter), extensions)
+    return [file_path for ext in extensions for file_path in buckets[ext]]
+
+def run(fn, path, repeats):
+    best = float("inf")
+    result = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(path)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m api.benchmarks.walker <repo_path> [repeats]")
+        sys.exit(1)
+
+    repo_path = sys.argv[1]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    glob_time, glob_files = run(glob_candidates, repo_path, repeats)
+    walk_time, walk_files = run(walker_candidates, repo_path, repeats)
+
+    print(f"Repository: {repo_path} (best of {repeats})")
+    print(f"  glob x{len(CODE_EXTENSIONS + DOC_EXTENSIONS)}: {glob_time * 1000:9.1f} ms, {len(glob_files)} files")
+    print(f"  walker:       {walk_time * 1000:9.1f} ms, {len(walk_files)} files")
+    if walk_time > 0:
+        print(f"  speedup:      {glob_time / walk_time:9.1f}x")
@@ -0,0 +1,367 @@
+"""Memory-mapped, columnar storage of a repository's files, chunks and vectors.
+
+A store is a directory holding the files below. ~/.adalflow/databases/{repo}.store is a
+symlink to the current version, {repo}.store.{version}, so a rewrite is swapped in by one
+atomic rename:
+
+- vectors.npy: the chunk vectors as one float32, float16 or int8 matrix, row i for chunk i
+- scales.npy: for int8 vectors, the scale of each dimension; vector = int8 row * scales
+- chunks.npy: one fixed-size record per chunk (file index, order, token count, id)
+- offsets.npy, texts.bin: chunk i's text is texts.bin[offsets[i]:offsets[i + 1]], UTF-8
+- file_offsets.npy, files.bin: the full text of file j, used to skip re-reading unchanged files
+- meta.json: format version, vector type and the file table (id and metadata of each file)
+
+Everything but the file table is opened memory-mapped, so opening a store costs almost
+nothing and only the pages of chunks that are actually read become resident.
+
+Usage: python -m api.chunk_store migrate [database.pkl ...]
+"""
+import os
+import sys
+import json
+import glob
+import uuid
+import shutil
+import logging
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from adalflow.core.types import Document
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+_CHUNK_DTYPE = np.dtype([("file_index", "<i4"), ("order", "<i4"), ("num_tokens", "<i4"), ("id", "S36")])
+
+def get_store_path(db_path: str) -> str:
+    """
+    Get the store directory of a database path.
+
+    Args:
+        db_path (str): The path of the database, e.g. ~/.adalflow/databases/{repo}.pkl
+
+    Returns:
+        str: The store path, e.g. ~/.adalflow/databases/{repo}.store
+    """
+    return f"{os.path.splitext(db_path)[0]}.store"
+
+def document_vectors(documents: Sequence[Document]) -> np.ndarray:
+    """
+    Get the vectors of embedded chunks as one float32 matrix.
+
+    Args:
+        documents (Sequence[Document]): A `ChunkStore`, whose matrix is copied without building
+            documents, or any sequence of documents with vectors.
+
+    Returns:
+        np.ndarray: Row i holds the vector of documents[i].
+    """
+    if isinstance(documents, ChunkStore):
+        return documents.get_vectors()
+    return np.array([doc.vector for doc in documents], dtype=np.float32)
+
+def quantize_int8(vectors: np.ndarray):
+    """
+    Quantize vectors to int8 with one symmetric scale per dimension.
+
+    Args:
+        vectors (np.ndarray): float32 vectors, one per row.
+
+    Returns:
+        tuple: The int8 matrix and the float32 scale of each dimension.
+    """
+    scales = np.abs(vectors).max(axis=0) / 127 if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+    scales = np.where(scales > 0, scales, 1).astype(np.float32)
+    return np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8), scales
+
+def _open_blob(path: str) -> np.ndarray:
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+def _load_array(path: str, count: int) -> np.ndarray:
+    # Arrays without elements cannot be memory-mapped
+    return np.load(path, mmap_mode="r" if count else None)
+
+class ChunkStore(Sequence[Document]):
+    """
+    Read-only view of a store as a sequence of chunk `Document`s.
+
+    Documents are built on access from the mapped columns; their vectors are float32
+    copies of one matrix row. `vectors` gives the whole matrix without copying.
+
+    Args:
+        path (str): The store directory, see `get_store_path`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Every file is read from the same version even if a newer one is swapped in meanwhile
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported chunk store version {meta.get('version')} in {path}")
+        self.files: List[dict] = meta["files"]
+        self.count: int = meta["count"]
+        self.chunks = _load_array(os.path.join(path, "chunks.npy"), self.count)
+        self.offsets = _load_array(os.path.join(path, "offsets.npy"), self.count)
+        self.vectors = _load_array(os.path.join(path, "vectors.npy"), self.count)
+        self.vector_scales = np.load(os.path.join(path, "scales.npy")) if meta.get("vector_dtype") == "int8" else None
+        self.file_offsets = _load_array(os.path.join(path, "file_offsets.npy"), len(self.files))
+        self._texts = _open_blob(os.path.join(path, "texts.bin"))
+        self._file_texts = _open_blob(os.path.join(path, "files.bin"))
+        self._positions: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("chunk index out of range")
+        record = self.chunks[index]
+        file_entry = self.files[record["file_index"]]
+        return Document(
+            text=self.text(index),
+            meta_data=dict(file_entry["meta_data"]),
+            vector=self.get_vectors(index),
+            id=record["id"].decode("ascii"),
+            order=int(record["order"]) if record["order"] >= 0 else None,
+            parent_doc_id=file_entry["id"],
+            estimated_num_tokens=int(record["num_tokens"]),
+        )
+
+    def __iter__(self) -> Iterator[Document]:
+        for i in range(self.count):
+            yield self[i]
+
+    def get_vectors(self, indices=None) -> np.ndarray:
+        """
+        Get chunk vectors as float32, decoding int8 vectors.
+
+        Args:
+            indices (optional): A chunk position, an array of positions, or None for all chunks.
+
+        Returns:
+            np.ndarray: The vector, or one row per position.
+        """
+        if indices is None or np.ndim(indices) == 0:
+            vectors = np.array(self.vectors if indices is None else self.vectors[indices], dtype=np.float32)
+        else:
+            # Indexing by an array already copies the rows
+            vectors = np.asarray(self.vectors[indices], dtype=np.float32)
+        if self.vector_scales is not None:
+            vectors *= self.vector_scales
+        return vectors
+
+    def text(self, index: int) -> str:
+        """Get the text of one chunk without building its document."""
+        return bytes(self._texts[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8", "surrogatepass")
+
+    @property
+    def chunk_ids(self) -> Dict[str, int]:
+        """Chunk positions keyed by chunk id."""
+        if self._positions is None:
+            self._positions = {chunk_id.decode("ascii"): i for i, chunk_id in enumerate(self.chunks["id"])}
+        return self._positions
+
+    def get_chunks_by_id(self) -> "ChunksById":
+        """A read-only mapping of chunk id to chunk document."""
+        return ChunksById(self)
+
+    def file_text(self, index: int) -> str:
+        """Get the full text of one file of the file table."""
+        return bytes(self._file_texts[self.file_offsets[index]:self.file_offsets[index + 1]]).decode("utf-8", "surrogatepass")
+
+    def get_file_documents(self) -> Dict[str, Document]:
+        """The indexed files as documents with their full text, keyed by file path."""
+        documents = {}
+        for j, file_entry in enumerate(self.files):
+            documents[file_entry["meta_data"]["file_path"]] = Document(
+                text=self.file_text(j), meta_data=dict(file_entry["meta_data"]), id=file_entry["id"],
+                estimated_num_tokens=file_entry.get("num_tokens"),
+            )
+        return documents
+
+    def heap_bytes(self) -> int:
+        """Estimate the memory held outside the mapped files."""
+        return sum(len(json.dumps(entry)) for entry in self.files) + (len(self._positions) * 100 if self._positions else 0)
+
+    @staticmethod
+    def write(path: str, documents: Sequence[Document], chunks: Sequence[Document], vector_dtype: str = "float32") -> None:
+        """
+        Write a store, replacing any existing one at `path`.
+
+        The store is written to a new version directory and `path` is pointed at it with
+        one rename, so readers see either the previous or the new store, never a partial
+        or missing one. Chunks take their metadata from their file.
+
+        Args:
+            path (str): The store directory.
+            documents (Sequence[Document]): The indexed files, in repository order.
+            chunks (Sequence[Document]): Their embedded chunks, in index order.
+            vector_dtype (str): "float32", "float16" to halve the vector file, or "int8" to quarter
+                it, scaled per dimension.
+        """
+        file_index = {doc.meta_data["file_path"]: j for j, doc in enumerate(documents)}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            records = np.zeros(len(chunks), dtype=_CHUNK_DTYPE)
+            offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+            dimensions = next((len(chunk.vector) for chunk in chunks if chunk.vector is not None and len(chunk.vector)), 0)
+            vectors = np.zeros((len(chunks), dimensions), dtype=np.float32 if vector_dtype == "int8" else vector_dtype)
+            with open(os.path.join(tmp_path, "texts.bin"), "wb") as f:
+                for i, chunk in enumerate(chunks):
+                    data = chunk.text.encode("utf-8", "surrogatepass")
+                    f.write(data)
+                    offsets[i + 1] = offsets[i] + len(data)
+                    records[i] = (file_index[chunk.meta_data["file_path"]],
+                                  chunk.order if chunk.order is not None else -1,
+                                  chunk.estimated_num_tokens or 0, str(chunk.id).encode("ascii"))
+                    if dimensions:
+                        vectors[i] = chunk.vector
+            file_offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+            with open(os.path.join(tmp_path, "files.bin"), "wb") as f:
+                for j, doc in enumerate(documents):
+                    data = doc.text.encode("utf-8", "surrogatepass")
+                    f.write(data)
+                    file_offsets[j + 1] = file_offsets[j] + len(data)
+            np.save(os.path.join(tmp_path, "chunks.npy"), records)
+            np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+            if vector_dtype == "int8":
+                vectors, scales = quantize_int8(vectors)
+                np.save(os.path.join(tmp_path, "scales.npy"), scales)
+            np.save(os.path.join(tmp_path, "vectors.npy"), vectors)
+            np.save(os.path.join(tmp_path, "file_offsets.npy"), file_offsets)
+            meta = {
+                "version": STORE_VERSION,
+                "count": len(chunks),
+                "dimensions": dimensions,
+                "vector_dtype": vector_dtype,
+                "files": [{"id": str(doc.id), "meta_data": doc.meta_data, "num_tokens": doc.estimated_num_tokens}
+                          for doc in documents],
+            }
+            with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            version_path = f"{path}.{uuid.uuid4().hex[:12]}"
+            os.replace(tmp_path, version_path)
+            _swap_store(path, version_path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        logger.info(f"Saved {len(chunks)} chunks of {len(documents)} files to {path}")
+
+def _swap_store(path: str, version_path: str) -> None:
+    """Point `path` at a new version directory and remove the version it pointed at."""
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    link_path = f"{path}.{os.getpid()}.link"
+    try:
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(os.path.basename(version_path), link_path)
+    except (OSError, NotImplementedError):
+        # Without symlinks the directory itself is replaced, which takes two renames
+        link_path = version_path
+    old_path = f"{path}.{os.getpid()}.old"
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Stores written before versioning are directories and are moved aside once
+        os.replace(path, old_path)
+    os.replace(link_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    if previous is not None and previous != os.path.realpath(version_path):
+        # Readers that opened the previous version keep their mapped files
+        shutil.rmtree(previous, ignore_errors=True)
+
+class ChunksById:
+    """Mapping of chunk id to chunk document over a `ChunkStore`; documents are built on access."""
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self.store.chunk_ids
+
+    def __getitem__(self, chunk_id: str) -> Document:
+        return self.store[self.store.chunk_ids[chunk_id]]
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+def open_store(path: str) -> Optional[ChunkStore]:
+    """
+    Open a store.
+
+    Returns:
+        Optional[ChunkStore]: The store, or None if it is missing or unreadable.
+    """
+    version_path = None
+    while True:
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        try:
+            return ChunkStore(path)
+        except FileNotFoundError as e:
+            error = e
+        except (OSError, ValueError, KeyError) as e:
+            error = e
+            break
+        # The version being opened was replaced and removed meanwhile; open the new one
+        if os.path.realpath(path) == version_path:
+            break
+        version_path = os.path.realpath(path)
+    logger.error(f"Error opening chunk store {path}: {error}")
+    return None
+
+def migrate_pickle(db_path: str, vector_dtype: str = "float32", delete: bool = False) -> Optional[ChunkStore]:
+    """
+    Convert a pickled `LocalDB` database into a store next to it.
+
+    A manifest is written as well if the database has none.
+
+    Args:
+        db_path (str): The .pkl database.
+        vector_dtype (str): The vector type of the store.
+        delete (bool): Whether to remove the pickle afterwards.
+
+    Returns:
+        Optional[ChunkStore]: The new store, or None if the pickle could not be read.
+    """
+    from adalflow.core.db import LocalDB
+    # Components referenced by the pickled pipeline must be registered before loading
+    import api.embedding_cache  # noqa: F401
+    from api.index_manifest import IndexManifest, get_manifest_path
+
+    try:
+        db = LocalDB.load_state(db_path)
+        chunks = db.get_transformed_data(key="split_and_embed")
+    except Exception as e:
+        logger.error(f"Error loading {db_path} for migration: {e}")
+        return None
+    store_path = get_store_path(db_path)
+    ChunkStore.write(store_path, db.items, chunks, vector_dtype)
+    manifest_path = get_manifest_path(db_path)
+    if IndexManifest.load(manifest_path) is None:
+        IndexManifest.from_db(db).save(manifest_path)
+    if delete:
+        os.remove(db_path)
+    logger.info(f"Migrated {db_path} to {store_path}")
+    return ChunkStore(store_path)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print(__doc__)
+        sys.exit(1)
+    from adalflow.utils import get_adalflow_default_root_path
+
+    logging.basicConfig(level=logging.INFO)
+    paths = sys.argv[2:] or sorted(glob.glob(os.path.join(get_adalflow_default_root_path(), "databases", "*.pkl")))
+    for db_path in paths:
+        migrate_pickle(db_path)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import threading
+import importlib.util
+import weakref
+from typing import Dict, Tuple
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Connection pool settings unless overridden by `http_client` in generator.json
+DEFAULT_HTTP_SETTINGS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 60.0,
+    "connect_timeout": 10.0,
+    "read_timeout": 600.0,
+    # Needs the optional h2 package: pip install "httpx[http2]"
+    "http2": False,
+}
+
+_sync_clients: Dict[Tuple[str, str], OpenAI] = {}
+# Async connections belong to the event loop that opened them, so async clients are pooled per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], AsyncOpenAI]]" = \
+    weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+def _get_http_settings() -> dict:
+    # Imported here because api.config imports the model clients, which use this module
+    from api.config import configs
+
+    settings = dict(DEFAULT_HTTP_SETTINGS)
+    settings.update(configs.get("http_client", {}))
+    if settings["http2"] and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 requested for model clients but the h2 package is not installed, using HTTP/1.1; "
+                       "install it with pip install \"httpx[http2]\"")
+        settings["http2"] = False
+    return settings
+
+def _http_client_options() -> dict:
+    settings = _get_http_settings()
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(settings["read_timeout"], connect=settings["connect_timeout"]),
+        "http2": settings["http2"],
+        "follow_redirects": True,
+    }
+
+def get_sync_client(base_url: str, api_key: str) -> OpenAI:
+    """
+    Get the process-wide sync client for an endpoint and key.
+
+    Clients share one keep-alive connection pool per (base_url, api_key), so requests
+    after the first skip connection and TLS setup.
+
+    Args:
+        base_url (str): The API base URL.
+        api_key (str): The API key.
+
+    Returns:
+        OpenAI: The pooled client, created on first use.
+    """
+    key = (base_url, api_key)
+    with _clients_lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = _sync_clients[key] = OpenAI(
+                api_key=api_key, base_url=base_url, http_client=httpx.Client(**_http_client_options())
+            )
+            logger.info(f"Created pooled OpenAI client for {base_url}")
+        return client
+
+def get_async_client(base_url: str, api_key: str) -> AsyncOpenAI:
+    """
+    Get the async client for an endpoint and key that belongs to the running event loop.
+
+    Args:
+        base_url (str): The API base URL.
+        api_key (str): The API key.
+
+    Returns:
+        AsyncOpenAI: The pooled client, created on first use in this loop.
+
+    Raises:
+        RuntimeError: If no event loop is running in this thread.
+    """
+    loop = asyncio.get_running_loop()
+    key = (base_url, api_key)
+    with _clients_lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            client = loop_clients[key] = AsyncOpenAI(
+                api_key=api_key, base_url=base_url, http_client=httpx.AsyncClient(**_http_client_options())
+            )
+        return client
+
+async def close_async_clients() -> None:
+    """Close the async clients of the running event loop; call before the loop ends."""
+    with _clients_lock:
+        loop_clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in loop_clients.values():
+        await client.close()
+
+async def close_clients() -> None:
+    """Close the async clients of the running event loop and every sync client."""
+    await close_async_clients()
+    with _clients_lock:
+        sync_clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in sync_clients:
+        client.close()
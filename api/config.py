@@ -97,16 +97,19 @@ if generator_config:
         configs["providers"] = {"openai": generator_config["providers"]["openai"]}
     else:
         configs["providers"] = {}
+    for key in ["context_packing", "http_client"]:
+        if key in generator_config:
+            configs[key] = generator_config[key]
 
 # Update embedder configuration
 if embedder_config:
-    for key in ["embedder", "retriever", "text_splitter"]:
+    for key in ["embedder", "retriever", "retriever_cache", "query_cache", "lexical", "symbol_index", "store", "vector_index", "text_splitter"]:
         if key in embedder_config:
             configs[key] = embedder_config[key]
 
 # Update repository configuration
 if repo_config:
-    for key in ["file_filters", "repository"]:
+    for key in ["file_filters", "repository", "ingestion", "indexing", "executors"]:
         if key in repo_config:
             configs[key] = repo_config[key]
 
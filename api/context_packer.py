@@ -0,0 +1,176 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from adalflow.core.types import Document
+
+from api.config import configs
+from api.tokenizer import count_tokens_many
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Separator between units of each `text_splitter.split_by` mode; token chunks have no fixed overlap text
+_SPLIT_SEPARATORS = {"word": " ", "sentence": ".", "page": "\f", "passage": "\n\n"}
+
+@dataclass
+class ContextSpan:
+    """A contiguous piece of one file made of one or more consecutive retrieved chunks."""
+    file_path: str
+    text: str
+    score: float
+    first_order: Optional[int] = None
+    last_order: Optional[int] = None
+    chunks: List[Document] = field(default_factory=list)
+
+@dataclass
+class PackedContext:
+    """The context text for the prompt and what went into it."""
+    text: str
+    tokens: int = 0
+    files: List[str] = field(default_factory=list)
+    spans_included: int = 0
+    spans_dropped: int = 0
+    chunks_merged: int = 0
+
+def _strip_overlap(previous_text: str, text: str, overlap: int, separator: Optional[str]) -> str:
+    """Remove the leading units of `text` that repeat the end of `previous_text`."""
+    if separator is None or overlap <= 0:
+        return text
+    units = text.split(separator)
+    if len(units) <= overlap:
+        return text
+    repeated = separator.join(units[:overlap]) + separator
+    if not previous_text.endswith(repeated):
+        # Not split with the current settings, keep both chunks whole
+        return text
+    return separator.join(units[overlap:])
+
+def merge_chunks(documents: Sequence[Document], scores: Sequence[float]) -> List[ContextSpan]:
+    """
+    Merge retrieved chunks that are consecutive in the same file into spans.
+
+    Consecutive chunks of `TextSplitter` share `chunk_overlap` units; the repeated
+    units are kept once. A span's score is the sum of its chunks' scores.
+
+    Args:
+        documents (Sequence[Document]): Retrieved chunks.
+        scores (Sequence[float]): The retrieval score of each chunk.
+
+    Returns:
+        List[ContextSpan]: Spans of every file, in file order.
+    """
+    splitter_config = configs.get("text_splitter", {})
+    overlap = splitter_config.get("chunk_overlap", 0)
+    separator = _SPLIT_SEPARATORS.get(splitter_config.get("split_by", "word"))
+
+    chunks_by_file: Dict[str, List[Tuple[Document, float]]] = {}
+    for doc, score in zip(documents, scores):
+        file_path = (doc.meta_data or {}).get("file_path", "unknown")
+        chunks_by_file.setdefault(file_path, []).append((doc, score))
+
+    spans = []
+    for file_path, chunks in chunks_by_file.items():
+        chunks.sort(key=lambda chunk: chunk[0].order if chunk[0].order is not None else -1)
+        seen_orders = set()
+        current: Optional[ContextSpan] = None
+        for doc, score in chunks:
+            if doc.order is not None and doc.order in seen_orders:
+                continue
+            seen_orders.add(doc.order)
+            if (current is not None and doc.order is not None and current.last_order is not None
+                    and doc.order == current.last_order + 1):
+                current.text += _strip_overlap(current.text, doc.text, overlap, separator)
+                current.score += score
+                current.last_order = doc.order
+                current.chunks.append(doc)
+                continue
+            current = ContextSpan(file_path, doc.text, score, doc.order, doc.order, [doc])
+            spans.append(current)
+    return spans
+
+def get_context_window(model: Optional[str]) -> int:
+    """Get the context window of a model from `context_packing` in generator.json."""
+    packing_config = configs.get("context_packing", {})
+    return packing_config.get("context_windows", {}).get(model, packing_config.get("default_context_window", 128000))
+
+def get_context_budget(model: Optional[str], prompt_tokens: int) -> int:
+    """
+    Get the tokens left for retrieved context once the rest of the prompt and the answer are accounted for.
+
+    Args:
+        model (str, optional): The model the prompt is sent to.
+        prompt_tokens (int): Tokens of the prompt without the context.
+
+    Returns:
+        int: The budget, at least 0.
+    """
+    packing_config = configs.get("context_packing", {})
+    reserved = packing_config.get("reserved_output_tokens", 8192) + packing_config.get("safety_margin_tokens", 1024)
+    return max(0, get_context_window(model) - prompt_tokens - reserved)
+
+def pack_context(documents: Sequence[Document], scores: Optional[Sequence[float]], budget_tokens: int,
+                 model: Optional[str] = None) -> PackedContext:
+    """
+    Build the context text from retrieved chunks within a token budget.
+
+    Chunks are merged into spans per file, files are ordered by their total score, and
+    spans are added in file order while they fit. When a merged span does not fit, its
+    chunks are tried one by one instead; whatever still does not fit is left out.
+
+    Args:
+        documents (Sequence[Document]): Retrieved chunks, best first.
+        scores (Sequence[float], optional): Retrieval scores; without them, rank decides.
+        budget_tokens (int): Tokens the context may use.
+        model (str, optional): The model whose tokenizer counts the tokens.
+
+    Returns:
+        PackedContext: The context text, empty if nothing fits.
+    """
+    if not documents:
+        return PackedContext(text="")
+    if scores is None or len(scores) != len(documents):
+        scores = [1.0 / (rank + 1) for rank in range(len(documents))]
+    spans = merge_chunks(documents, scores)
+
+    spans_by_file: Dict[str, List[ContextSpan]] = {}
+    for span in spans:
+        spans_by_file.setdefault(span.file_path, []).append(span)
+    file_order = sorted(spans_by_file, key=lambda path: sum(span.score for span in spans_by_file[path]), reverse=True)
+
+    headers = {path: f"## File Path: {path}\n\n" for path in file_order}
+    texts = [headers[path] for path in file_order] + [span.text for path in file_order for span in spans_by_file[path]]
+    counts = count_tokens_many(texts, model=model or "gpt-4o", memoize=False)
+    header_tokens = dict(zip(file_order, counts))
+    span_tokens = dict(zip((id(span) for path in file_order for span in spans_by_file[path]), counts[len(file_order):]))
+
+    packed = PackedContext(text="", chunks_merged=len(documents) - len(spans))
+    parts = []
+    # Separators between spans and files are a few tokens each
+    separator_tokens = 4
+    for path in file_order:
+        included = []
+        for span in spans_by_file[path]:
+            candidates = [(span.text, span_tokens[id(span)])]
+            if packed.tokens + span_tokens[id(span)] > budget_tokens and len(span.chunks) > 1:
+                candidates = list(zip((chunk.text for chunk in span.chunks),
+                                      count_tokens_many([chunk.text for chunk in span.chunks],
+                                                        model=model or "gpt-4o", memoize=False)))
+            for text, tokens in candidates:
+                cost = tokens + separator_tokens + (0 if included else header_tokens[path])
+                if packed.tokens + cost > budget_tokens:
+                    packed.spans_dropped += 1
+                    continue
+                packed.tokens += cost
+                included.append(text)
+        if included:
+            parts.append(headers[path] + "\n\n".join(included))
+            packed.files.append(path)
+            packed.spans_included += len(included)
+
+    if parts:
+        packed.text = "\n\n" + "-" * 10 + "\n\n".join(parts)
+    logger.info(f"Packed {packed.spans_included} spans from {len(packed.files)} files into {packed.tokens} tokens "
+                f"of a {budget_tokens} token budget ({packed.chunks_merged} chunks merged, "
+                f"{packed.spans_dropped} spans left out)")
+    return packed
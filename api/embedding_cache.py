@@ -0,0 +1,278 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from copy import deepcopy
+from typing import List, Optional, Sequence
+
+import numpy as np
+from adalflow.core.component import DataComponent
+from adalflow.core.embedder import Embedder
+from adalflow.core.types import Document
+from adalflow.utils import get_adalflow_default_root_path
+from adalflow.utils.registry import EntityMapping
+
+from api.config import configs
+from api.async_embedder import AsyncBatchEmbedder
+from api.index_progress import report_progress
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of host parameters per statement
+_SQL_BATCH = 500
+
+def text_hash(text: str) -> bytes:
+    """Return the SHA-256 digest of a chunk text."""
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache shared by every repository.
+
+    Vectors are stored in SQLite keyed by (model, dimensions, sha256(text)), so a
+    chunk that was embedded once, for any repository, fork or branch, is never
+    sent to the embedding API again. The cache is bounded by size and evicts the
+    least recently used vectors first.
+
+    Args:
+        path (str, optional): The SQLite file. Defaults to ~/.adalflow/embedding_cache.sqlite
+        max_size_mb (int): Upper bound for the stored vectors, in megabytes.
+    """
+
+    def __init__(self, path: str = None, max_size_mb: int = 1024):
+        self.path = path or os.path.join(get_adalflow_default_root_path(), "embedding_cache.sqlite")
+        self.max_bytes = max_size_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, dimensions INTEGER NOT NULL, text_hash BLOB NOT NULL,"
+            " vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, dimensions, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get_many(self, texts: Sequence[str], model: str, dimensions: Optional[int]) -> List[Optional[List[float]]]:
+        """
+        Look up the vectors of many texts.
+
+        Args:
+            texts (Sequence[str]): The chunk texts.
+            model (str): The embedding model.
+            dimensions (int, optional): The requested embedding dimensions.
+
+        Returns:
+            List[Optional[List[float]]]: The cached vector of each text, or None on a miss.
+        """
+        dims = dimensions or 0
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), _SQL_BATCH):
+                batch = hashes[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND dimensions = ?"
+                    f" AND text_hash IN ({placeholders})",
+                    [model, dims, *batch],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, model, dims, h) for h in found],
+                )
+                self._conn.commit()
+            hits = sum(1 for h in hashes if h in found)
+            self.hits += hits
+            self.misses += len(hashes) - hits
+
+        return [
+            np.frombuffer(found[h], dtype=np.float32).tolist() if h in found else None
+            for h in hashes
+        ]
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]], model: str,
+                 dimensions: Optional[int]) -> None:
+        """
+        Store the vectors of many texts, evicting old entries if the cache is full.
+
+        Args:
+            texts (Sequence[str]): The chunk texts.
+            vectors (Sequence[Sequence[float]]): The vector of each text.
+            model (str): The embedding model.
+            dimensions (int, optional): The requested embedding dimensions.
+        """
+        dims = dimensions or 0
+        now = time.time()
+        rows = [
+            (model, dims, text_hash(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+            if vector is not None and len(vector) > 0
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._total_bytes += sum(len(row[3]) for row in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used vectors until the cache is at 90% of its size bound."""
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT ?", (_SQL_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            for rowid, size in rows:
+                if self._total_bytes <= target:
+                    break
+                self._conn.execute("DELETE FROM embeddings WHERE rowid = ?", (rowid,))
+                self._total_bytes -= size
+                evicted += 1
+        self._conn.commit()
+        logger.info(f"Evicted {evicted} embeddings from cache, {self._total_bytes} bytes remaining")
+
+    def stats(self) -> dict:
+        """Return entry count, stored bytes and hit rate of the cache."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Get the process-wide embedding cache configured by `embedder.cache` in embedder.json.
+
+    Returns:
+        Optional[EmbeddingCache]: The cache, or None if it is disabled.
+    """
+    global _embedding_cache
+    cache_config = configs.get("embedder", {}).get("cache", {})
+    if not cache_config.get("enabled", True):
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                path=cache_config.get("path"),
+                max_size_mb=cache_config.get("max_size_mb", 1024),
+            )
+        return _embedding_cache
+
+class CachedToEmbeddings(DataComponent):
+    """
+    Transforms a Sequence of Documents into Documents with embeddings, like
+    `ToEmbeddings`, but serves vectors from the persistent embedding cache and only
+    sends cache misses to the embedder, as concurrent rate-limited batches (see
+    `embedder.concurrency` in embedder.json).
+
+    It operates on a copy of the input data, and does not modify the input data.
+    """
+
+    def __init__(self, embedder: Embedder, batch_size: int = 50) -> None:
+        super().__init__(batch_size=batch_size)
+        self.embedder = embedder
+        self.batch_size = batch_size
+
+    def _get_batch_embedder(self) -> AsyncBatchEmbedder:
+        concurrency = configs.get("embedder", {}).get("concurrency", {})
+        return AsyncBatchEmbedder(
+            model_client=self.embedder.model_client,
+            model_kwargs=self.embedder.model_kwargs,
+            batch_size=self.batch_size,
+            max_tokens_per_batch=configs.get("embedder", {}).get("max_tokens_per_batch"),
+            max_in_flight=concurrency.get("max_in_flight_batches", 4),
+            requests_per_minute=concurrency.get("requests_per_minute"),
+            tokens_per_minute=concurrency.get("tokens_per_minute"),
+            max_retries=concurrency.get("max_retries", 5),
+        )
+
+    def __call__(self, input: Sequence[Document]) -> Sequence[Document]:
+        output = deepcopy(input)
+        model = self.embedder.model_kwargs.get("model")
+        dimensions = self.embedder.model_kwargs.get("dimensions")
+        texts = [chunk.text for chunk in output]
+        report_progress("chunks_split", count=len(texts))
+
+        cache = get_embedding_cache()
+        vectors = cache.get_many(texts, model, dimensions) if cache else [None] * len(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        embedded = len(texts) - len(missing)
+        report_progress("chunks_embedded", count=embedded, total=len(texts), done=False)
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+
+            def store_batch(batch: List[int], batch_vectors: List[List[float]]) -> None:
+                nonlocal embedded
+                # Cache every finished batch so that a failed or cancelled run resumes where it stopped
+                if cache:
+                    cache.put_many([missing_texts[i] for i in batch], batch_vectors, model, dimensions)
+                embedded += len(batch)
+                report_progress("chunks_embedded", count=embedded, total=len(texts), done=False)
+
+            # meta_data["token_count"] holds the size of the whole file, chunks carry their own estimate
+            missing_vectors = self._get_batch_embedder().embed(
+                missing_texts,
+                token_counts=[output[i].estimated_num_tokens or len(texts[i]) // 4 for i in missing],
+                on_batch=store_batch,
+            )
+            for i, vector in zip(missing, missing_vectors):
+                vectors[i] = vector
+
+        for chunk, vector in zip(output, vectors):
+            chunk.vector = vector
+
+        if cache:
+            stats = cache.stats()
+            logger.info(
+                f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} chunks served from cache, "
+                f"overall hit rate {stats['hit_rate']:.1%} over {stats['entries']} entries"
+            )
+        return output
+
+    def _extra_repr(self) -> str:
+        s = f"batch_size={self.batch_size}"
+        return s
+
+# Make the component restorable when a LocalDB is loaded from disk
+EntityMapping.register("CachedToEmbeddings", CachedToEmbeddings)
@@ -0,0 +1,167 @@
+import logging
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+from adalflow.core.types import Document, RetrieverOutput
+
+from api.chunk_store import document_vectors
+from api.config import configs
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rows converted to float32 at a time when searching a float16 matrix
+_BLOCK_ROWS = 16384
+# Shortest average run of allowed rows that is scored run by run rather than copied
+_MIN_RUN_ROWS = 32
+
+def use_exact_retriever(num_documents: int) -> bool:
+    """
+    Decide whether a repository is searched by `ExactRetriever` rather than FAISS.
+
+    `vector_index.backend` in embedder.json is "numpy", "faiss", or "auto" to use NumPy
+    for up to `numpy_max_chunks` chunks.
+    """
+    index_config = configs.get("vector_index", {})
+    backend = index_config.get("backend", "auto")
+    if backend == "auto":
+        return num_documents <= index_config.get("numpy_max_chunks", 20000)
+    return backend == "numpy"
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class ExactRetriever:
+    """
+    Exact nearest-neighbour search with NumPy, without building a FAISS index.
+
+    Vectors are kept as one matrix, normalized for the "prob" and "cosine" metrics. A
+    search is a single matrix product with the queries followed by `argpartition`, so
+    batched queries cost one BLAS call. Queries are normalized too; for unit-length
+    embeddings, such as OpenAI's, scores match those of `FAISSRetriever`.
+
+    Args:
+        documents (Sequence[Document]): Embedded chunks, in database order.
+        embedder (optional): Embeds string queries, e.g. the query embedding batcher.
+        top_k (int): Number of chunks to retrieve.
+        metric (str): "prob", "cosine" or "euclidean".
+        dtype (str): "float32", or "float16" to halve the matrix at some search cost.
+    """
+
+    def __init__(self, documents: Sequence[Document], embedder=None, top_k: int = 5, metric: str = "prob",
+                 dtype: str = "float32"):
+        if metric not in ("prob", "cosine", "euclidean"):
+            raise ValueError(f"Invalid metric: {metric}")
+        self.embedder = embedder
+        self.top_k = top_k
+        self.metric = metric
+        vectors = document_vectors(documents)
+        if metric != "euclidean":
+            vectors = _normalize(vectors)
+        else:
+            self.squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+        self.matrix = np.ascontiguousarray(vectors, dtype=dtype)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.matrix.nbytes + (self.squared_norms.nbytes if self.metric == "euclidean" else 0)
+
+    def _score_rows(self, queries: np.ndarray, rows: np.ndarray, out: np.ndarray) -> None:
+        """Write the scores of a block of matrix rows to `out`, one column per row."""
+        if rows.dtype == np.float32:
+            out[:] = queries @ rows.T
+        else:
+            # NumPy has no BLAS path for float16, so convert it block by block
+            for start in range(0, len(rows), _BLOCK_ROWS):
+                out[:, start:start + _BLOCK_ROWS] = queries @ rows[start:start + _BLOCK_ROWS].astype(np.float32).T
+
+    def _dot_products(self, queries: np.ndarray, allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """Query-by-document dot products, one column per allowed document."""
+        if allowed is None:
+            if self.matrix.dtype == np.float32:
+                return queries @ self.matrix.T
+            scores = np.empty((len(queries), len(self.matrix)), dtype=np.float32)
+            self._score_rows(queries, self.matrix, scores)
+            return scores
+
+        # Chunks of a file are stored together, so filters usually allow long runs of rows
+        breaks = np.flatnonzero(np.diff(allowed) != 1) + 1
+        scores = np.empty((len(queries), len(allowed)), dtype=np.float32)
+        if len(allowed) >= _MIN_RUN_ROWS * (len(breaks) + 1):
+            # Score each run through a view of the matrix, without copying rows
+            starts = np.concatenate(([0], breaks)).tolist()
+            ends = np.concatenate((breaks, [len(allowed)])).tolist()
+            for start, end in zip(starts, ends):
+                first = int(allowed[start])
+                self._score_rows(queries, self.matrix[first:first + end - start], scores[:, start:end])
+        elif len(allowed) * 3 <= len(self.matrix):
+            # Few scattered rows: copying them is cheaper than scoring every row
+            self._score_rows(queries, self.matrix[allowed], scores)
+        else:
+            scores = self._dot_products(queries)[:, allowed]
+        return scores
+
+    def _similarities(self, queries: np.ndarray, allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """Query-by-document scores where higher is better, one column per allowed document."""
+        scores = self._dot_products(queries, allowed)
+        if self.metric == "euclidean":
+            # Ranking by -|x - q|^2 only needs |x|^2 - 2 x.q; |q|^2 is added back for the scores
+            scores = 2 * scores - (self.squared_norms if allowed is None else self.squared_norms[allowed])
+        return scores
+
+    def retrieve_embedding_queries(self, input: Union[np.ndarray, List[List[float]]],
+                                   top_k: Optional[int] = None,
+                                   allowed: Optional[np.ndarray] = None) -> List[RetrieverOutput]:
+        """
+        Retrieve the top k chunks of each query vector, best first.
+
+        Args:
+            allowed (np.ndarray, optional): Sorted positions of the chunks that may be
+                returned, e.g. from `FilterIndex.allowed_chunks`; all chunks if None.
+        """
+        queries = np.atleast_2d(np.asarray(input, dtype=np.float32))
+        if self.metric != "euclidean":
+            queries = _normalize(queries)
+        top_k = min(top_k or self.top_k, len(self.matrix) if allowed is None else len(allowed))
+        if top_k == 0:
+            return [RetrieverOutput(doc_indices=[], doc_scores=[]) for _ in queries]
+
+        scores = self._similarities(queries, allowed)
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        indices = np.take_along_axis(candidates, order, axis=1)
+        if allowed is not None:
+            indices = allowed[indices]
+        distances = np.take_along_axis(candidate_scores, order, axis=1)
+        if self.metric == "prob":
+            distances = np.round((np.clip(distances, -1, 1) + 1) / 2, 3)
+        elif self.metric == "euclidean":
+            # Squared L2 distances, as IndexFlatL2 reports them
+            distances = np.einsum("ij,ij->i", queries, queries)[:, None] - distances
+        return [RetrieverOutput(doc_indices=row_indices.tolist(), doc_scores=row_scores.tolist())
+                for row_indices, row_scores in zip(indices, distances)]
+
+    def retrieve_string_queries(self, input: Union[str, List[str]], top_k: Optional[int] = None,
+                                allowed: Optional[np.ndarray] = None) -> List[RetrieverOutput]:
+        """Embed the queries in one call and retrieve the top k chunks of each."""
+        queries = [input] if isinstance(input, str) else list(input)
+        valid = [i for i, query in enumerate(queries) if query]
+        outputs = [RetrieverOutput(doc_indices=[], doc_scores=[], query=query) for query in queries]
+        if not valid:
+            return outputs
+        embeddings = self.embedder([queries[i] for i in valid])
+        results = self.retrieve_embedding_queries([data.embedding for data in embeddings.data], top_k, allowed)
+        for i, result in zip(valid, results):
+            outputs[i].doc_indices = result.doc_indices
+            outputs[i].doc_scores = result.doc_scores
+        return outputs
+
+    def __call__(self, input, top_k: Optional[int] = None,
+                 allowed: Optional[np.ndarray] = None) -> List[RetrieverOutput]:
+        if isinstance(input, str) or (isinstance(input, Sequence) and input and isinstance(input[0], str)):
+            if self.embedder is None:
+                raise ValueError("Embedder is not provided")
+            return self.retrieve_string_queries(input, top_k, allowed)
+        return self.retrieve_embedding_queries(input, top_k, allowed)
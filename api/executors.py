@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import threading
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable
+
+from api.config import configs
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Worker threads per pool unless overridden by `executors` in repo.json
+DEFAULT_POOL_SIZES = {
+    # Retriever preparation and retrieval: pickle loads, file hashing, query embedding, search
+    "retrieval": 8,
+    # Short blocking calls: tokenization, remote file content
+    "io": 8,
+    # Iteration of synchronous LLM streams, one thread per active stream
+    "llm_stream": 32,
+}
+
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """
+    Get a dedicated, bounded thread pool for one kind of blocking work.
+
+    Separate pools keep a burst of one kind, e.g. slow retriever preparation,
+    from starving the others.
+
+    Args:
+        name (str): The pool name, one of `DEFAULT_POOL_SIZES`.
+
+    Returns:
+        ThreadPoolExecutor: The pool, created on first use.
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            size = configs.get("executors", {}).get(name, DEFAULT_POOL_SIZES[name])
+            pool = _pools[name] = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{name}-pool")
+        return pool
+
+async def run_blocking(name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking call in the named pool without blocking the event loop.
+
+    Context variables of the caller are visible to the call, like `asyncio.to_thread`.
+
+    Args:
+        name (str): The pool name, see `get_executor`.
+        fn (Callable): The blocking function.
+
+    Returns:
+        Any: The result of `fn(*args, **kwargs)`.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(name), call)
+
+_exhausted = object()
+
+async def iterate_blocking(name: str, iterable: Iterable[Any]) -> AsyncIterator[Any]:
+    """
+    Iterate a blocking iterator, e.g. a synchronous streaming response, from async code.
+
+    Every `next` call runs in the named pool, so the event loop keeps serving other
+    requests while the iterator waits for data.
+
+    Args:
+        name (str): The pool name, see `get_executor`.
+        iterable (Iterable): The blocking iterable.
+
+    Yields:
+        Any: The items of `iterable`.
+    """
+    iterator = await run_blocking(name, iter, iterable)
+    while True:
+        item = await run_blocking(name, next, iterator, _exhausted)
+        if item is _exhausted:
+            return
+        yield item
+
+def shutdown_executors() -> None:
+    """Stop every pool; running calls are allowed to finish."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False)
+        _pools.clear()
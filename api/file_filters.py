@@ -0,0 +1,207 @@
+import re
+import json
+import hashlib
+import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def normalize_excluded_dir(excluded: str) -> str:
+    """
+    Normalize an excluded directory entry such as "./node_modules/" to "node_modules".
+
+    Args:
+        excluded (str): The directory entry as written in the configuration or request.
+
+    Returns:
+        str: The entry without leading "./" and surrounding slashes.
+    """
+    normalized = excluded.strip().replace("\\", "/")
+    while normalized.startswith("./"):
+        normalized = normalized[2:]
+    return normalized.strip("/")
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    Translate a glob pattern into a regular expression over "/"-separated paths.
+
+    Unlike `fnmatch.translate`, "*" and "?" never match "/", while "**" matches
+    across directories.
+
+    Args:
+        pattern (str): The glob pattern, e.g. "packages/*/dist" or "*.min.js".
+
+    Returns:
+        str: An unanchored regular expression equivalent to the pattern.
+    """
+    i, n = 0, len(pattern)
+    parts = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 2] == "**":
+                parts.append(".*")
+                i += 2
+                continue
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body + "]")
+                i = end
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts)
+
+def _is_glob(pattern: str) -> bool:
+    return any(c in pattern for c in "*?[")
+
+class _PatternSet:
+    """
+    A set of name and path patterns compiled for fast matching.
+
+    Exact names are looked up in a set, "*.suffix" patterns by probing each
+    suffix of the name that starts at a ".", and the remaining globs (including
+    "*_test.go"-style patterns) in one compiled alternation.
+    Patterns containing "/" are anchored at the repository root and matched
+    against the relative path.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.names = set()
+        self.suffixes = set()
+        name_globs = []
+        path_globs = []
+        for pattern in patterns:
+            if not pattern:
+                continue
+            if "/" in pattern:
+                path_globs.append(glob_to_regex(pattern))
+            elif not _is_glob(pattern):
+                self.names.add(pattern)
+            elif pattern.startswith("*.") and not _is_glob(pattern[1:]):
+                # Only suffixes starting at a "." are probed in `matches`; "*_test.go" is a regex
+                self.suffixes.add(pattern[1:])
+            else:
+                name_globs.append(glob_to_regex(pattern))
+        self.name_regex = re.compile("|".join(f"(?:{g})" for g in name_globs)) if name_globs else None
+        self.path_regex = re.compile("|".join(f"(?:{g})" for g in path_globs)) if path_globs else None
+
+    def matches(self, name: str, relative_path: str) -> bool:
+        if name in self.names:
+            return True
+        if self.suffixes:
+            start = name.find(".")
+            while start != -1:
+                if name[start:] in self.suffixes:
+                    return True
+                start = name.find(".", start + 1)
+        if self.name_regex is not None and self.name_regex.fullmatch(name):
+            return True
+        if self.path_regex is not None and self.path_regex.fullmatch(relative_path):
+            return True
+        return False
+
+class FileFilter:
+    """
+    Compiled matcher for the excluded directories and file patterns of a repository.
+
+    Directory entries (e.g. "./node_modules/") prune matching directories. File
+    patterns follow .gitignore conventions: a pattern without "/" matches the name
+    of a file or directory at any depth ("*.min.js", "__pycache__", "dist"), and a
+    pattern with "/" is matched against the path relative to the repository root
+    ("packages/*/dist").
+
+    Build instances with `get_file_filter` so that compiled matchers are shared.
+    """
+
+    def __init__(self, excluded_dirs: Tuple[str, ...] = (), excluded_files: Tuple[str, ...] = ()):
+        self.excluded_dirs = excluded_dirs
+        self.excluded_files = excluded_files
+        self._dirs = _PatternSet([normalize_excluded_dir(d) for d in excluded_dirs])
+        self._files = _PatternSet([normalize_excluded_dir(f) for f in excluded_files])
+
+    def excludes_dir(self, name: str, relative_path: str) -> bool:
+        """
+        Check whether a directory should be pruned.
+
+        Args:
+            name (str): The directory name.
+            relative_path (str): The "/"-separated path relative to the repository root.
+
+        Returns:
+            bool: True if the directory is excluded.
+        """
+        return self._dirs.matches(name, relative_path) or self._files.matches(name, relative_path)
+
+    def excludes_file(self, name: str, relative_path: str) -> bool:
+        """
+        Check whether a file should be skipped. Parent directories are assumed to
+        have been checked with `excludes_dir` already.
+
+        Args:
+            name (str): The file name.
+            relative_path (str): The "/"-separated path relative to the repository root.
+
+        Returns:
+            bool: True if the file is excluded.
+        """
+        return self._files.matches(name, relative_path)
+
+    def excludes_path(self, relative_path: str) -> bool:
+        """
+        Check a relative file path, including every parent directory.
+
+        Args:
+            relative_path (str): The path relative to the repository root.
+
+        Returns:
+            bool: True if the file or one of its parent directories is excluded.
+        """
+        parts = relative_path.replace("\\", "/").strip("/").split("/")
+        for i, name in enumerate(parts[:-1]):
+            if self.excludes_dir(name, "/".join(parts[:i + 1])):
+                return True
+        return self.excludes_file(parts[-1], "/".join(parts))
+
+    @property
+    def key(self) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """Identity of the filter set, usable as a cache key."""
+        return self.excluded_dirs, self.excluded_files
+
+    @property
+    def digest(self) -> str:
+        """Short stable hash of the filter set for file names, empty when nothing is excluded."""
+        if not self.excluded_dirs and not self.excluded_files:
+            return ""
+        return hashlib.sha1(json.dumps(self.key).encode("utf-8")).hexdigest()[:10]
+
+@lru_cache(maxsize=64)
+def _compile_file_filter(excluded_dirs: Tuple[str, ...], excluded_files: Tuple[str, ...]) -> FileFilter:
+    logger.info(f"Compiling file filter with {len(excluded_dirs)} directory and {len(excluded_files)} file patterns")
+    return FileFilter(excluded_dirs, excluded_files)
+
+def get_file_filter(excluded_dirs: Optional[List[str]] = None, excluded_files: Optional[List[str]] = None) -> FileFilter:
+    """
+    Get the compiled filter for a set of exclusions, compiling it on first use.
+
+    Args:
+        excluded_dirs (List[str], optional): Directories to exclude.
+        excluded_files (List[str], optional): File patterns to exclude.
+
+    Returns:
+        FileFilter: The cached compiled matcher for this filter set.
+    """
+    dirs = tuple(sorted(set(d.strip() for d in excluded_dirs or [] if d.strip())))
+    files = tuple(sorted(set(f.strip() for f in excluded_files or [] if f.strip())))
+    return _compile_file_filter(dirs, files)
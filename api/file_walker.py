@@ -0,0 +1,85 @@
+import os
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from api.file_filters import FileFilter
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def walk_repository(root: str, extensions: Iterable[str], file_filter: Optional[FileFilter] = None,
+                    include_hidden: bool = False) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily walk a repository once with `os.scandir`, yielding candidate files.
+
+    Excluded directories are pruned before they are descended into, so vendored
+    trees such as `node_modules` or `.venv` are never listed. Hidden entries are
+    skipped by default, which matches the behaviour of `glob.glob`.
+
+    Args:
+        root (str): The root directory of the repository.
+        extensions (Iterable[str]): File extensions to keep, e.g. [".py", ".md"].
+        file_filter (FileFilter, optional): Compiled exclusions, see `api.file_filters.get_file_filter`.
+        include_hidden (bool): Whether to include files and directories starting with ".".
+
+    Yields:
+        Tuple[str, str]: The file path and its extension, in sorted depth-first order.
+    """
+    wanted_extensions = frozenset(extensions)
+
+    # Stack of (absolute directory, directory relative to root)
+    stack = [(root, "")]
+    while stack:
+        current, relative_dir = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Cannot scan directory {current}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if not include_hidden and name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    relative_path = f"{relative_dir}/{name}" if relative_dir else name
+                    if file_filter is not None and file_filter.excludes_dir(name, relative_path):
+                        continue
+                    subdirs.append((entry.path, relative_path))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            ext = os.path.splitext(name)[1]
+            if ext not in wanted_extensions:
+                continue
+            if file_filter is not None:
+                relative_path = f"{relative_dir}/{name}" if relative_dir else name
+                if file_filter.excludes_file(name, relative_path):
+                    continue
+            yield entry.path, ext
+
+        # Reverse so that subdirectories are visited in sorted order
+        stack.extend(reversed(subdirs))
+
+def group_by_extension(candidates: Iterable[Tuple[str, str]], extensions: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Sort candidate files into one bucket per extension.
+
+    Args:
+        candidates (Iterable[Tuple[str, str]]): (file path, extension) pairs, e.g. from `walk_repository`.
+        extensions (Iterable[str]): The extensions to create buckets for, in priority order.
+
+    Returns:
+        Dict[str, List[str]]: File paths keyed by extension, keys ordered like `extensions`.
+    """
+    buckets = {ext: [] for ext in extensions}
+    for file_path, ext in candidates:
+        if ext in buckets:
+            buckets[ext].append(file_path)
+    return buckets
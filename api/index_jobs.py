@@ -0,0 +1,210 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from api.config import configs
+from api.index_progress import IndexCancelled, IndexProgress, track_progress
+from api.rag import RAG
+from api.retriever_registry import make_repo_key
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class IndexJob:
+    """
+    One background indexing run of a repository.
+
+    The status moves from "queued" to "running" and ends as "completed", "failed"
+    or "cancelled". Per-stage progress is kept in `progress`.
+    """
+
+    def __init__(self, repo_url: str, type: str = "github", access_token: str = None, ref: str = None,
+                 excluded_dirs: List[str] = None, excluded_files: List[str] = None):
+        self.job_id = uuid.uuid4().hex
+        self.repo_url = repo_url
+        self.type = type
+        self.access_token = access_token
+        self.ref = ref
+        self.excluded_dirs = excluded_dirs
+        self.excluded_files = excluded_files
+        self.repo_key = make_repo_key(repo_url, ref, excluded_dirs, excluded_files)
+        self.status = "queued"
+        self.progress = IndexProgress()
+        self.error: Optional[str] = None
+        self.document_count: Optional[int] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        """Describe the job for API responses; the access token is never included."""
+        return {
+            "job_id": self.job_id,
+            "repo_url": self.repo_url,
+            "type": self.type,
+            "ref": self.ref,
+            "status": self.status,
+            "stages": self.progress.snapshot(),
+            "document_count": self.document_count,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class IndexJobQueue:
+    """
+    Runs indexing jobs on a bounded pool of worker threads.
+
+    Submitting a repository that already has a queued or running job with the same
+    ref and exclusions returns that job instead of starting another.
+
+    Args:
+        max_workers (int): Number of jobs that run at the same time.
+        job_ttl_seconds (float): How long finished jobs stay queryable.
+    """
+
+    def __init__(self, max_workers: int = 2, job_ttl_seconds: float = 3600):
+        self.job_ttl_seconds = job_ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="index-job")
+        self._jobs: Dict[str, IndexJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, repo_url: str, type: str = "github", access_token: str = None, ref: str = None,
+               excluded_dirs: List[str] = None, excluded_files: List[str] = None) -> IndexJob:
+        """
+        Enqueue a repository for indexing.
+
+        Returns:
+            IndexJob: The new job, or the active job indexing the same repository.
+        """
+        job = IndexJob(repo_url, type, access_token, ref, excluded_dirs, excluded_files)
+        with self._lock:
+            self._prune()
+            active = self._find_active(job.repo_key)
+            if active is not None:
+                return active
+            self._jobs[job.job_id] = job
+            job.future = self._executor.submit(self._run, job)
+        logger.info(f"Queued indexing job {job.job_id} for {repo_url}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find_active(self, repo_key: tuple) -> Optional[IndexJob]:
+        """Get the queued or running job for a repository key, see `make_repo_key`."""
+        with self._lock:
+            return self._find_active(repo_key)
+
+    def _find_active(self, repo_key: tuple) -> Optional[IndexJob]:
+        for job in self._jobs.values():
+            if job.repo_key == repo_key and not job.finished:
+                return job
+        return None
+
+    def cancel(self, job_id: str) -> Optional[IndexJob]:
+        """
+        Cancel a job. A queued job never starts; a running job stops at its next progress report.
+
+        Returns:
+            Optional[IndexJob]: The job, or None if it does not exist.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.progress.cancel_event.set()
+            if job.future.cancel():
+                job.finished_at = time.time()
+                job.status = "cancelled"
+        logger.info(f"Cancellation requested for indexing job {job_id}")
+        return job
+
+    async def wait(self, job: IndexJob, timeout: float) -> bool:
+        """
+        Wait for a job without blocking the event loop.
+
+        Returns:
+            bool: Whether the job finished within `timeout` seconds.
+        """
+        if not job.finished and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                # The job was cancelled before it started, not the waiting task
+                if not job.future.cancelled():
+                    raise
+        return job.finished
+
+    def _run(self, job: IndexJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            with track_progress(job.progress):
+                rag = RAG()
+                # Always clones or fetches and indexes what changed, then registers the new retriever
+                rag.prepare_retriever(job.repo_url, job.type, job.access_token,
+                                      job.excluded_dirs, job.excluded_files, job.ref)
+            job.document_count = len(rag.transformed_docs)
+            job.progress.update("index_written", count=job.document_count)
+            status = "completed"
+        except IndexCancelled:
+            status = "cancelled"
+        except Exception as e:
+            logger.error(f"Indexing job {job.job_id} for {job.repo_url} failed: {e}")
+            job.error = str(e)
+            status = "failed"
+        # finished_at is set first so that a finished job always has it
+        job.finished_at = time.time()
+        job.status = status
+        logger.info(f"Indexing job {job.job_id} {status} in {job.finished_at - job.started_at:.1f}s")
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        """Cancel every job and stop the workers."""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_index_job_queue() -> IndexJobQueue:
+    """Get the process-wide job queue configured by `indexing` in repo.json."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            indexing_config = configs.get("indexing", {})
+            _job_queue = IndexJobQueue(
+                max_workers=indexing_config.get("max_workers", 2),
+                job_ttl_seconds=indexing_config.get("job_ttl_seconds", 3600),
+            )
+        return _job_queue
+
+def shutdown_index_job_queue() -> None:
+    """Cancel the jobs of the process-wide queue and stop its workers, if it was created."""
+    global _job_queue
+    with _job_queue_lock:
+        job_queue, _job_queue = _job_queue, None
+    if job_queue is not None:
+        job_queue.shutdown()
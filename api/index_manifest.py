@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def content_hash(text: str) -> str:
+    """
+    Hash the content of a file for change detection.
+
+    Args:
+        text (str): The file content.
+
+    Returns:
+        str: The hex SHA-256 digest of the UTF-8 encoded content.
+    """
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+def get_manifest_path(db_path: str) -> str:
+    """
+    Get the manifest path stored next to a database file.
+
+    Args:
+        db_path (str): The path of the database, e.g. ~/.adalflow/databases/{repo}.store
+
+    Returns:
+        str: The manifest path, e.g. ~/.adalflow/databases/{repo}.manifest.json
+    """
+    return f"{os.path.splitext(db_path)[0]}.manifest.json"
+
+class IndexManifest:
+    """
+    Per-file record of what a repository database contains.
+
+    Every indexed file maps to the hash of the content it was indexed from and the
+    ids of the chunks it was split into. The chunks themselves, including their
+    vectors, live in the database, so a file whose hash is unchanged can reuse
+    them without being split or embedded again.
+
+    For git clones, `commit` is the commit the files were read at, so the next build
+    only has to read the files changed since then.
+    """
+
+    VERSION = 1
+
+    def __init__(self, files: Dict[str, dict] = None, commit: Optional[str] = None):
+        self.files: Dict[str, dict] = files or {}
+        self.commit = commit
+
+    def set_file(self, file_path: str, file_hash: str, chunk_ids: List[str]) -> None:
+        self.files[file_path] = {"content_hash": file_hash, "chunk_ids": list(chunk_ids)}
+
+    def get_reusable_chunk_ids(self, file_path: str, file_hash: str, available_ids) -> Optional[List[str]]:
+        """
+        Get the chunk ids of a file if it is unchanged and all of its chunks are still available.
+
+        Args:
+            file_path (str): The path of the file relative to the repository root.
+            file_hash (str): The hash of the current file content.
+            available_ids: Container of chunk ids present in the database.
+
+        Returns:
+            Optional[List[str]]: The chunk ids to reuse, or None if the file must be re-indexed.
+        """
+        entry = self.files.get(file_path)
+        if not entry or entry.get("content_hash") != file_hash:
+            return None
+        chunk_ids = entry.get("chunk_ids", [])
+        if not all(chunk_id in available_ids for chunk_id in chunk_ids):
+            return None
+        return chunk_ids
+
+    @classmethod
+    def from_db(cls, db, key: str = "split_and_embed") -> "IndexManifest":
+        """
+        Rebuild a manifest from a database created before manifests existed.
+
+        Args:
+            db (LocalDB): The database holding original documents and their chunks.
+            key (str): The transformer key of the chunks.
+
+        Returns:
+            IndexManifest: The manifest describing the database.
+        """
+        chunk_ids_by_parent: Dict[str, List[tuple]] = {}
+        for chunk in db.get_transformed_data(key=key):
+            chunk_ids_by_parent.setdefault(str(chunk.parent_doc_id), []).append((chunk.order or 0, chunk.id))
+
+        manifest = cls()
+        for doc in db.items:
+            file_path = (doc.meta_data or {}).get("file_path")
+            if not file_path:
+                continue
+            chunks = sorted(chunk_ids_by_parent.get(str(doc.id), []))
+            manifest.set_file(file_path, content_hash(doc.text), [chunk_id for _, chunk_id in chunks])
+        return manifest
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IndexManifest"]:
+        """
+        Load a manifest from disk.
+
+        Args:
+            path (str): The manifest path.
+
+        Returns:
+            Optional[IndexManifest]: The manifest, or None if it does not exist or cannot be read.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != cls.VERSION:
+                logger.warning(f"Ignoring manifest {path} with unsupported version {data.get('version')}")
+                return None
+            return cls(files=data.get("files", {}), commit=data.get("commit"))
+        except Exception as e:
+            logger.error(f"Error reading manifest {path}: {e}")
+            return None
+
+    def save(self, path: str) -> None:
+        """
+        Save the manifest to disk.
+
+        Args:
+            path (str): The manifest path.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "commit": self.commit, "files": self.files}, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,68 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Indexing stages in the order they complete
+STAGES = ("cloned", "files_read", "chunks_split", "chunks_embedded", "index_written")
+
+class IndexCancelled(Exception):
+    """Raised inside an indexing run whose job was cancelled."""
+
+class IndexProgress:
+    """
+    Progress of one indexing run, updated from the pipeline through `report_progress`.
+    Setting `cancel_event` stops the run at its next progress report.
+    """
+
+    def __init__(self):
+        self.stages = {stage: {"done": False, "count": None, "total": None} for stage in STAGES}
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def update(self, stage: str, count: Optional[int] = None, total: Optional[int] = None, done: bool = True) -> None:
+        with self._lock:
+            entry = self.stages[stage]
+            if count is not None:
+                entry["count"] = count
+            if total is not None:
+                entry["total"] = total
+            if done:
+                # Completing a stage completes every stage before it
+                for previous in STAGES[:STAGES.index(stage) + 1]:
+                    self.stages[previous]["done"] = True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {stage: dict(entry) for stage, entry in self.stages.items()}
+
+_current_progress: ContextVar[Optional[IndexProgress]] = ContextVar("index_progress", default=None)
+
+@contextmanager
+def track_progress(progress: IndexProgress):
+    """Route `report_progress` calls made in this context, including asyncio tasks started from it, to `progress`."""
+    token = _current_progress.set(progress)
+    try:
+        yield progress
+    finally:
+        _current_progress.reset(token)
+
+def report_progress(stage: str, count: Optional[int] = None, total: Optional[int] = None, done: bool = True) -> None:
+    """
+    Report indexing progress to the tracked job, if any, and stop the run if the job was cancelled.
+
+    Args:
+        stage (str): One of `STAGES`.
+        count (int, optional): Items processed in this stage so far.
+        total (int, optional): Items this stage will process.
+        done (bool): Whether the stage is complete.
+
+    Raises:
+        IndexCancelled: If the tracked job was cancelled.
+    """
+    progress = _current_progress.get()
+    if progress is None:
+        return
+    if progress.cancel_event.is_set():
+        raise IndexCancelled("Indexing was cancelled")
+    progress.update(stage, count, total, done)
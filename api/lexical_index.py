@@ -0,0 +1,256 @@
+import os
+import re
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from adalflow.core.types import Document, RetrieverOutput
+
+from api.chunk_store import ChunkStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+# Parts of a camelCase or PascalCase word: "parseHTTPResponse2" -> parse, HTTP, Response, 2
+_CAMEL_PART_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms, breaking identifiers at snake_case and camelCase boundaries.
+
+    The whole identifier is kept as well, so exact names rank above texts that only
+    share its parts: "getUserName" gives "getusername", "get", "user", "name".
+
+    Args:
+        text (str): Code or prose.
+
+    Returns:
+        List[str]: The terms, in order, with repeats.
+    """
+    terms = []
+    for word in _WORD_PATTERN.findall(text):
+        parts = [part for piece in word.split("_") for part in _CAMEL_PART_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            terms.append(word.lower())
+        terms.extend(part.lower() for part in parts if len(part) > 1 or part.isdigit())
+    return terms
+
+def get_lexical_index_path(db_path: str) -> str:
+    """
+    Get the BM25 index path stored next to a database file.
+
+    Args:
+        db_path (str): The path of the database, e.g. ~/.adalflow/databases/{repo}.store
+
+    Returns:
+        str: The index path, e.g. ~/.adalflow/databases/{repo}.bm25.npz
+    """
+    return f"{os.path.splitext(db_path)[0]}.bm25.npz"
+
+class BM25Index:
+    """
+    BM25 inverted index over chunk texts.
+
+    Postings are kept in flat arrays: the postings of term i are
+    `doc_ids[term_offsets[i]:term_offsets[i + 1]]` with matching `term_freqs`.
+
+    Args:
+        terms (List[str]): The vocabulary, sorted.
+        term_offsets (np.ndarray): Start of each term's postings, plus the end.
+        doc_ids (np.ndarray): Chunk positions of all postings.
+        term_freqs (np.ndarray): Term frequency of each posting.
+        doc_lengths (np.ndarray): Number of terms in each chunk.
+        k1 (float): Term frequency saturation.
+        b (float): Length normalization.
+    """
+
+    def __init__(self, terms: List[str], term_offsets: np.ndarray, doc_ids: np.ndarray, term_freqs: np.ndarray,
+                 doc_lengths: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.terms = terms
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def memory_bytes(self) -> int:
+        # Postings arrays, plus each term held in the vocabulary list and the term id map
+        arrays = self.term_offsets.nbytes + self.doc_ids.nbytes + self.term_freqs.nbytes + self.doc_lengths.nbytes
+        return arrays + sum(2 * len(term) + 150 for term in self.terms)
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Index chunk texts; posting doc ids are positions in `texts`.
+
+        Returns:
+            BM25Index: The index.
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize_code(text or ""))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        doc_ids = np.empty(term_offsets[-1], dtype=np.int32)
+        term_freqs = np.empty(term_offsets[-1], dtype=np.int32)
+        for i, term in enumerate(terms):
+            entries = np.array(postings[term], dtype=np.int32)
+            doc_ids[term_offsets[i]:term_offsets[i + 1]] = entries[:, 0]
+            term_freqs[term_offsets[i]:term_offsets[i + 1]] = entries[:, 1]
+        return cls(terms, term_offsets, doc_ids, term_freqs, doc_lengths, k1, b)
+
+    def search(self, query: str, top_k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank chunks by BM25 score for a query.
+
+        Args:
+            query (str): The query.
+            top_k (int): Number of chunks to return at most.
+            allowed (np.ndarray, optional): Sorted positions of the chunks that may be returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Chunk positions and scores, best first; only
+            chunks that contain a query term are returned.
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_doc_length, 1e-9))
+        for term in set(tokenize_code(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            freqs = self.term_freqs[start:end].astype(np.float32)
+            idf = np.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + length_norm[docs])
+
+        matched = np.flatnonzero(scores) if allowed is None else allowed[np.flatnonzero(scores[allowed])]
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return order, scores[order]
+
+    def save(self, path: str) -> None:
+        """Write the index compressed, under a temporary name that is renamed into place."""
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            terms=np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+            term_offsets=self.term_offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            blob = data["terms"].tobytes().decode("utf-8")
+            k1, b = data["params"]
+            return cls(blob.split("\n") if blob else [], data["term_offsets"], data["doc_ids"],
+                       data["term_freqs"], data["doc_lengths"], float(k1), float(b))
+
+def save_lexical_index(documents: List[Document], index_path: str, k1: float = 1.2, b: float = 0.75) -> None:
+    """
+    Build the BM25 index of a database and write it next to the database.
+
+    Args:
+        documents (List[Document]): Chunks, in database order.
+        index_path (str): The index path, see `get_lexical_index_path`.
+    """
+    if not documents:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        return
+    if isinstance(documents, ChunkStore):
+        texts = [documents.text(i) for i in range(len(documents))]
+    else:
+        texts = [doc.text for doc in documents]
+    index = BM25Index.build(texts, k1, b)
+    index.save(index_path)
+    logger.info(f"Saved BM25 index with {len(index.terms)} terms over {index.size} chunks to {index_path}")
+
+def load_lexical_index(index_path: str, expected_size: Optional[int] = None) -> Optional[BM25Index]:
+    """
+    Load a saved BM25 index.
+
+    Args:
+        index_path (str): The index path, see `get_lexical_index_path`.
+        expected_size (int, optional): The number of chunks in the database; an index of
+            any other size is stale and ignored.
+
+    Returns:
+        Optional[BM25Index]: The index, or None if it is missing, unreadable or stale.
+    """
+    if not os.path.exists(index_path):
+        return None
+    try:
+        index = BM25Index.load(index_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Error reading BM25 index {index_path}: {e}")
+        return None
+    if expected_size is not None and index.size != expected_size:
+        logger.warning(f"Ignoring stale BM25 index {index_path}: {index.size} chunks, expected {expected_size}")
+        return None
+    return index
+
+class HybridRetriever:
+    """
+    Combines a dense retriever with a BM25 index by reciprocal rank fusion.
+
+    In "lexical" mode only the BM25 index is searched, so queries need no embedding call.
+
+    Args:
+        dense_retriever: A FAISS retriever over the same chunks, in the same order.
+        lexical_index (BM25Index): The BM25 index of the chunks.
+        top_k (int): Number of chunks to retrieve.
+        mode (str): "hybrid" or "lexical".
+        rrf_k (int): Rank offset of reciprocal rank fusion; larger values flatten the ranks.
+        candidates (int): Chunks taken from each ranking before fusion.
+    """
+
+    def __init__(self, dense_retriever, lexical_index: BM25Index, top_k: int = 20, mode: str = "hybrid",
+                 rrf_k: int = 60, candidates: int = 50):
+        if mode not in ("hybrid", "lexical"):
+            raise ValueError(f"Unsupported retrieval mode: {mode}")
+        self.dense_retriever = dense_retriever
+        self.lexical_index = lexical_index
+        self.top_k = top_k
+        self.mode = mode
+        self.rrf_k = rrf_k
+        self.candidates = max(candidates, top_k)
+
+    def __call__(self, input: str, top_k: Optional[int] = None,
+                 allowed: Optional[np.ndarray] = None) -> List[RetrieverOutput]:
+        top_k = top_k or self.top_k
+        lexical_ids, lexical_scores = self.lexical_index.search(input, self.candidates, allowed)
+        if self.mode == "lexical":
+            return [RetrieverOutput(doc_indices=lexical_ids[:top_k].tolist(),
+                                    doc_scores=lexical_scores[:top_k].tolist(), query=input)]
+
+        dense_output = self.dense_retriever(input, top_k=self.candidates, allowed=allowed)[0]
+        fused: Dict[int, float] = {}
+        for ranking in (dense_output.doc_indices, lexical_ids.tolist()):
+            for rank, doc_id in enumerate(ranking):
+                fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [RetrieverOutput(doc_indices=[doc_id for doc_id, _ in ranked],
+                                doc_scores=[score for _, score in ranked], query=input)]
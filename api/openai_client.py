@@ -25,7 +25,7 @@ from openai.types.chat.chat_completion import Choice
 
 openai = safe_import(OptionalPackages.OPENAI.value[0], OptionalPackages.OPENAI.value[1])
 
-from openai import OpenAI, AsyncOpenAI, Stream
+from openai import Stream
 from openai import (
     APITimeoutError,
     InternalServerError,
@@ -50,6 +50,8 @@ from adalflow.core.types import (
 )
 from adalflow.components.model_client.utils import parse_embedding_response
 
+from api.client_pool import get_async_client, get_sync_client
+
 log = logging.getLogger(__name__)
 T = TypeVar("T")
 
@@ -193,7 +195,7 @@ class OpenAIClient(ModelClient):
             raise ValueError(
                 f"Environment variable {self._env_api_key_name} must be set"
             )
-        return OpenAI(api_key=api_key, base_url=self.base_url)
+        return get_sync_client(self.base_url, api_key)
 
     def init_async_client(self):
         api_key = self._api_key or os.getenv(self._env_api_key_name)
@@ -201,7 +203,7 @@ class OpenAIClient(ModelClient):
             raise ValueError(
                 f"Environment variable {self._env_api_key_name} must be set"
             )
-        return AsyncOpenAI(api_key=api_key, base_url=self.base_url)
+        return get_async_client(self.base_url, api_key)
 
     # def _parse_chat_completion(self, completion: ChatCompletion) -> "GeneratorOutput":
     #     # TODO: raw output it is better to save the whole completion as a source of truth instead of just the message
@@ -493,8 +495,8 @@ class OpenAIClient(ModelClient):
         """
         # store the api kwargs in the client
         self._api_kwargs = api_kwargs
-        if self.async_client is None:
-            self.async_client = self.init_async_client()
+        # The pooled async client of the running event loop
+        self.async_client = self.init_async_client()
         if model_type == ModelType.EMBEDDER:
             return await self.async_client.embeddings.create(**api_kwargs)
         elif model_type == ModelType.LLM:
@@ -522,7 +524,7 @@ class OpenAIClient(ModelClient):
         obj = super().from_dict(data)
         # recreate the existing clients
         obj.sync_client = obj.init_sync_client()
-        obj.async_client = obj.init_async_client()
+        obj.async_client = None  # bound to an event loop, created by acall
         return obj
 
     def to_dict(self) -> Dict[str, Any]:
@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.config import configs
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU mapping with hit and miss counters.
+
+    Args:
+        maxsize (int): Entries kept; the least recently used are dropped beyond it.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard_where(self, predicate) -> int:
+        """Drop the entries whose key matches `predicate`; returns how many were dropped."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+class QueryResultCache:
+    """
+    LRU cache of retrieval results keyed by (repository key, index version, query, top_k, filters).
+
+    The cache remembers the index version last seen for each repository; a lookup or
+    store with a different version drops the results of the old one.
+
+    Args:
+        maxsize (int): Results kept across all repositories.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self._results = LRUCache(maxsize)
+        self._versions: Dict[tuple, Optional[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def _check_version(self, repo_key: tuple, index_version: Optional[tuple]) -> None:
+        with self._lock:
+            if repo_key in self._versions and self._versions[repo_key] == index_version:
+                return
+            stale = repo_key in self._versions
+            self._versions[repo_key] = index_version
+        if stale:
+            self._results.discard_where(lambda key: key[0] == repo_key and key[1] != index_version)
+
+    def get(self, repo_key: tuple, index_version: Optional[tuple], query: str, top_k: int,
+            filters: Optional[tuple] = None) -> Optional[Tuple[List[int], List[float]]]:
+        """
+        Get cached results.
+
+        Returns:
+            Optional[Tuple[List[int], List[float]]]: Document indices and scores, or None.
+        """
+        self._check_version(repo_key, index_version)
+        return self._results.get((repo_key, index_version, query, top_k, filters))
+
+    def put(self, repo_key: tuple, index_version: Optional[tuple], query: str, top_k: int,
+            filters: Optional[tuple], doc_indices: List[int], doc_scores: List[float]) -> None:
+        self._check_version(repo_key, index_version)
+        self._results.put((repo_key, index_version, query, top_k, filters), (list(doc_indices), list(doc_scores)))
+
+    def invalidate(self, repo_key: tuple) -> None:
+        """Drop every cached result of a repository."""
+        with self._lock:
+            self._versions.pop(repo_key, None)
+        self._results.discard_where(lambda key: key[0] == repo_key)
+
+    def stats(self) -> dict:
+        return self._results.stats()
+
+_embedding_cache: Optional[LRUCache] = None
+_result_cache: Optional[QueryResultCache] = None
+_caches_lock = threading.Lock()
+
+def _get_cache_config() -> dict:
+    return configs.get("query_cache", {})
+
+def get_query_embedding_cache() -> LRUCache:
+    """Get the process-wide cache of query embeddings keyed by (model, dimensions, query)."""
+    global _embedding_cache
+    with _caches_lock:
+        if _embedding_cache is None:
+            _embedding_cache = LRUCache(_get_cache_config().get("max_embeddings", 4096))
+        return _embedding_cache
+
+def get_query_result_cache() -> QueryResultCache:
+    """Get the process-wide cache of retrieval results configured by `query_cache` in embedder.json."""
+    global _result_cache
+    with _caches_lock:
+        if _result_cache is None:
+            _result_cache = QueryResultCache(_get_cache_config().get("max_results", 10000))
+        return _result_cache
@@ -0,0 +1,194 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Optional, Sequence, Tuple, Union
+
+from adalflow.core.model_client import ModelClient
+from adalflow.core.types import Embedding, EmbedderOutput, ModelType
+
+from api.config import configs
+from api.query_cache import LRUCache, get_query_embedding_cache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class QueryEmbeddingBatcher:
+    """
+    Coalesces query embeddings requested concurrently from many threads into batched calls.
+
+    The first waiting query opens a window; queries that arrive within `window_ms`, up to
+    `max_batch_size` of them, are embedded with one `embeddings.create` call and each caller
+    gets its own vector back. Instances are callable like an `adal.Embedder`, so they can
+    be used as the query embedder of a retriever.
+
+    Args:
+        model_client (ModelClient): The embedding model client.
+        model_kwargs (dict): Model arguments such as model and dimensions.
+        window_ms (float): How long a batch waits for more queries.
+        max_batch_size (int): Queries per call; a full batch is sent at once.
+        max_in_flight (int): Batches sent at the same time.
+        cache (LRUCache, optional): Vectors of earlier queries keyed by (model, dimensions, query).
+        timeout_seconds (float): How long a caller waits for its batch before embedding its
+            queries with a direct call instead, e.g. when the dispatcher has stopped.
+    """
+
+    def __init__(self, model_client: ModelClient, model_kwargs: dict, window_ms: float = 5,
+                 max_batch_size: int = 64, max_in_flight: int = 8, cache: Optional[LRUCache] = None,
+                 timeout_seconds: float = 30):
+        self.model_client = model_client
+        self.model_kwargs = model_kwargs
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout_seconds
+        self.cache = cache
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._senders = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="query-embed")
+        self._dispatcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.calls = 0
+        self.queries = 0
+
+    def __call__(self, input: Union[str, Sequence[str]]) -> EmbedderOutput:
+        """
+        Embed one query or a list of queries, blocking until their batch is answered.
+        Queries embedded before are served from the cache. Queries whose batch is not
+        answered within the timeout, or that arrive after `close`, are embedded directly.
+
+        Returns:
+            EmbedderOutput: One embedding per query, in order.
+        """
+        texts = [input] if isinstance(input, str) else list(input)
+        vectors = [self.cache.get(self._cache_key(text)) if self.cache is not None else None for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        try:
+            futures = {i: self.submit(texts[i]) for i in missing}
+        except RuntimeError as e:
+            logger.warning(f"{e}, embedding {len(missing)} queries directly")
+            futures = {}
+        deadline = time.monotonic() + self.timeout
+        for i, future in futures.items():
+            try:
+                vectors[i] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                # The batch may still be answered later; its result is then dropped
+                logger.warning(f"Query embedding batch not answered within {self.timeout}s, embedding directly")
+                break
+        unanswered = [i for i in missing if vectors[i] is None]
+        if unanswered:
+            for i, vector in zip(unanswered, self._embed([texts[i] for i in unanswered])):
+                vectors[i] = vector
+        if self.cache is not None:
+            for i in missing:
+                self.cache.put(self._cache_key(texts[i]), vectors[i])
+        return EmbedderOutput(
+            data=[Embedding(embedding=vector, index=i) for i, vector in enumerate(vectors)],
+            model=self.model_kwargs.get("model"),
+        )
+
+    def _cache_key(self, text: str) -> tuple:
+        return self.model_kwargs.get("model"), self.model_kwargs.get("dimensions"), text
+
+    def submit(self, text: str) -> Future:
+        """Queue one query; the future resolves to its vector."""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Query embedding batcher is closed")
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="query-embed-dispatch", daemon=True)
+                self._dispatcher.start()
+            self._queue.put((text, future))
+        return future
+
+    def _dispatch(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._senders.shutdown(wait=False)
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._senders.submit(self._send, batch)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with one call to the model client."""
+        api_kwargs = self.model_client.convert_inputs_to_api_kwargs(
+            input=texts, model_kwargs=self.model_kwargs, model_type=ModelType.EMBEDDER
+        )
+        response = self.model_client.call(api_kwargs=api_kwargs, model_type=ModelType.EMBEDDER)
+        output = self.model_client.parse_embedding_response(response)
+        if output.error:
+            raise RuntimeError(output.error)
+        vectors = [item.embedding for item in sorted(output.data, key=lambda item: item.index)]
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"Expected {len(texts)} query embeddings, got {len(vectors)}")
+        return vectors
+
+    def _send(self, batch: List[Tuple[str, Future]]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            vectors = self._embed(texts)
+        except Exception as e:
+            logger.error(f"Error embedding {len(batch)} queries: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.calls += 1
+            self.queries += len(batch)
+        logger.debug(f"Embedded {len(batch)} queries in one call")
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def close(self) -> None:
+        """Stop dispatching once the queued queries are sent."""
+        with self._lock:
+            self._closed = True
+            if self._dispatcher is None:
+                self._senders.shutdown(wait=False)
+            else:
+                self._queue.put(None)
+
+_batcher: Optional[QueryEmbeddingBatcher] = None
+_batcher_lock = threading.Lock()
+
+def get_query_embedding_batcher() -> QueryEmbeddingBatcher:
+    """Get the process-wide query embedder configured by `embedder` and its `query_batching` in embedder.json."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            embedder_config = configs["embedder"]
+            batching_config = embedder_config.get("query_batching", {})
+            _batcher = QueryEmbeddingBatcher(
+                embedder_config["model_client"](),
+                embedder_config["model_kwargs"],
+                window_ms=batching_config.get("window_ms", 5),
+                max_batch_size=batching_config.get("max_batch_size", 64),
+                max_in_flight=batching_config.get("max_in_flight", 8),
+                cache=get_query_embedding_cache(),
+                timeout_seconds=batching_config.get("timeout_seconds", 30),
+            )
+        return _batcher
+
+def shutdown_query_embedding_batcher() -> None:
+    """Close the process-wide query embedder, if it was created."""
+    global _batcher
+    with _batcher_lock:
+        batcher, _batcher = _batcher, None
+    if batcher is not None:
+        batcher.close()
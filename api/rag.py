@@ -1,10 +1,11 @@
 import logging
 import re
 from dataclasses import dataclass
-from typing import Any, List, Tuple, Dict
+from typing import Any, List, Optional, Tuple, Dict
 from uuid import uuid4
 
 import adalflow as adal
+import numpy as np
 
 
 # Create our own implementation of the conversation classes
@@ -35,9 +36,18 @@ class CustomConversation:
         self.dialog_turns.append(dialog_turn)
 
 # Import other adalflow components
-from adalflow.components.retriever.faiss_retriever import FAISSRetriever
+from adalflow.core.types import RetrieverOutput
+from api.chunk_store import ChunkStore
 from api.config import configs
-from api.data_pipeline import DatabaseManager
+from api.data_pipeline import DatabaseManager, get_index_age
+from api.lexical_index import HybridRetriever, load_lexical_index
+from api.query_cache import get_query_result_cache
+from api.query_embedder import get_query_embedding_batcher
+from api.vector_index import PrebuiltFAISSRetriever, build_index, load_index
+from api.exact_retriever import ExactRetriever, use_exact_retriever
+from api.retrieval_filters import FilterIndex, RetrievalFilters
+from api.retriever_registry import get_index_version, get_retriever_registry, make_repo_key
+from api.symbol_index import load_symbol_index
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -45,6 +55,11 @@ logger = logging.getLogger(__name__)
 # Maximum token limit for embedding models
 MAX_INPUT_TOKENS = 7500  # Safe threshold below 8192 token limit
 
+def normalize_file_path(file_path: str) -> str:
+    """Normalize a requested file path to the "/"-separated, repository-relative form paths are indexed by."""
+    file_path = file_path.strip().replace("\\", "/").lstrip("/")
+    return file_path[2:] if file_path.startswith("./") else file_path
+
 class Memory(adal.core.component.DataComponent):
     """Simple conversation management with a list of dialog turns."""
 
@@ -203,7 +218,8 @@ class RAGAnswer(adal.DataClass):
 
 class RAG(adal.Component):
     """RAG with one repo.
-    If you want to load a new repos, call prepare_retriever(repo_url_or_path) first."""
+    If you want to load a new repos, call open_retriever(repo_url_or_path) first, or
+    prepare_retriever(repo_url_or_path) to index it."""
 
     def __init__(self, provider="openai", model=None, use_s3: bool = False):  # noqa: F841 - use_s3 is kept for compatibility
         """
@@ -231,23 +247,21 @@ class RAG(adal.Component):
             model_kwargs=embedder_config["model_kwargs"],
         )
 
-        # Patch: ensure query embedding is always single string for OpenAI
-        def single_string_embedder(query):
-            # Accepts either a string or a list, always returns embedding for a single string
-            if isinstance(query, list):
-                if len(query) != 1:
-                    raise ValueError("OpenAI embedder only supports a single string")
-                query = query[0]
-            return self.embedder(input=query)
-        self.query_embedder = single_string_embedder
+        # Queries of concurrent requests are embedded together in batched calls
+        self.query_embedder = get_query_embedding_batcher()
 
         self.initialize_db_manager()
+        self._generator = None
 
-        # Set up the output parser
-        data_parser = adal.DataClassParser(data_class=RAGAnswer, return_data_class=True)
+    @property
+    def generator(self) -> adal.Generator:
+        """The answer generator, created on first use since streaming chat does not need it."""
+        if self._generator is None:
+            # Set up the output parser
+            data_parser = adal.DataClassParser(data_class=RAGAnswer, return_data_class=True)
 
-        # Format instructions to ensure proper output structure
-        format_instructions = data_parser.get_output_format_str() + """
+            # Format instructions to ensure proper output structure
+            format_instructions = data_parser.get_output_format_str() + """
 
 IMPORTANT FORMATTING RULES:
 1. DO NOT include your thinking or reasoning process in the output
@@ -260,24 +274,24 @@ IMPORTANT FORMATTING RULES:
 8. When listing tags or similar items, write them as plain text without escape characters
 9. For pipe characters (|) in text, write them directly without escaping them"""
 
-        # Get model configuration based on provider and model
-        from api.config import get_model_config
-        generator_config = get_model_config(self.provider, self.model)
-
-        # Set up the main generator
-        self.generator = adal.Generator(
-            template=RAG_TEMPLATE,
-            prompt_kwargs={
-                "output_format_str": format_instructions,
-                "conversation_history": self.memory(),
-                "system_prompt": system_prompt,
-                "contexts": None,
-            },
-            model_client=generator_config["model_client"](),
-            model_kwargs=generator_config["model_kwargs"],
-            output_processors=data_parser,
-        )
-
+            # Get model configuration based on provider and model
+            from api.config import get_model_config
+            generator_config = get_model_config(self.provider, self.model)
+
+            # Set up the main generator
+            self._generator = adal.Generator(
+                template=RAG_TEMPLATE,
+                prompt_kwargs={
+                    "output_format_str": format_instructions,
+                    "conversation_history": self.memory(),
+                    "system_prompt": system_prompt,
+                    "contexts": None,
+                },
+                model_client=generator_config["model_client"](),
+                model_kwargs=generator_config["model_kwargs"],
+                output_processors=data_parser,
+            )
+        return self._generator
 
     def initialize_db_manager(self):
         """Initialize the database manager with local storage"""
@@ -285,48 +299,233 @@ IMPORTANT FORMATTING RULES:
         self.transformed_docs = []
 
     def prepare_retriever(self, repo_url_or_path: str, type: str = "github", access_token: str = None, 
-                      excluded_dirs: List[str] = None, excluded_files: List[str] = None):
+                      excluded_dirs: List[str] = None, excluded_files: List[str] = None, ref: str = None):
         """
         Prepare the retriever for a repository.
-        Will load database from local storage if available.
+        Clones or refreshes the repository and indexes what changed, so this belongs in
+        indexing jobs; request handlers use `open_retriever`.
 
         Args:
             repo_url_or_path: URL or local path to the repository
             access_token: Optional access token for private repositories
             excluded_dirs: Optional list of directories to exclude from processing
             excluded_files: Optional list of file patterns to exclude from processing
+            ref: Optional branch, tag or commit to index
         """
         self.initialize_db_manager()
         self.repo_url_or_path = repo_url_or_path
+        self.repo_key = make_repo_key(repo_url_or_path, ref, excluded_dirs, excluded_files)
         self.transformed_docs = self.db_manager.prepare_database(
             repo_url_or_path, 
             type, 
             access_token, 
             excluded_dirs=excluded_dirs,
-            excluded_files=excluded_files
+            excluded_files=excluded_files,
+            ref=ref
         )
         logger.info(f"Loaded {len(self.transformed_docs)} documents for retrieval")
+        self._load_retriever()
+
+    def open_retriever(self, repo_url_or_path: str, excluded_dirs: List[str] = None,
+                       excluded_files: List[str] = None, ref: str = None) -> bool:
+        """
+        Open the retriever of a repository as it was last indexed, without cloning or embedding.
+
+        A retriever prepared by an earlier request is reused while it is fresh, otherwise the
+        database of this ref and exclusion set is opened from disk. `self.retriever_fresh` is
+        False when that database was last built or checked more than `refresh_interval_seconds`
+        (repo.json) ago; the caller should then submit a refresh to the indexing job queue.
+
+        Args:
+            repo_url_or_path: URL or local path to the repository
+            excluded_dirs: Optional list of directories excluded from the index
+            excluded_files: Optional list of file patterns excluded from the index
+            ref: Optional branch, tag or commit that was indexed
 
+        Returns:
+            bool: Whether a retriever is ready; False if the repository has to be indexed first.
+        """
+        self.initialize_db_manager()
+        self.repo_url_or_path = repo_url_or_path
+        self.repo_key = make_repo_key(repo_url_or_path, ref, excluded_dirs, excluded_files)
+
+        # Serve a retriever prepared by an earlier request while it is fresh
+        entry = get_retriever_registry().get(self.repo_key)
+        self.retriever_fresh = entry is not None
+        if entry is not None:
+            self.retriever = entry.retriever
+            self.transformed_docs = entry.documents
+            self.filter_index = entry.filter_index
+            self.symbol_index = entry.symbol_index
+            self.index_version = entry.index_version
+            logger.info(f"Using cached retriever with {len(self.transformed_docs)} documents")
+            return True
+
+        documents = self.db_manager.open_database(repo_url_or_path, excluded_dirs, excluded_files, ref)
+        if documents is None:
+            return False
+        age = get_index_age(repo_url_or_path, ref, excluded_dirs, excluded_files)
+        self.retriever_fresh = age is not None and age < configs.get("repository", {}).get("refresh_interval_seconds", 300)
+        self.transformed_docs = documents
+        logger.info(f"Opened {len(self.transformed_docs)} indexed documents for retrieval")
+        self._load_retriever()
+        return True
+
+    def _load_retriever(self):
+        """Build the retriever over `self.transformed_docs` from the indexes saved next to them, and register it."""
         retrieve_embedder = self.query_embedder if self.provider == "openai" else self.embedder
-        self.retriever = FAISSRetriever(
-            **configs["retriever"],
-            embedder=retrieve_embedder,
-            documents=self.transformed_docs,
-            document_map_func=lambda doc: doc.vector,
-        )
+        if use_exact_retriever(len(self.transformed_docs)):
+            # Small repositories are searched with NumPy directly, without a FAISS index
+            self.retriever = ExactRetriever(
+                self.transformed_docs,
+                **configs["retriever"],
+                embedder=retrieve_embedder,
+                dtype=configs.get("vector_index", {}).get("numpy_dtype", "float32"),
+            )
+        else:
+            # Open the index saved at indexing time, memory-mapped, rather than rebuilding it
+            index = load_index(self.db_manager.repo_paths["save_index_file"], expected_size=len(self.transformed_docs))
+            if index is None:
+                index = build_index(self.transformed_docs, index_type="flat")
+            index_config = configs.get("vector_index", {})
+            self.retriever = PrebuiltFAISSRetriever(
+                index,
+                **configs["retriever"],
+                embedder=retrieve_embedder,
+                documents=self.transformed_docs,
+                rescore_factor=index_config.get("rescore_factor", 4),
+                filter_exact_max_chunks=index_config.get("filter_exact_max_chunks", 4096),
+            )
+        # Fuse with BM25 ranking, or rank by BM25 alone, when the lexical index is available
+        lexical_config = configs.get("lexical", {})
+        mode = lexical_config.get("mode", "hybrid")
+        if mode != "dense":
+            lexical_index = load_lexical_index(self.db_manager.repo_paths["save_lexical_index_file"],
+                                               expected_size=len(self.transformed_docs))
+            if lexical_index is not None:
+                self.retriever = HybridRetriever(
+                    self.retriever,
+                    lexical_index,
+                    top_k=configs["retriever"]["top_k"],
+                    mode=mode,
+                    rrf_k=lexical_config.get("rrf_k", 60),
+                    candidates=lexical_config.get("candidates", 50),
+                )
+            else:
+                logger.warning(f"No BM25 index for {self.repo_url_or_path}, using dense retrieval only")
+        # File attributes for metadata filters, turned into chunk positions before searching
+        self.filter_index = FilterIndex(self.transformed_docs)
+        # Definitions and imports of each file, for requests about one file
+        self.symbol_index = None
+        if isinstance(self.transformed_docs, ChunkStore):
+            self.symbol_index = load_symbol_index(self.db_manager.repo_paths["save_symbol_index_file"],
+                                                  expected_files=len(self.transformed_docs.files))
+        self.index_version = get_index_version(self.db_manager.repo_paths)
+        get_retriever_registry().put(self.repo_key, self.index_version, self.retriever, self.transformed_docs,
+                                     self.filter_index, self.symbol_index)
+
+    def get_file_text(self, file_path: str) -> Optional[str]:
+        """
+        Get the content of an indexed file from the chunk store.
+
+        Args:
+            file_path: The path relative to the repository root
+
+        Returns:
+            The file content, or None if the file is not indexed
+        """
+        j = self.filter_index.file_positions.get(normalize_file_path(file_path))
+        if j is None or not isinstance(self.transformed_docs, ChunkStore):
+            return None
+        return self.transformed_docs.file_text(j)
 
-    def call(self, query: str) -> Tuple[List]:
+    def lookup_file(self, file_path: str, include_own: bool = True,
+                    filters: Optional[RetrievalFilters] = None) -> Optional[List[RetrieverOutput]]:
+        """
+        Retrieve the chunks about one file by lookup in the symbol index, without embedding a query.
+
+        The file's own chunks come first, then for each file it imports the chunks defining
+        what it imports, and for each file importing it the chunks using it. A related file
+        without a particular chunk contributes its first chunks.
+
+        Args:
+            file_path: The path relative to the repository root
+            include_own: Whether to return the file's own chunks
+            filters: Optional restrictions on the files related chunks are taken from
+
+        Returns:
+            Retrieved documents as `call` returns them, or None if the file is not indexed or
+            there is no symbol index, in which case callers search instead
+        """
+        file_path = normalize_file_path(file_path)
+        own_chunks = self.filter_index.file_chunks(file_path)
+        if self.symbol_index is None or own_chunks is None:
+            return None
+        symbol_config = configs.get("symbol_index", {})
+        max_related_files = symbol_config.get("max_related_files", 12)
+        max_chunks_per_file = symbol_config.get("max_chunks_per_file", 3)
+
+        # Filters pass or drop whole files, so checking one chunk of each file is enough
+        allowed = self.filter_index.allowed_chunks(filters)
+
+        def is_allowed(position: int) -> bool:
+            i = np.searchsorted(allowed, position)
+            return i < len(allowed) and allowed[i] == position
+        doc_indices = own_chunks.tolist() if include_own else []
+        doc_scores = [1.0] * len(doc_indices)
+        seen = set(own_chunks.tolist())
+        imports, importers = self.symbol_index.neighbours(file_path)
+        chunk_positions = self.transformed_docs.chunk_ids
+        # Imports first, since the file builds on them; importers show how it is used
+        related = [(path, chunk_ids, 0.75) for path, chunk_ids in imports.items()]
+        related += [(path, chunk_ids, 0.5) for path, chunk_ids in importers.items()]
+        for path, chunk_ids, score in related[:max_related_files]:
+            positions = [chunk_positions[chunk_id] for chunk_id in chunk_ids if chunk_id in chunk_positions]
+            if not positions:
+                file_chunks = self.filter_index.file_chunks(path)
+                positions = file_chunks.tolist() if file_chunks is not None else []
+            if allowed is not None and positions and not is_allowed(positions[0]):
+                continue
+            positions = [position for position in positions if position not in seen][:max_chunks_per_file]
+            seen.update(positions)
+            doc_indices.extend(positions)
+            doc_scores.extend([score] * len(positions))
+
+        logger.info(f"Looked up {len(doc_indices)} chunks for {file_path}: "
+                    f"{len(imports)} imported and {len(importers)} importing files")
+        return [RetrieverOutput(doc_indices=doc_indices, doc_scores=doc_scores, query=file_path,
+                                documents=[self.transformed_docs[i] for i in doc_indices])]
+
+    def call(self, query: str, filters: Optional[RetrievalFilters] = None) -> Tuple[List]:
         """
         Process a query using RAG.
 
         Args:
             query: The user's query
+            filters: Optional restrictions on the files chunks are retrieved from
 
         Returns:
             Tuple of (RAGAnswer, retrieved_documents)
         """
         try:
-            retrieved_documents = self.retriever(query)
+            # Filters only narrow the search, so they are resolved first and searches score fewer chunks
+            allowed = self.filter_index.allowed_chunks(filters)
+            filters_key = None if allowed is None else filters.key()
+            if allowed is not None and len(allowed) == 0:
+                logger.warning(f"No chunks match the filters {filters}")
+                return [RetrieverOutput(doc_indices=[], doc_scores=[], query=query, documents=[])]
+
+            # Repeated questions against the same index version skip embedding and search
+            result_cache = get_query_result_cache()
+            top_k = self.retriever.top_k
+            cached = result_cache.get(self.repo_key, self.index_version, query, top_k, filters_key)
+            if cached is not None:
+                doc_indices, doc_scores = cached
+                retrieved_documents = [RetrieverOutput(doc_indices=doc_indices, doc_scores=doc_scores, query=query)]
+            else:
+                retrieved_documents = self.retriever(query, allowed=allowed)
+                result_cache.put(self.repo_key, self.index_version, query, top_k, filters_key,
+                                 retrieved_documents[0].doc_indices, retrieved_documents[0].doc_scores)
 
             # Fill in the documents
             retrieved_documents[0].documents = [
@@ -0,0 +1,213 @@
+import re
+import bisect
+import logging
+import fnmatch
+from dataclasses import astuple, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from adalflow.core.types import Document
+
+from api.chunk_store import ChunkStore
+from api.query_cache import LRUCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Test directories (test/, tests/, __tests__/, spec/) and test file names (test_x.py,
+# x_test.go, x.test.ts, x.spec.js, XTest.java)
+_TEST_PATH_PATTERN = re.compile(
+    r"(^|/)(tests?|__tests__|specs?)/"
+    r"|(^|/)test_[^/]*$"
+    r"|_test\.\w+$"
+    r"|\.(test|spec)\.\w+$"
+    r"|[a-z0-9]Tests?\.\w+$"
+)
+# Larger than any character of a path, so prefix + _PREFIX_END sorts after every path with the prefix
+_PREFIX_END = "\U0010ffff"
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+def is_test_path(file_path: str) -> bool:
+    """Whether a repository path is a test file or lies in a test directory."""
+    return bool(_TEST_PATH_PATTERN.search(file_path.replace("\\", "/")))
+
+def _split_list(value) -> List[str]:
+    if not value:
+        return []
+    items = value.split(",") if isinstance(value, str) else value
+    return [item.strip() for item in items if item and item.strip()]
+
+@dataclass(frozen=True)
+class RetrievalFilters:
+    """
+    Restrictions on which files retrieval may return chunks from.
+
+    Paths are relative to the repository root, with "/" separators. In `path_glob`, `*`
+    also matches "/", so "src/*.py" covers every Python file below src/.
+
+    Args:
+        path_prefix (str, optional): Only files whose path starts with the prefix, e.g. "api/".
+        path_glob (str, optional): Only files whose path matches the pattern, e.g. "api/*.py".
+        extensions (Tuple[str, ...]): Only files with one of these extensions, lowercase and without the dot.
+        code_only (bool): Only code files, no documentation.
+        exclude_tests (bool): No test files or files in test directories.
+    """
+    path_prefix: Optional[str] = None
+    path_glob: Optional[str] = None
+    extensions: Tuple[str, ...] = ()
+    code_only: bool = False
+    exclude_tests: bool = False
+
+    @classmethod
+    def create(cls, path_prefix: Optional[str] = None, path_glob: Optional[str] = None, extensions=None,
+               code_only: bool = False, exclude_tests: bool = False) -> Optional["RetrievalFilters"]:
+        """
+        Normalize filter values as given in a request.
+
+        Args:
+            extensions: A list, or a comma-separated string, of extensions with or without the dot.
+
+        Returns:
+            Optional[RetrievalFilters]: The filters, or None if none is set.
+        """
+        path_prefix = (path_prefix or "").strip().replace("\\", "/").lstrip("/")
+        path_prefix = path_prefix[2:] if path_prefix.startswith("./") else path_prefix
+        path_glob = (path_glob or "").strip().replace("\\", "/").lstrip("/")
+        path_glob = path_glob[2:] if path_glob.startswith("./") else path_glob
+        extensions = tuple(sorted({ext.lower().lstrip(".") for ext in _split_list(extensions)}))
+        filters = cls(path_prefix or None, path_glob or None, extensions, bool(code_only), bool(exclude_tests))
+        return filters if filters.key() != astuple(cls()) else None
+
+    def key(self) -> tuple:
+        """A hashable form of the filters, for cache keys."""
+        return astuple(self)
+
+class FilterIndex:
+    """
+    Per-file attributes of an indexed repository, for turning filters into chunk positions.
+
+    Filters are evaluated on files, which are few, and only then expanded to chunks:
+    code and test flags and each extension are boolean arrays over the files, a path
+    prefix is a range of the sorted paths, and each chunk records its file. Results are
+    cached per filter, so a repeated filter costs a dictionary lookup. The chunks of one
+    file are also looked up by path, for requests about a single file.
+
+    Args:
+        documents (Sequence[Document]): The chunks, in index order; a `ChunkStore` is read
+            from its file table without building documents.
+        max_cached (int): Filters whose chunk positions are kept.
+    """
+
+    def __init__(self, documents: Sequence[Document], max_cached: int = 256):
+        if isinstance(documents, ChunkStore):
+            file_meta = [entry["meta_data"] for entry in documents.files]
+            file_of_chunk = np.asarray(documents.chunks["file_index"], dtype=np.int32)
+        else:
+            file_positions: Dict[str, int] = {}
+            file_meta = []
+            file_of_chunk = np.empty(len(documents), dtype=np.int32)
+            for i, doc in enumerate(documents):
+                meta_data = doc.meta_data or {}
+                file_path = meta_data.get("file_path", "")
+                if file_path not in file_positions:
+                    file_positions[file_path] = len(file_meta)
+                    file_meta.append(meta_data)
+                file_of_chunk[i] = file_positions[file_path]
+
+        paths = [meta.get("file_path", "").replace("\\", "/") for meta in file_meta]
+        self.paths = np.array(paths, dtype=object)
+        self.path_order = np.array(sorted(range(len(paths)), key=paths.__getitem__), dtype=np.int64)
+        self.sorted_paths = [paths[j] for j in self.path_order]
+        self.is_code = np.array([bool(meta.get("is_code")) for meta in file_meta], dtype=bool)
+        self.is_test = np.array([is_test_path(path) for path in paths], dtype=bool)
+        self.extensions: Dict[str, np.ndarray] = {}
+        for j, meta in enumerate(file_meta):
+            ext = str(meta.get("type") or "").lower()
+            self.extensions.setdefault(ext, np.zeros(len(file_meta), dtype=bool))[j] = True
+        self.file_of_chunk = file_of_chunk
+        self.file_positions = {path: j for j, path in enumerate(paths)}
+        # Chunk positions grouped by file, in document order within each file
+        self._chunk_order = np.argsort(file_of_chunk, kind="stable")
+        self._chunk_bounds = np.searchsorted(file_of_chunk[self._chunk_order], np.arange(len(paths) + 1))
+        self._cache = LRUCache(max_cached)
+
+    @property
+    def num_files(self) -> int:
+        return len(self.paths)
+
+    @property
+    def memory_bytes(self) -> int:
+        # Paths are held three times, as the file array, the sorted list and the position map
+        return (self.file_of_chunk.nbytes + self._chunk_order.nbytes
+                + sum(3 * len(path) + 150 for path in self.sorted_paths))
+
+    def file_chunks(self, file_path: str) -> Optional[np.ndarray]:
+        """
+        Get the chunks of one file.
+
+        Args:
+            file_path (str): The path relative to the repository root.
+
+        Returns:
+            Optional[np.ndarray]: Chunk positions in document order, or None if the file is not indexed.
+        """
+        j = self.file_positions.get(file_path)
+        if j is None:
+            return None
+        return self._chunk_order[self._chunk_bounds[j]:self._chunk_bounds[j + 1]]
+
+    def _prefix_range(self, prefix: str) -> np.ndarray:
+        """Files whose path starts with `prefix`, found by binary search of the sorted paths."""
+        start = bisect.bisect_left(self.sorted_paths, prefix)
+        end = bisect.bisect_left(self.sorted_paths, prefix + _PREFIX_END, lo=start)
+        mask = np.zeros(self.num_files, dtype=bool)
+        mask[self.path_order[start:end]] = True
+        return mask
+
+    def file_mask(self, filters: RetrievalFilters) -> np.ndarray:
+        """The files that pass the filters, as a boolean array."""
+        mask = np.ones(self.num_files, dtype=bool)
+        if filters.code_only:
+            mask &= self.is_code
+        if filters.exclude_tests:
+            mask &= ~self.is_test
+        if filters.extensions:
+            allowed = np.zeros(self.num_files, dtype=bool)
+            for ext in filters.extensions:
+                if ext in self.extensions:
+                    allowed |= self.extensions[ext]
+            mask &= allowed
+        if filters.path_prefix:
+            mask &= self._prefix_range(filters.path_prefix)
+        if filters.path_glob:
+            # The literal start of the pattern narrows the files to match one by one
+            literal = _GLOB_CHARS.split(filters.path_glob, maxsplit=1)[0]
+            if literal:
+                mask &= self._prefix_range(literal)
+            for j in np.flatnonzero(mask):
+                if not fnmatch.fnmatchcase(self.paths[j], filters.path_glob):
+                    mask[j] = False
+        return mask
+
+    def allowed_chunks(self, filters: Optional[RetrievalFilters]) -> Optional[np.ndarray]:
+        """
+        Get the chunks that pass the filters.
+
+        Args:
+            filters (RetrievalFilters, optional): The filters.
+
+        Returns:
+            Optional[np.ndarray]: Sorted chunk positions, or None when every chunk passes.
+        """
+        if filters is None:
+            return None
+        key = filters.key()
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached[0]
+        file_mask = self.file_mask(filters)
+        allowed = None if file_mask.all() else np.flatnonzero(file_mask[self.file_of_chunk])
+        self._cache.put(key, (allowed,))
+        logger.info(f"Filters {filters} allow {int(file_mask.sum())} of {self.num_files} files, "
+                    f"{len(self.file_of_chunk) if allowed is None else len(allowed)} chunks")
+        return allowed
@@ -0,0 +1,222 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from adalflow.core.types import Document
+
+from api.chunk_store import ChunkStore
+from api.config import configs
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Approximate size of one float held in a Python list
+_LIST_FLOAT_BYTES = 32
+
+def make_repo_key(repo_url_or_path: str, ref: Optional[str] = None, excluded_dirs: Optional[List[str]] = None,
+                  excluded_files: Optional[List[str]] = None) -> tuple:
+    """
+    Build the part of a registry key that identifies what was indexed.
+
+    Args:
+        repo_url_or_path (str): The URL or local path of the repository.
+        ref (str, optional): The branch, tag or commit.
+        excluded_dirs (List[str], optional): Directories excluded from the index.
+        excluded_files (List[str], optional): File patterns excluded from the index.
+
+    Returns:
+        tuple: A hashable key; equal exclusion sets give equal keys regardless of order.
+    """
+    dirs = tuple(sorted(set(d.strip() for d in excluded_dirs or [] if d.strip())))
+    files = tuple(sorted(set(f.strip() for f in excluded_files or [] if f.strip())))
+    return repo_url_or_path, ref, dirs, files
+
+def get_index_version(repo_paths: Dict[str, str]) -> Optional[tuple]:
+    """
+    Identify the on-disk index of a repository by modification time and size.
+
+    Args:
+        repo_paths (Dict[str, str]): The paths set up by `DatabaseManager`.
+
+    Returns:
+        Optional[tuple]: The version, or None if nothing has been written yet.
+    """
+    for key in ("save_index_file", "save_db_file"):
+        path = repo_paths.get(key)
+        if path and os.path.exists(path):
+            return _stat_version(path)
+    return None
+
+def _stat_version(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_size
+
+def is_current_version(index_version: Optional[tuple]) -> bool:
+    """Whether the index file a version was taken from is unchanged on disk, by one stat call."""
+    return index_version is None or _stat_version(index_version[0]) == index_version
+
+def estimate_size(documents: List[Document]) -> int:
+    """Estimate the heap held by retrievable documents, in bytes."""
+    if isinstance(documents, ChunkStore):
+        # Texts and vectors of a store stay in its mapped files
+        return documents.heap_bytes()
+    size = 0
+    for doc in documents:
+        size += len(doc.text or "")
+        vector = doc.vector
+        if vector is not None and len(vector) > 0:
+            size += len(vector) * (_LIST_FLOAT_BYTES if isinstance(vector, list) else 4)
+    return size
+
+def estimate_retriever_size(retriever: Any, filter_index: Any = None, symbol_index: Any = None) -> int:
+    """
+    Estimate the heap held by a retriever and the indexes kept with it, in bytes.
+
+    Counts the dense retriever's own copy of the vectors, the BM25 postings of a hybrid
+    retriever, and the filter and symbol indexes of the entry.
+    """
+    # Hybrid retrievers wrap the dense one and hold the lexical index
+    dense_retriever = getattr(retriever, "dense_retriever", retriever)
+    lexical_index = getattr(retriever, "lexical_index", None)
+    return sum(getattr(part, "memory_bytes", 0) for part in (dense_retriever, lexical_index, filter_index, symbol_index))
+
+@dataclass
+class RetrieverEntry:
+    retriever: Any
+    documents: List[Document]
+    index_version: Optional[tuple]
+    size_bytes: int
+    filter_index: Any = None
+    symbol_index: Any = None
+    validated_at: float = field(default_factory=time.monotonic)
+
+class RetrieverRegistry:
+    """
+    Thread-safe, process-wide registry of ready retrievers.
+
+    Entries are keyed by (repository key, index version) and evicted least
+    recently used first once their estimated size exceeds the memory budget. A
+    newer index version of a repository replaces the older one.
+
+    Args:
+        max_memory_mb (int): Memory budget of all cached entries.
+        revalidate_seconds (float): How long an entry is served before the
+            repository is checked for changes again.
+    """
+
+    def __init__(self, max_memory_mb: int = 2048, revalidate_seconds: float = 300):
+        self.max_bytes = max_memory_mb * 1024 * 1024
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: "OrderedDict[tuple, RetrieverEntry]" = OrderedDict()
+        self._versions: Dict[tuple, Optional[tuple]] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, repo_key: tuple) -> Optional[RetrieverEntry]:
+        """
+        Get the entry of the current index version of a repository.
+
+        The index file of the entry is checked with a stat call, so an index rebuilt by
+        another process is picked up at once rather than after `revalidate_seconds`.
+
+        Args:
+            repo_key (tuple): See `make_repo_key`.
+
+        Returns:
+            Optional[RetrieverEntry]: The entry, or None if it is missing, stale on disk or due for revalidation.
+        """
+        with self._lock:
+            key = (repo_key, self._versions.get(repo_key))
+            entry = self._entries.get(key)
+        current = entry is not None and is_current_version(entry.index_version)
+        with self._lock:
+            if entry is None or self._entries.get(key) is not entry:
+                self.misses += 1
+                return None
+            if not current:
+                logger.info(f"Index of {repo_key[0]} changed on disk, dropping its cached retriever")
+                self._discard(key)
+                self._versions.pop(repo_key, None)
+            if not current or time.monotonic() - entry.validated_at > self.revalidate_seconds:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, repo_key: tuple, index_version: Optional[tuple], retriever: Any,
+            documents: List[Document], filter_index: Any = None, symbol_index: Any = None) -> RetrieverEntry:
+        """
+        Register the retriever of a repository at an index version.
+
+        Args:
+            repo_key (tuple): See `make_repo_key`.
+            index_version (tuple, optional): See `get_index_version`.
+            retriever (Any): The ready retriever.
+            documents (List[Document]): The documents the retriever indexes, in index order.
+            filter_index (FilterIndex, optional): The file attributes of the documents for metadata filters.
+            symbol_index (SymbolIndex, optional): The definitions and imports of the files, for file lookups.
+
+        Returns:
+            RetrieverEntry: The registered entry.
+        """
+        size_bytes = estimate_size(documents) + estimate_retriever_size(retriever, filter_index, symbol_index)
+        entry = RetrieverEntry(retriever, documents, index_version, size_bytes, filter_index, symbol_index)
+        with self._lock:
+            old_version = self._versions.get(repo_key)
+            self._discard((repo_key, old_version))
+            self._versions[repo_key] = index_version
+            self._entries[(repo_key, index_version)] = entry
+            self._total_bytes += entry.size_bytes
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_key, _ = next(iter(self._entries.items()))
+                self._discard(evicted_key)
+                self._versions.pop(evicted_key[0], None)
+                logger.info(f"Evicted retriever for {evicted_key[0][0]} from the registry")
+        return entry
+
+    def _discard(self, key: Tuple[tuple, Optional[tuple]]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size_bytes
+
+    def invalidate(self, repo_key: tuple) -> None:
+        """Drop every cached retriever of a repository."""
+        with self._lock:
+            self._discard((repo_key, self._versions.pop(repo_key, None)))
+
+    def stats(self) -> dict:
+        """Return entry count, estimated bytes and hit rate of the registry."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_retriever_registry() -> RetrieverRegistry:
+    """Get the process-wide registry configured by `retriever_cache` in embedder.json."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            cache_config = configs.get("retriever_cache", {})
+            _registry = RetrieverRegistry(
+                max_memory_mb=cache_config.get("max_memory_mb", 2048),
+                revalidate_seconds=cache_config.get("revalidate_seconds", 300),
+            )
+        return _registry
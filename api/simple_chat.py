@@ -10,10 +10,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from api.config import get_model_config
-from api.data_pipeline import count_tokens, get_file_content
+from api.config import configs, get_model_config
+from api.data_pipeline import get_file_content
+from api.context_packer import get_context_budget, pack_context
+from api.executors import iterate_blocking, run_blocking
+from api.index_jobs import get_index_job_queue
 from api.openai_client import OpenAIClient
 from api.rag import RAG
+from api.retrieval_filters import RetrievalFilters
+from api.tokenizer import count_tokens, count_tokens_many
 
 # Configure logging
 logging.basicConfig(
@@ -51,6 +56,7 @@ class ChatCompletionRequest(BaseModel):
     filePath: Optional[str] = Field(None, description="Optional path to a file in the repository to include in the prompt")
     token: Optional[str] = Field(None, description="Personal access token for private repositories")
     type: Optional[str] = Field("github", description="Type of repository (e.g., 'github', 'gitlab', 'bitbucket')")
+    ref: Optional[str] = Field(None, description="Branch, tag or commit to answer from (defaults to the remote HEAD)")
     
     # model parameters
     provider: str = Field("openai", description="Model provider (google, openai, openrouter, ollama)")
@@ -60,6 +66,13 @@ class ChatCompletionRequest(BaseModel):
     excluded_dirs: Optional[str] = Field(None, description="Comma-separated list of directories to exclude from processing")
     excluded_files: Optional[str] = Field(None, description="Comma-separated list of file patterns to exclude from processing")
 
+    # retrieval filters
+    path_prefix: Optional[str] = Field(None, description="Only retrieve context from files under this path (e.g., 'api/')")
+    path_glob: Optional[str] = Field(None, description="Only retrieve context from files matching this pattern (e.g., 'src/*.ts')")
+    extensions: Optional[str] = Field(None, description="Comma-separated list of file extensions to retrieve context from (e.g., 'py,md')")
+    code_only: Optional[bool] = Field(False, description="Only retrieve context from code files, not documentation")
+    exclude_tests: Optional[bool] = Field(False, description="Do not retrieve context from test files")
+
 @app.post("/chat/completions/stream")
 async def chat_completions_stream(request: ChatCompletionRequest):
     """Stream a chat completion response directly using OpenAI API"""
@@ -69,15 +82,15 @@ async def chat_completions_stream(request: ChatCompletionRequest):
         if request.messages and len(request.messages) > 0:
             last_message = request.messages[-1]
             if hasattr(last_message, 'content') and last_message.content:
-                tokens = count_tokens(last_message.content)
+                tokens = await run_blocking("io", count_tokens, last_message.content)
                 logger.info(f"Request size: {tokens} tokens")
                 if tokens > 8000:
                     logger.warning(f"Request exceeds recommended token limit ({tokens} > 7500)")
                     input_too_large = True
 
-        # Create a new RAG instance for this request
+        # Create a new RAG instance for this request; blocking work runs in bounded executors
         try:
-            request_rag = RAG(provider=request.provider, model=request.model)
+            request_rag = await run_blocking("retrieval", RAG, provider=request.provider, model=request.model)
 
             # Extract custom file filter parameters if provided
             excluded_dirs = None
@@ -89,8 +102,27 @@ async def chat_completions_stream(request: ChatCompletionRequest):
                 excluded_files = [unquote(file_pattern) for file_pattern in request.excluded_files.split('\n') if file_pattern.strip()]
                 logger.info(f"Using custom excluded files: {excluded_files}")
 
-            request_rag.prepare_retriever(request.repo_url, request.type, request.token, excluded_dirs, excluded_files)
-            logger.info(f"Retriever prepared for {request.repo_url}")
+            # Requests only open the database last indexed for this ref and exclusion set; indexing,
+            # and refreshing a database older than the refresh interval, run as background jobs. A
+            # repository that was never indexed makes the request wait briefly for its job and
+            # otherwise answer without retrieval
+            job_queue = get_index_job_queue()
+            retriever_ready = await run_blocking("retrieval", request_rag.open_retriever, request.repo_url,
+                                                 excluded_dirs, excluded_files, request.ref)
+            index_job = None
+            if not retriever_ready or not request_rag.retriever_fresh:
+                index_job = job_queue.submit(request.repo_url, request.type, request.token, request.ref,
+                                             excluded_dirs, excluded_files)
+            if not retriever_ready:
+                await job_queue.wait(index_job, configs.get("indexing", {}).get("chat_wait_seconds", 5))
+                if index_job.status == "completed":
+                    retriever_ready = await run_blocking("retrieval", request_rag.open_retriever, request.repo_url,
+                                                         excluded_dirs, excluded_files, request.ref)
+
+            if retriever_ready:
+                logger.info(f"Retriever prepared for {request.repo_url}")
+            else:
+                logger.info(f"Indexing job {index_job.job_id} is {index_job.status}, answering without retrieval")
         except Exception as e:
             logger.error(f"Error preparing retriever: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error preparing retriever: {str(e)}")
@@ -154,12 +186,32 @@ async def chat_completions_stream(request: ChatCompletionRequest):
         # Only retrieve documents if input is not too large
         context_text = ""
         retrieved_documents = None
+        retrieved_chunks = []
+        retrieved_scores = None
 
-        if not input_too_large:
+        # Content of the requested file when it is indexed, read from the chunk store
+        file_content = None
+
+        if not input_too_large and retriever_ready:
             try:
-                # If filePath exists, modify the query for RAG to focus on the file
-                rag_query = query
+                filters = RetrievalFilters.create(request.path_prefix, request.path_glob, request.extensions,
+                                                  request.code_only, request.exclude_tests)
                 if request.filePath:
+                    # The whole file goes into the prompt, so context is what it imports and what imports it,
+                    # looked up without embedding a query
+                    try:
+                        file_content = await run_blocking("retrieval", request_rag.get_file_text, request.filePath)
+                        if file_content is not None:
+                            retrieved_documents = await run_blocking("retrieval", request_rag.lookup_file,
+                                                                     request.filePath, include_own=False,
+                                                                     filters=filters)
+                    except Exception as e:
+                        logger.error(f"Error looking up file {request.filePath}: {str(e)}")
+                        file_content = None
+
+                # If filePath exists but could not be looked up, modify the query for RAG to focus on the file
+                rag_query = query
+                if request.filePath and retrieved_documents is None:
                     # Use the file path to get relevant context about the file
                     rag_query = f"Contexts related to {request.filePath}"
                     logger.info(f"Modified RAG query to focus on file: {request.filePath}")
@@ -167,33 +219,14 @@ async def chat_completions_stream(request: ChatCompletionRequest):
                 # Try to perform RAG retrieval
                 try:
                     # This will use the actual RAG implementation
-                    retrieved_documents = request_rag(rag_query)
+                    if retrieved_documents is None:
+                        retrieved_documents = await run_blocking("retrieval", request_rag, rag_query, filters=filters)
 
                     if retrieved_documents and retrieved_documents[0].documents:
-                        # Format context for the prompt in a more structured way
-                        documents = retrieved_documents[0].documents
-                        logger.info(f"Retrieved {len(documents)} documents")
-
-                        # Group documents by file path
-                        docs_by_file = {}
-                        for doc in documents:
-                            file_path = doc.meta_data.get('file_path', 'unknown')
-                            if file_path not in docs_by_file:
-                                docs_by_file[file_path] = []
-                            docs_by_file[file_path].append(doc)
-
-                        # Format context text with file path grouping
-                        context_parts = []
-                        for file_path, docs in docs_by_file.items():
-                            # Add file header with metadata
-                            header = f"## File Path: {file_path}\n\n"
-                            # Add document content
-                            content = "\n\n".join([doc.text for doc in docs])
-
-                            context_parts.append(f"{header}{content}")
-
-                        # Join all parts with clear separation
-                        context_text = "\n\n" + "-" * 10 + "\n\n".join(context_parts)
+                        # The context is packed into the token budget once the rest of the prompt is known
+                        retrieved_chunks = retrieved_documents[0].documents
+                        retrieved_scores = retrieved_documents[0].doc_scores
+                        logger.info(f"Retrieved {len(retrieved_chunks)} documents")
                     else:
                         logger.warning("No documents retrieved from RAG")
                 except Exception as e:
@@ -360,15 +393,19 @@ This file contains...
 - Use markdown formatting to improve readability
 </style>"""
 
-        # Fetch file content if provided
-        file_content = ""
-        if request.filePath:
-            try:
-                file_content = get_file_content(request.repo_url, request.filePath, request.type, request.token)
-                logger.info(f"Successfully retrieved content for file: {request.filePath}")
-            except Exception as e:
-                logger.error(f"Error retrieving file content: {str(e)}")
-                # Continue without file content if there's an error
+        # Fetch file content if provided and not indexed
+        if file_content is not None:
+            logger.info(f"Using indexed content of file: {request.filePath}")
+        else:
+            file_content = ""
+            if request.filePath:
+                try:
+                    file_content = await run_blocking("io", get_file_content, request.repo_url, request.filePath,
+                                                      request.type, request.token)
+                    logger.info(f"Successfully retrieved content for file: {request.filePath}")
+                except Exception as e:
+                    logger.error(f"Error retrieving file content: {str(e)}")
+                    # Continue without file content if there's an error
 
         # Format conversation history
         conversation_history = ""
@@ -387,6 +424,17 @@ This file contains...
             # Add file content to the prompt after conversation history
             prompt += f"<currentFileContent path=\"{request.filePath}\">\n{file_content}\n</currentFileContent>\n\n"
 
+        # Fill what the model's context window leaves after the rest of the prompt and the answer
+        query_prompt = f"<query>\n{query}\n</query>\n\nAssistant: "
+        if retrieved_chunks:
+            model_name = get_model_config(request.provider, request.model)["model_kwargs"]["model"]
+            prompt_tokens = sum(await run_blocking("io", count_tokens_many, [prompt, query_prompt],
+                                                   model=model_name, memoize=False))
+            budget = get_context_budget(model_name, prompt_tokens)
+            packed_context = await run_blocking("io", pack_context, retrieved_chunks, retrieved_scores, budget,
+                                                model_name)
+            context_text = packed_context.text
+
         # Only include context if it's not empty
         CONTEXT_START = "<START_OF_CONTEXT>"
         CONTEXT_END = "<END_OF_CONTEXT>"
@@ -397,7 +445,7 @@ This file contains...
             logger.info("No context available from RAG")
             prompt += "<note>Answering without retrieval augmentation.</note>\n\n"
 
-        prompt += f"<query>\n{query}\n</query>\n\nAssistant: "
+        prompt += query_prompt
 
         model_config = get_model_config(request.provider, request.model)["model_kwargs"]
 
@@ -457,9 +505,9 @@ This file contains...
                         yield f"\nError with Openai API: {str(e_openai)}\n\nPlease check that you have set the OPENAI_API_KEY environment variable with a valid API key."
                 else:
                     # Generate streaming response
-                    response = model.generate_content(prompt, stream=True)
-                    # Stream the response
-                    for chunk in response:
+                    response = await run_blocking("llm_stream", model.generate_content, prompt, stream=True)
+                    # Stream the response, waiting for each chunk off the event loop
+                    async for chunk in iterate_blocking("llm_stream", response):
                         if hasattr(chunk, 'text'):
                             yield chunk.text
 
@@ -517,9 +565,11 @@ This file contains...
                             )
 
                             # Get streaming response using simplified prompt
-                            fallback_response = fallback_model.generate_content(simplified_prompt, stream=True)
+                            fallback_response = await run_blocking(
+                                "llm_stream", fallback_model.generate_content, simplified_prompt, stream=True
+                            )
                             # Stream the fallback response
-                            for chunk in fallback_response:
+                            async for chunk in iterate_blocking("llm_stream", fallback_response):
                                 if hasattr(chunk, 'text'):
                                     yield chunk.text
                     except Exception as e2:
@@ -529,8 +579,9 @@ This file contains...
                     # For other errors, return the error message
                     yield f"\nError: {error_message}"
 
-        # Return streaming response
-        return StreamingResponse(response_stream(), media_type="text/event-stream")
+        # Return streaming response; clients can follow a background index through its job id
+        headers = {"X-Index-Job-Id": index_job.job_id} if index_job is not None else None
+        return StreamingResponse(response_stream(), media_type="text/event-stream", headers=headers)
 
     except HTTPException:
         raise
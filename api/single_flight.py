@@ -0,0 +1,100 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable
+
+from adalflow.utils import get_adalflow_default_root_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are coordinated
+    fcntl = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time; concurrent callers with the same key
+    wait for the running call and share its result or exception.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Call `fn`, or wait for the call already running for `key`.
+
+        Args:
+            key (Hashable): Identifies equivalent calls.
+            fn (Callable[[], Any]): The work to run.
+
+        Returns:
+            Any: The result of the call that ran.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            logger.info(f"Waiting for the running call for {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+def get_lock_path(name: str) -> str:
+    """Get the lock file of a name, under ~/.adalflow/locks."""
+    return os.path.join(get_adalflow_default_root_path(), "locks", f"{name}.lock")
+
+@contextmanager
+def file_lock(name: str):
+    """
+    Hold an exclusive lock on `name` across threads and processes.
+
+    A thread lock orders the threads of this process and an `flock` on
+    ~/.adalflow/locks/{name}.lock orders processes, e.g. several uvicorn workers.
+
+    Args:
+        name (str): The resource to lock, e.g. a repository storage name.
+    """
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(name, threading.Lock())
+
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        lock_path = get_lock_path(name)
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,435 @@
+import os
+import re
+import ast
+import json
+import logging
+import posixpath
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from api.chunk_store import ChunkStore
+from api.index_manifest import content_hash
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SYMBOL_INDEX_VERSION = 1
+
+_JS_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".vue", ".svelte")
+_C_EXTENSIONS = (".c", ".h", ".cc", ".cpp", ".cxx", ".hpp", ".hh")
+
+# Regular expressions for languages without a parser here: (import patterns, definition patterns).
+# Import patterns capture the module in group "spec" and optionally the imported names in "names".
+_LANGUAGE_PATTERNS = {
+    "js": (
+        [r"""^\s*(?:import|export)\s+(?:type\s+)?(?:(?P<names>[\w*\s{},$]+?)\s+from\s+)?['"](?P<spec>[^'"]+)['"]""",
+         r"""require\(\s*['"](?P<spec>[^'"]+)['"]\s*\)""",
+         r"""import\(\s*['"](?P<spec>[^'"]+)['"]\s*\)"""],
+        [r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+(\w+)",
+         r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(\w+)",
+         r"^\s*(?:export\s+)?(?:const|let|var)\s+(\w+)\s*[=:]",
+         r"^\s*(?:export\s+)?(?:interface|type|enum)\s+(\w+)"],
+    ),
+    "go": (
+        [r"""^\s*import\s+(?:\w+\s+)?"(?P<spec>[^"]+)\"""", r"""^\s+(?:\w+\s+)?"(?P<spec>[^"]+)"\s*$"""],
+        [r"^func\s+(?:\([^)]*\)\s*)?(\w+)", r"^type\s+(\w+)", r"^(?:var|const)\s+(\w+)"],
+    ),
+    "java": (
+        [r"^\s*import\s+(?:static\s+)?(?P<spec>[\w.]+)(?:\.\*)?\s*;?"],
+        [r"^\s*(?:(?:public|private|protected|internal|abstract|final|static|sealed|data|open)\s+)*"
+         r"(?:class|interface|enum|record|object|trait)\s+(\w+)",
+         r"^\s*(?:(?:public|private|protected|internal|override|suspend)\s+)*fun\s+(\w+)"],
+    ),
+    "c": (
+        [r"""^\s*#\s*include\s+"(?P<spec>[^"]+)\""""],
+        [r"^\s*(?:class|struct|enum|union|namespace)\s+(\w+)\s*[:{]",
+         r"^\s*#\s*define\s+(\w+)",
+         r"^[A-Za-z_][\w\s\*&:<>,]*?\b(\w+)\s*\([^;]*\)\s*(?:const\s*)?\{?\s*$"],
+    ),
+    "rust": (
+        [r"^\s*(?:pub\s+)?use\s+(?P<spec>\w+(?:::\w+)*)(?:::\{(?P<names>[^}]*)\})?",
+         r"^\s*(?:pub\s+)?mod\s+(?P<spec>\w+)\s*;"],
+        [r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:unsafe\s+)?fn\s+(\w+)",
+         r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|type|const|static)\s+(\w+)"],
+    ),
+    "ruby": (
+        [r"""^\s*require(?:_relative)?\s*\(?\s*['"](?P<spec>[^'"]+)['"]"""],
+        [r"^\s*def\s+(?:self\.)?(\w+[?!]?)", r"^\s*(?:class|module)\s+([\w:]+)"],
+    ),
+    "php": (
+        [r"^\s*use\s+(?P<spec>[\w\\]+)", r"""^\s*(?:require|include)(?:_once)?\s*\(?\s*['"](?P<spec>[^'"]+)['"]"""],
+        [r"^\s*(?:abstract\s+|final\s+)?(?:class|interface|trait|enum)\s+(\w+)",
+         r"^\s*(?:(?:public|private|protected|static)\s+)*function\s+(\w+)"],
+    ),
+    "generic": (
+        [],
+        [r"^\s*(?:def|function|func|fn|class|struct|interface|trait|enum|module)\s+(\w+)"],
+    ),
+}
+_LANGUAGES = {
+    **{ext: "js" for ext in _JS_EXTENSIONS}, ".go": "go", ".java": "java", ".kt": "java", ".scala": "java",
+    **{ext: "c" for ext in _C_EXTENSIONS}, ".rs": "rust", ".rb": "ruby", ".php": "php",
+}
+_COMPILED_PATTERNS = {
+    language: ([re.compile(p, re.MULTILINE) for p in imports], [re.compile(p, re.MULTILINE) for p in definitions])
+    for language, (imports, definitions) in _LANGUAGE_PATTERNS.items()
+}
+_WORD_PATTERN = re.compile(r"\w+")
+# Words the C function pattern would otherwise take for definitions
+_C_KEYWORDS = {"if", "for", "while", "switch", "return", "sizeof", "else", "do"}
+
+@dataclass
+class FileSymbols:
+    """
+    What one file defines and imports.
+
+    Args:
+        definitions (Dict[str, int]): Line number of each top-level name the file defines.
+        imports (List[Tuple[str, List[str]]]): Each import as (module, imported names). Python
+            modules are absolute dotted names; other languages keep the module as written.
+    """
+    definitions: Dict[str, int] = field(default_factory=dict)
+    imports: List[Tuple[str, List[str]]] = field(default_factory=list)
+
+def _python_module(file_path: str) -> List[str]:
+    """The dotted module name of a Python file as a list of parts; packages drop __init__."""
+    parts = os.path.splitext(file_path)[0].split("/")
+    return parts[:-1] if parts[-1] == "__init__" else parts
+
+def _statements(body: List[ast.stmt]):
+    """Statements of a block and of the blocks nested in it; imports are statements, so expressions are skipped."""
+    for node in body:
+        yield node
+        for name in ("body", "orelse", "finalbody", "handlers", "cases"):
+            block = getattr(node, name, None)
+            if isinstance(block, list):
+                yield from _statements(block)
+
+def _extract_python(file_path: str, text: str) -> FileSymbols:
+    tree = ast.parse(text)
+    symbols = FileSymbols()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            symbols.definitions.setdefault(node.name, node.lineno)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    symbols.definitions.setdefault(target.id, node.lineno)
+    for node in _statements(tree.body):
+        if isinstance(node, ast.Import):
+            symbols.imports.extend((alias.name, []) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module.split(".") if node.module else []
+            if node.level:
+                # Relative to the importing file's package
+                package = _python_module(file_path)
+                if not file_path.endswith("__init__.py"):
+                    package = package[:-1]
+                module = package[:len(package) - node.level + 1] + module
+            names = [alias.name for alias in node.names if alias.name != "*"]
+            symbols.imports.append((".".join(module), names))
+    return symbols
+
+def _extract_with_patterns(language: str, text: str) -> FileSymbols:
+    import_patterns, definition_patterns = _COMPILED_PATTERNS[language]
+    symbols = FileSymbols()
+    for pattern in definition_patterns:
+        for match in pattern.finditer(text):
+            name = match.group(1)
+            if name not in _C_KEYWORDS:
+                symbols.definitions.setdefault(name, text.count("\n", 0, match.start()) + 1)
+    for pattern in import_patterns:
+        for match in pattern.finditer(text):
+            names = match.groupdict().get("names") or ""
+            # "{ a, b as c }" or "a, b" give a and b; "* as ns" and default imports give nothing
+            names = [part.strip().split(" as ")[0].strip() for part in names.strip().strip("{}").split(",")]
+            symbols.imports.append((match.group("spec"), [name for name in names if re.fullmatch(r"\w+", name)]))
+    return symbols
+
+def extract_symbols(file_path: str, text: str) -> FileSymbols:
+    """
+    Extract the top-level definitions and the imports of a file.
+
+    Python is parsed with `ast`; other languages, and Python that does not parse, are
+    matched line by line with regular expressions for their import and definition syntax.
+
+    Args:
+        file_path (str): The path relative to the repository root, with "/" separators.
+        text (str): The file content.
+
+    Returns:
+        FileSymbols: The definitions and imports.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".py", ".pyi"):
+        try:
+            return _extract_python(file_path, text)
+        except (SyntaxError, ValueError, RecursionError):
+            logger.debug(f"Could not parse {file_path}, matching patterns instead")
+    return _extract_with_patterns(_LANGUAGES.get(ext, "generic"), text)
+
+class _PathResolver:
+    """Finds the repository file an import refers to."""
+
+    def __init__(self, paths: List[str]):
+        self.paths = set(paths)
+        # Extensionless paths by their last part, for matching module names from the end
+        self.stems: Dict[str, List[Tuple[str, str]]] = {}
+        self.directories: Dict[str, List[str]] = {}
+        for path in sorted(paths):
+            stem = os.path.splitext(path)[0]
+            self.stems.setdefault(stem.rsplit("/", 1)[-1], []).append((stem, path))
+            if stem.endswith("/__init__") or stem.endswith("/index") or stem.endswith("/mod"):
+                package = stem.rsplit("/", 1)[0]
+                self.stems.setdefault(package.rsplit("/", 1)[-1], []).append((package, path))
+            self.directories.setdefault(posixpath.dirname(path), []).append(path)
+
+    def _by_suffix(self, parts: List[str], ext: str) -> Optional[str]:
+        if not parts:
+            return None
+        suffix = "/".join(parts)
+        matches = [path for stem, path in self.stems.get(parts[-1], [])
+                   if stem == suffix or stem.endswith("/" + suffix)]
+        # Prefer the same language, then the shortest path
+        matches.sort(key=lambda path: (os.path.splitext(path)[1] != ext, len(path)))
+        return matches[0] if matches else None
+
+    def _relative(self, importer: str, spec: str) -> Optional[str]:
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), spec))
+        ext = os.path.splitext(importer)[1]
+        candidates = [base] + [base + e for e in (ext,) + _JS_EXTENSIONS + (".rb", ".php")]
+        candidates += [f"{base}/index{e}" for e in _JS_EXTENSIONS]
+        return next((path for path in candidates if path in self.paths), None)
+
+    def resolve(self, importer: str, spec: str, names: List[str]) -> List[Tuple[str, List[str]]]:
+        """
+        Get the files an import refers to.
+
+        Returns:
+            List[Tuple[str, List[str]]]: (file path, names imported from it) pairs; empty for
+            imports of packages outside the repository.
+        """
+        ext = os.path.splitext(importer)[1]
+        if spec.startswith(".") or ext in _C_EXTENSIONS + _JS_EXTENSIONS or "/" in spec and ext in (".rb", ".php"):
+            # File paths: relative to the importer, else (includes, "@/" aliases) from the end of a path
+            path = self._relative(importer, spec)
+            if path is None and not spec.startswith("."):
+                if ext in _JS_EXTENSIONS:
+                    # Other bare specifiers name npm packages
+                    spec = spec[2:] if spec.startswith(("@/", "~/")) else ""
+                path = self._by_suffix(os.path.splitext(spec)[0].split("/"), ext) if spec else None
+            return [(path, names)] if path and path != importer else []
+
+        parts = [part for part in re.split(r"[./\\:]+", spec) if part and part not in ("crate", "self", "super")]
+        if ext in (".py", ".pyi"):
+            # "from pkg import mod" imports modules as well as names
+            found = [(path, []) for path in (self._by_suffix(parts + [name], ext) for name in names) if path]
+            imported = [name for name in names if not self._by_suffix(parts + [name], ext)]
+            module = self._by_suffix(parts, ext) if imported or not names else None
+            if module:
+                found.append((module, imported))
+            return [(path, imported) for path, imported in found if path != importer]
+
+        if ext == ".go":
+            # Go imports packages, which are directories; the import path ends with the directory
+            package = "/".join(parts)
+            for directory, files in self.directories.items():
+                if directory and (package == directory or package.endswith("/" + directory)):
+                    return [(file, names) for file in files if file.endswith(".go") and file != importer]
+            return []
+        path = self._by_suffix(parts, ext)
+        if path is None and len(parts) > 1:
+            # The last part names an item of the module, as in Java, Rust and PHP
+            path = self._by_suffix(parts[:-1], ext)
+            names = names or [parts[-1]]
+        return [(path, names)] if path and path != importer else []
+
+class SymbolIndex:
+    """
+    Definitions and imports of every file of a repository, mapped to chunk ids.
+
+    For each file, `files[path]` holds its content hash, the chunk id of each top-level
+    definition, its raw imports and its resolved edges: for each file it imports, the
+    imported names and the ids of its own chunks that use them. Importers of a file are
+    derived on load, so a file's neighbourhood is two dictionary lookups.
+
+    Args:
+        files (Dict[str, dict]): The per-file entries.
+    """
+
+    def __init__(self, files: Dict[str, dict]):
+        self.files = files
+        self.importers: Dict[str, Dict[str, dict]] = {}
+        for importer, entry in files.items():
+            for target, edge in entry.get("edges", {}).items():
+                self.importers.setdefault(target, {})[importer] = edge
+
+    @property
+    def num_edges(self) -> int:
+        return sum(len(entry.get("edges", {})) for entry in self.files.values())
+
+    @property
+    def memory_bytes(self) -> int:
+        # Roughly the size of the saved index
+        return sum(200 + 80 * (len(entry["definitions"]) + 2 * len(entry.get("edges", {})))
+                   for entry in self.files.values())
+
+    @classmethod
+    def build(cls, store: ChunkStore, previous: Optional["SymbolIndex"] = None) -> "SymbolIndex":
+        """
+        Index the files of a chunk store.
+
+        Files whose content hash is unchanged since `previous` keep their extracted
+        symbols; imports are resolved again since files may have been added or removed.
+
+        Args:
+            store (ChunkStore): The chunk store.
+            previous (SymbolIndex, optional): The index of the previous build.
+
+        Returns:
+            SymbolIndex: The index.
+        """
+        file_of_chunk = np.asarray(store.chunks["file_index"])
+        order = np.argsort(file_of_chunk, kind="stable")
+        bounds = np.searchsorted(file_of_chunk[order], np.arange(len(store.files) + 1))
+        paths = [entry["meta_data"]["file_path"].replace("\\", "/") for entry in store.files]
+
+        def chunks_of(j: int) -> List[int]:
+            return order[bounds[j]:bounds[j + 1]].tolist()
+
+        files = {}
+        reused = 0
+        for j, path in enumerate(paths):
+            text = store.file_text(j)
+            digest = content_hash(text)
+            chunk_ids = {store.chunks["id"][i].decode("ascii") for i in chunks_of(j)}
+            old = previous.files.get(path) if previous is not None else None
+            if old is not None and old["hash"] == digest and set(old["definitions"].values()) <= chunk_ids:
+                files[path] = {"hash": digest, "definitions": old["definitions"], "imports": old["imports"]}
+                reused += 1
+                continue
+            symbols = extract_symbols(path, text)
+            lines = text.split("\n")
+            definitions = {}
+            chunk_texts = [(i, store.text(i)) for i in chunks_of(j)]
+            for name, line_number in symbols.definitions.items():
+                line = lines[line_number - 1].strip() if 0 < line_number <= len(lines) else name
+                chunk = next((i for i, chunk_text in chunk_texts if line and line in chunk_text), None)
+                if chunk is not None:
+                    definitions[name] = store.chunks["id"][chunk].decode("ascii")
+            files[path] = {"hash": digest, "definitions": definitions,
+                           "imports": [[spec, names] for spec, names in symbols.imports]}
+
+        resolver = _PathResolver(paths)
+        for j, path in enumerate(paths):
+            entry = files[path]
+            edges: Dict[str, dict] = {}
+            for spec, names in entry["imports"]:
+                for target, imported in resolver.resolve(path, spec, names):
+                    edge = edges.setdefault(target, {"names": [], "chunks": []})
+                    edge["names"].extend(name for name in imported if name not in edge["names"])
+            if edges:
+                chunk_words = [(store.chunks["id"][i].decode("ascii"), set(_WORD_PATTERN.findall(store.text(i))))
+                               for i in chunks_of(j)]
+                for target, edge in edges.items():
+                    # Chunks that use what they import, or mention the module when nothing is named
+                    needles = edge["names"] or [os.path.splitext(target.rsplit("/", 1)[-1])[0]]
+                    edge["chunks"] = [chunk_id for chunk_id, words in chunk_words
+                                      if any(needle in words for needle in needles)]
+            entry["edges"] = edges
+        index = cls(files)
+        logger.info(f"Indexed symbols of {len(files)} files ({reused} unchanged) with {index.num_edges} import edges")
+        return index
+
+    def neighbours(self, file_path: str) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+        """
+        Get the chunks related to a file through imports.
+
+        Args:
+            file_path (str): The path relative to the repository root.
+
+        Returns:
+            Tuple[Dict[str, List[str]], Dict[str, List[str]]]: For each file the file imports,
+            the chunk ids defining the imported names; for each file importing it, the chunk
+            ids that use them. An empty list means no particular chunk was found.
+        """
+        entry = self.files.get(file_path)
+        if entry is None:
+            return {}, {}
+        imports = {}
+        for target, edge in entry.get("edges", {}).items():
+            definitions = self.files.get(target, {}).get("definitions", {})
+            imports[target] = [definitions[name] for name in edge["names"] if name in definitions]
+        importers = {importer: list(edge["chunks"]) for importer, edge in self.importers.get(file_path, {}).items()}
+        return imports, importers
+
+    def save(self, path: str) -> None:
+        """Write the index under a temporary name that is renamed into place."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"version": SYMBOL_INDEX_VERSION, "files": self.files}, separators=(",", ":")))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SymbolIndex":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SYMBOL_INDEX_VERSION:
+            raise ValueError(f"Unsupported symbol index version {data.get('version')}")
+        return cls(data["files"])
+
+def get_symbol_index_path(db_path: str) -> str:
+    """
+    Get the symbol index path stored next to a database file.
+
+    Args:
+        db_path (str): The path of the database, e.g. ~/.adalflow/databases/{repo}.store
+
+    Returns:
+        str: The index path, e.g. ~/.adalflow/databases/{repo}.symbols.json
+    """
+    return f"{os.path.splitext(db_path)[0]}.symbols.json"
+
+def save_symbol_index(store: ChunkStore, index_path: str) -> None:
+    """
+    Build the symbol index of a chunk store and write it next to the store.
+
+    The previous index at `index_path`, if any, provides the symbols of unchanged files.
+
+    Args:
+        store (ChunkStore): The chunk store.
+        index_path (str): The index path, see `get_symbol_index_path`.
+    """
+    if not isinstance(store, ChunkStore) or not len(store.files):
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        return
+    index = SymbolIndex.build(store, load_symbol_index(index_path))
+    index.save(index_path)
+
+def load_symbol_index(index_path: str, expected_files: Optional[int] = None) -> Optional[SymbolIndex]:
+    """
+    Load a saved symbol index.
+
+    Args:
+        index_path (str): The index path, see `get_symbol_index_path`.
+        expected_files (int, optional): The number of files in the database; an index of
+            any other size is stale and ignored.
+
+    Returns:
+        Optional[SymbolIndex]: The index, or None if it is missing, unreadable or stale.
+    """
+    if not os.path.exists(index_path):
+        return None
+    try:
+        index = SymbolIndex.load(index_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Error reading symbol index {index_path}: {e}")
+        return None
+    if expected_files is not None and len(index.files) != expected_files:
+        logger.warning(f"Ignoring stale symbol index {index_path}: {len(index.files)} files, expected {expected_files}")
+        return None
+    return index
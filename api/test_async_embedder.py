@@ -0,0 +1,106 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from openai import APIConnectionError
+
+from api.async_embedder import AsyncBatchEmbedder, RateLimiter, get_rate_limiter
+
+def test_requests_wait_for_the_token_budget():
+    """Concurrent callers are spaced by the refill rate once the bucket is empty."""
+    async def run():
+        # 600 tokens per minute refill 10 tokens per second
+        limiter = RateLimiter(tokens_per_minute=600)
+        await limiter.acquire(600)
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire(1) for _ in range(3)))
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.25 <= elapsed < 2
+
+def test_requests_per_minute_is_shared_by_concurrent_callers():
+    async def run():
+        limiter = RateLimiter(requests_per_minute=600)
+        start = time.monotonic()
+        # The first 600 requests fit the full bucket, the next 2 wait 0.1 s each
+        await asyncio.gather(*(limiter.acquire() for _ in range(602)))
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.15 <= elapsed < 2
+
+def test_oversized_request_waits_for_a_full_bucket():
+    async def run():
+        limiter = RateLimiter(tokens_per_minute=600)
+        await asyncio.wait_for(limiter.acquire(10000), timeout=2)
+
+    asyncio.run(run())
+
+def test_pause_holds_back_every_caller():
+    async def run():
+        limiter = RateLimiter(requests_per_minute=6000)
+        limiter.pause(0.3)
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(4)))
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.25 <= elapsed < 2
+
+def test_limiter_is_shared_across_event_loops():
+    """Jobs embedding in different threads, each with its own event loop, share one budget."""
+    limiter = get_rate_limiter("https://example.test/v1", "test-key-shared", requests_per_minute=600)
+    assert get_rate_limiter("https://example.test/v1", "test-key-shared", requests_per_minute=600) is limiter
+    assert get_rate_limiter("https://example.test/v1", "test-key-other", requests_per_minute=600) is not limiter
+
+    async def run():
+        await asyncio.gather(*(limiter.acquire() for _ in range(301)))
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=asyncio.run, args=(run(),)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    # 600 requests fit the bucket; the other 2 wait 0.1 s each
+    assert 0.15 <= time.monotonic() - start < 2
+
+class FakeClient:
+    """Embedding client failing with the given errors before answering."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def convert_inputs_to_api_kwargs(self, input, model_kwargs, model_type):
+        return {"input": input}
+
+    async def acall(self, api_kwargs, model_type):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return api_kwargs["input"]
+
+    def parse_embedding_response(self, response):
+        data = [SimpleNamespace(embedding=[float(len(text))], index=i) for i, text in enumerate(response)]
+        return SimpleNamespace(data=data, error=None)
+
+def test_transport_errors_are_retried(monkeypatch):
+    monkeypatch.setattr("api.async_embedder.random.random", lambda: 0.0)
+    client = FakeClient([APIConnectionError(request=None)])
+    embedder = AsyncBatchEmbedder(client, {}, max_retries=2)
+    assert embedder.embed(["ab", "c"]) == [[2.0], [1.0]]
+    assert client.calls == 2
+
+def test_other_errors_fail_at_once():
+    client = FakeClient([ValueError("malformed request")])
+    embedder = AsyncBatchEmbedder(client, {}, max_retries=5)
+    with pytest.raises(ValueError):
+        embedder.embed(["ab"])
+    assert client.calls == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,82 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+from adalflow.core.types import Document
+
+from api.chunk_store import ChunkStore, open_store
+
+def make_documents(version, num_files=3):
+    documents, chunks = [], []
+    for j in range(num_files):
+        meta_data = {"file_path": f"f{j}.py", "type": "py", "is_code": True, "title": f"f{j}.py"}
+        documents.append(Document(text=f"v{version} file {j}", meta_data=meta_data, id=f"file{j}",
+                                  estimated_num_tokens=3))
+        chunks.append(Document(text=f"v{version} chunk {j}", meta_data=meta_data,
+                               vector=np.full(4, version, dtype=np.float32), id=f"{j:036d}", order=0,
+                               parent_doc_id=f"file{j}", estimated_num_tokens=3))
+    return documents, chunks
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / "repo.store")
+    ChunkStore.write(path, *make_documents(1))
+    store = open_store(path)
+    assert len(store) == 3
+    assert store[1].text == "v1 chunk 1"
+    assert store.get_file_documents()["f2.py"].text == "v1 file 2"
+    np.testing.assert_array_equal(store.get_vectors(0), np.full(4, 1, dtype=np.float32))
+
+def test_rewrite_removes_the_previous_version(tmp_path):
+    path = str(tmp_path / "repo.store")
+    ChunkStore.write(path, *make_documents(1))
+    old_store = open_store(path)
+    ChunkStore.write(path, *make_documents(2))
+    assert open_store(path)[0].text == "v2 chunk 0"
+    # Only the link and the current version are left
+    assert sorted(os.listdir(tmp_path)) == sorted(["repo.store", os.path.basename(os.path.realpath(path))])
+    # A store opened before the rewrite keeps reading its own version
+    assert old_store[0].text == "v1 chunk 0"
+
+def test_legacy_directory_is_replaced(tmp_path):
+    path = str(tmp_path / "repo.store")
+    ChunkStore.write(path, *make_documents(1))
+    # Stores written before versioning are plain directories
+    version_path = os.path.realpath(path)
+    os.remove(path)
+    os.rename(version_path, path)
+    ChunkStore.write(path, *make_documents(2))
+    assert os.path.islink(path)
+    assert open_store(path)[0].text == "v2 chunk 0"
+
+def test_readers_never_see_a_missing_or_mixed_store(tmp_path):
+    """A store rewritten while other threads open it is always complete and of one version."""
+    path = str(tmp_path / "repo.store")
+    ChunkStore.write(path, *make_documents(0))
+    stop = threading.Event()
+    failures = []
+
+    def read():
+        while not stop.is_set():
+            store = open_store(path)
+            if store is None:
+                failures.append("missing")
+                continue
+            version = store.get_vectors(0)[0]
+            if any(store.text(j) != f"v{int(version)} chunk {j}" for j in range(len(store))):
+                failures.append("mixed")
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for version in range(1, 30):
+            ChunkStore.write(path, *make_documents(version))
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join(timeout=10)
+    assert failures == []
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,28 @@
+from api.file_filters import get_file_filter
+
+def test_suffix_patterns():
+    """Both "*.ext" suffixes and "*" patterns whose tail does not start at a "." match."""
+    file_filter = get_file_filter(excluded_files=["*.min.js", "*.pyc", "*_test.go", "*-lock.json", "*~"])
+    assert file_filter.excludes_file("app.min.js", "static/app.min.js")
+    assert file_filter.excludes_file("mod.cpython-312.pyc", "pkg/mod.cpython-312.pyc")
+    assert file_filter.excludes_file("foo_test.go", "cmd/foo_test.go")
+    assert file_filter.excludes_file("package-lock.json", "package-lock.json")
+    assert file_filter.excludes_file("notes.txt~", "notes.txt~")
+    assert not file_filter.excludes_file("app.js", "static/app.js")
+    assert not file_filter.excludes_file("foo.go", "cmd/foo.go")
+    assert not file_filter.excludes_file("package.json", "package.json")
+
+def test_names_and_paths():
+    file_filter = get_file_filter(excluded_dirs=["./node_modules/", "packages/*/dist"],
+                                  excluded_files=["yarn.lock", "test_*.py"])
+    assert file_filter.excludes_path("web/node_modules/react/index.js")
+    assert file_filter.excludes_path("packages/ui/dist/index.js")
+    assert not file_filter.excludes_path("packages/ui/src/index.js")
+    assert file_filter.excludes_path("yarn.lock")
+    assert file_filter.excludes_path("tests/test_rag.py")
+    assert not file_filter.excludes_path("api/rag.py")
+
+if __name__ == "__main__":
+    test_suffix_patterns()
+    test_names_and_paths()
+    print("ok")
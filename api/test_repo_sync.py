@@ -0,0 +1,127 @@
+import os
+import shutil
+
+import pytest
+
+from api.repo_sync import (SYNC_MARKER, clone_repo, fetch_and_reset, get_changed_paths, get_changed_since, get_head,
+                           run_git)
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+def git(*args, cwd=None):
+    return run_git(["-c", "user.name=test", "-c", "user.email=test@example.com", *args], cwd=cwd).strip()
+
+def commit(work, files, message):
+    for path, text in files.items():
+        full_path = os.path.join(work, path)
+        if text is None:
+            os.remove(full_path)
+            continue
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(text)
+    git("add", "-A", cwd=work)
+    git("commit", "-q", "-m", message, cwd=work)
+    git("push", "-q", "origin", "HEAD:main", cwd=work)
+    return git("rev-parse", "HEAD", cwd=work)
+
+@pytest.fixture
+def remote(tmp_path):
+    """A local bare repository with one commit on main, and a working copy to push from."""
+    bare = tmp_path / "remote.git"
+    work = tmp_path / "work"
+    git("init", "-q", "--bare", "-b", "main", str(bare))
+    git("clone", "-q", f"file://{bare}", str(work))
+    git("checkout", "-q", "-b", "main", cwd=str(work))
+    commit(str(work), {"README.md": "hello\n", "src/a.py": "a = 1\n", "src/b.py": "b = 1\n"}, "initial")
+    return f"file://{bare}", str(work)
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+def test_clone_fetch_diff_and_reset(remote, tmp_path):
+    url, work = remote
+    local = str(tmp_path / "clone")
+    clone_repo(url, local)
+    assert read(os.path.join(local, "src", "a.py")) == "a = 1\n"
+    assert os.path.exists(os.path.join(local, ".git", SYNC_MARKER))
+    first = get_head(local)
+
+    # Nothing was pushed: the fetch is a no-op
+    assert fetch_and_reset(url, local) == []
+
+    second = commit(work, {"src/a.py": "a = 2\n", "src/b.py": None, "docs/c.md": "c\n"}, "change")
+    changed = fetch_and_reset(url, local)
+    assert sorted(changed) == ["docs/c.md", "src/a.py", "src/b.py"]
+    assert get_head(local) == second
+    assert read(os.path.join(local, "src", "a.py")) == "a = 2\n"
+    assert not os.path.exists(os.path.join(local, "src", "b.py"))
+    assert sorted(get_changed_paths(local, first, second)) == sorted(changed)
+
+    # Local edits are discarded by the reset to the fetched commit
+    third = commit(work, {"README.md": "hello again\n"}, "readme")
+    with open(os.path.join(local, "src", "a.py"), "w") as f:
+        f.write("edited locally\n")
+    assert fetch_and_reset(url, local) == ["README.md"]
+    assert get_head(local) == third
+    assert read(os.path.join(local, "src", "a.py")) == "a = 2\n"
+
+def test_clone_and_reset_to_a_ref(remote, tmp_path):
+    url, work = remote
+    first = git("rev-parse", "HEAD", cwd=work)
+    git("push", "-q", "origin", "HEAD:release", cwd=work)
+    commit(work, {"src/a.py": "a = 2\n"}, "change")
+
+    release = str(tmp_path / "release")
+    clone_repo(url, release, ref="release")
+    assert get_head(release) == first
+    assert read(os.path.join(release, "src", "a.py")) == "a = 1\n"
+
+    pinned = str(tmp_path / "pinned")
+    clone_repo(url, pinned, ref=first)
+    assert get_head(pinned) == first
+
+def test_diff_of_unknown_commit_is_unavailable(remote, tmp_path):
+    url, _ = remote
+    local = str(tmp_path / "clone")
+    clone_repo(url, local)
+    assert get_changed_paths(local, "0" * 40, get_head(local)) is None
+
+def test_changes_since_the_indexed_commit(remote, tmp_path):
+    """Databases sharing a clone diff from their own indexed commit, not the clone's last refresh."""
+    url, work = remote
+    local = str(tmp_path / "clone")
+    clone_repo(url, local)
+    indexed = get_head(local)
+    assert get_changed_since(local, indexed) == []
+    assert get_changed_since(local, None) is None
+
+    commit(work, {"src/a.py": "a = 2\n"}, "first change")
+    fetch_and_reset(url, local)
+    # Another database built from the clone now; a second refresh must not hide the first change
+    commit(work, {"src/b.py": "b = 2\n"}, "second change")
+    assert fetch_and_reset(url, local) == ["src/b.py"]
+    assert sorted(get_changed_since(local, indexed)) == ["src/a.py", "src/b.py"]
+    assert get_changed_since(local, "0" * 40) is None
+
+def test_storage_is_keyed_by_host_owner_ref_and_filters():
+    # Importing the pipeline loads the tokenizer
+    from api.data_pipeline import get_database_path, get_repo_name
+
+    assert get_repo_name("https://github.com/owner/deepwiki.git") == "github.com_owner_deepwiki"
+    assert get_repo_name("https://github.com/owner/deepwiki", "feature/x") == "github.com_owner_deepwiki@feature~x"
+    assert get_repo_name("https://token@gitlab.com/group/sub/repo") == "gitlab.com_group_sub_repo"
+    assert get_repo_name("https://github.com/a/repo") != get_repo_name("https://github.com/b/repo")
+    assert get_repo_name("/tmp/some/repo") == "repo"
+
+    url = "https://github.com/owner/deepwiki"
+    plain = get_database_path(url)
+    assert os.path.basename(plain) == "github.com_owner_deepwiki.store"
+    filtered = get_database_path(url, excluded_dirs=["docs"])
+    assert filtered != plain
+    assert filtered == get_database_path(url, excluded_dirs=["docs", "docs"])
+    assert get_database_path(url, "main") != plain
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,161 @@
+import os
+import time
+import uuid
+import threading
+
+import pytest
+
+from api.index_progress import IndexCancelled, IndexProgress, report_progress, track_progress
+from api.single_flight import SingleFlight, file_lock, get_lock_path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+def run_threads(target, count):
+    results = [None] * count
+    errors = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target()
+        except BaseException as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+        assert not thread.is_alive(), "thread did not finish"
+    return results, errors
+
+def test_concurrent_callers_run_once():
+    """Callers with the same key share one run of the build and its result."""
+    flight = SingleFlight()
+    runs = []
+    barrier = threading.Barrier(8)
+
+    def build():
+        runs.append(1)
+        time.sleep(0.2)
+        return object()
+
+    def call():
+        barrier.wait()
+        return flight.do("repo", build)
+
+    results, errors = run_threads(call, 8)
+    assert errors == [None] * 8
+    assert len(runs) == 1
+    assert all(result is results[0] for result in results)
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    keys = iter(range(4))
+    keys_lock = threading.Lock()
+    runs = []
+
+    def call():
+        with keys_lock:
+            key = next(keys)
+        return flight.do(key, lambda: runs.append(key) or time.sleep(0.2) or key)
+
+    start = time.monotonic()
+    results, errors = run_threads(call, 4)
+    assert errors == [None] * 4
+    assert sorted(results) == sorted(runs) == [0, 1, 2, 3]
+    # Builds of different keys overlap rather than queueing behind each other
+    assert time.monotonic() - start < 0.6
+
+def test_followers_receive_the_leader_exception():
+    flight = SingleFlight()
+    started = threading.Event()
+    error = ValueError("build failed")
+
+    def build():
+        started.set()
+        time.sleep(0.3)
+        raise error
+
+    leader = threading.Thread(target=lambda: pytest.raises(ValueError, flight.do, "repo", build))
+    leader.start()
+    assert started.wait(5)
+    runs = []
+    _, errors = run_threads(lambda: flight.do("repo", lambda: runs.append(1)), 4)
+    leader.join(timeout=10)
+    assert runs == []
+    assert all(e is error for e in errors)
+    # A failed key is not remembered: the next call runs again
+    assert flight.do("repo", lambda: "rebuilt") == "rebuilt"
+
+def test_file_lock_excludes_threads():
+    name = f"test-{uuid.uuid4().hex}"
+    inside = []
+    overlaps = []
+
+    def work():
+        for _ in range(5):
+            with file_lock(name):
+                inside.append(1)
+                overlaps.append(len(inside))
+                time.sleep(0.005)
+                inside.pop()
+
+    _, errors = run_threads(work, 4)
+    assert errors == [None] * 4
+    assert max(overlaps) == 1
+    os.remove(get_lock_path(name))
+
+@pytest.mark.skipif(fcntl is None, reason="flock is not available")
+def test_file_lock_holds_flock():
+    """Other processes are kept out by the flock, seen here through a second open file description."""
+    name = f"test-{uuid.uuid4().hex}"
+    with file_lock(name):
+        with open(get_lock_path(name), "a") as f:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    with open(get_lock_path(name), "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    os.remove(get_lock_path(name))
+
+def test_file_lock_released_when_job_is_cancelled():
+    name = f"test-{uuid.uuid4().hex}"
+    progress = IndexProgress()
+    holding = threading.Event()
+    raised = []
+
+    def job():
+        with track_progress(progress):
+            try:
+                with file_lock(name):
+                    holding.set()
+                    while True:
+                        report_progress("files_read")
+                        time.sleep(0.01)
+            except IndexCancelled as e:
+                raised.append(e)
+
+    thread = threading.Thread(target=job)
+    thread.start()
+    assert holding.wait(5)
+    progress.cancel_event.set()
+    thread.join(timeout=5)
+    assert raised
+
+    acquired = threading.Event()
+
+    def next_job():
+        with file_lock(name):
+            acquired.set()
+
+    other = threading.Thread(target=next_job)
+    other.start()
+    other.join(timeout=5)
+    assert acquired.is_set(), "lock was not released after cancellation"
+    os.remove(get_lock_path(name))
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import tiktoken
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model whose tokenizer is used when none is specified
+DEFAULT_TOKENIZER_MODEL = "text-embedding-3-small"
+
+# Threads used by tiktoken for batched encoding
+DEFAULT_NUM_THREADS = 8
+
+# Number of token counts remembered by content hash
+TOKEN_COUNT_MEMO_SIZE = 4096
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_TOKENIZER_MODEL) -> tiktoken.Encoding:
+    """
+    Resolve the tiktoken encoding for a model once and reuse it afterwards.
+
+    Args:
+        model (str): The model name, e.g. "text-embedding-3-small" or "gpt-4o".
+
+    Returns:
+        tiktoken.Encoding: The encoding used by the model, or cl100k_base for unknown models.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logger.warning(f"No tiktoken encoding registered for {model}, using cl100k_base")
+        return tiktoken.get_encoding("cl100k_base")
+
+class TokenCountMemo:
+    """
+    Thread-safe LRU memo of token counts keyed by model and content hash.
+
+    Only digests and integers are stored, so memory use does not depend on the
+    length of the remembered strings.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_COUNT_MEMO_SIZE):
+        self.maxsize = maxsize
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, model: str) -> tuple:
+        return model, hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def get(self, key: tuple) -> Optional[int]:
+        with self._lock:
+            count = self._counts.get(key)
+            if count is None:
+                self.misses += 1
+                return None
+            self._counts.move_to_end(key)
+            self.hits += 1
+            return count
+
+    def put(self, key: tuple, count: int) -> None:
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.maxsize:
+                self._counts.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self.hits = 0
+            self.misses = 0
+
+_memo = TokenCountMemo()
+
+def count_tokens(text: str, model: str = DEFAULT_TOKENIZER_MODEL, memoize: bool = True) -> int:
+    """
+    Count the number of tokens in a text string using tiktoken.
+
+    Args:
+        text (str): The text to count tokens for.
+        model (str): The model whose tokenizer should be used.
+        memoize (bool): Whether to look up and remember the count by content hash.
+            Disable it for one-off texts such as file contents during ingestion.
+
+    Returns:
+        int: The number of tokens in the text.
+    """
+    return count_tokens_many([text], model=model, num_threads=1, memoize=memoize)[0]
+
+def count_tokens_many(texts: Sequence[str], model: str = DEFAULT_TOKENIZER_MODEL,
+                      num_threads: int = DEFAULT_NUM_THREADS, memoize: bool = True) -> List[int]:
+    """
+    Count tokens for many texts with one batched, multi-threaded tiktoken call.
+
+    Args:
+        texts (Sequence[str]): The texts to count tokens for.
+        model (str): The model whose tokenizer should be used.
+        num_threads (int): Number of tiktoken threads for the batch.
+        memoize (bool): Whether to look up and remember counts by content hash.
+
+    Returns:
+        List[int]: The token count of each text, in input order.
+    """
+    counts: List[Optional[int]] = [None] * len(texts)
+    keys = [TokenCountMemo.key(text, model) for text in texts] if memoize else None
+
+    pending = []
+    for i, text in enumerate(texts):
+        if memoize:
+            counts[i] = _memo.get(keys[i])
+        if counts[i] is None:
+            pending.append(i)
+
+    if pending:
+        try:
+            encoding = get_encoding(model)
+            encoded = encoding.encode_ordinary_batch([texts[i] for i in pending], num_threads=num_threads)
+            pending_counts = [len(tokens) for tokens in encoded]
+        except Exception as e:
+            # Fallback to a simple approximation if tiktoken fails
+            logger.warning(f"Error counting tokens with tiktoken: {e}")
+            # Rough approximation: 4 characters per token
+            pending_counts = [len(texts[i]) // 4 for i in pending]
+
+        for i, count in zip(pending, pending_counts):
+            counts[i] = count
+            if memoize:
+                _memo.put(keys[i], count)
+
+    return counts
+
+def get_memo_stats() -> dict:
+    """Return hit/miss statistics of the token count memo."""
+    return {"size": len(_memo), "hits": _memo.hits, "misses": _memo.misses}
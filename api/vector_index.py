@@ -0,0 +1,337 @@
+import os
+import logging
+from typing import Any, List, Optional
+
+import faiss
+import numpy as np
+from adalflow.components.retriever.faiss_retriever import FAISSRetriever
+from adalflow.core.embedder import Embedder
+from adalflow.core.types import Document, RetrieverOutput
+
+from api.chunk_store import document_vectors
+from api.config import configs
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Zero-copy mapping of flat indexes needs faiss >= 1.8, older versions only map inverted lists
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+def get_index_path(db_path: str) -> str:
+    """
+    Get the FAISS index path stored next to a database file.
+
+    Args:
+        db_path (str): The path of the database, e.g. ~/.adalflow/databases/{repo}.store
+
+    Returns:
+        str: The index path, e.g. ~/.adalflow/databases/{repo}.faiss
+    """
+    return f"{os.path.splitext(db_path)[0]}.faiss"
+
+def get_index_config() -> dict:
+    """Get the index settings, `vector_index` in embedder.json."""
+    return configs.get("vector_index", {})
+
+def choose_index_type(num_vectors: int, index_config: Optional[dict] = None) -> str:
+    """
+    Choose the index type for a number of chunks.
+
+    Exact flat search is used up to `flat_max_chunks`, HNSW up to `hnsw_max_chunks`
+    and IVF-PQ beyond, where HNSW graphs take too long to build and too much memory.
+    A `type` other than "auto" forces one type.
+
+    Args:
+        num_vectors (int): Number of chunks to index.
+        index_config (dict, optional): The index settings; defaults to `get_index_config()`.
+
+    Returns:
+        str: "flat", "hnsw" or "ivf_pq".
+    """
+    index_config = get_index_config() if index_config is None else index_config
+    index_type = index_config.get("type", "auto")
+    if index_type != "auto":
+        return index_type
+    if num_vectors <= index_config.get("flat_max_chunks", 100000):
+        return "flat"
+    if num_vectors <= index_config.get("hnsw_max_chunks", 1000000):
+        return "hnsw"
+    return "ivf_pq"
+
+def _pq_subquantizers(dimensions: int, requested: int) -> int:
+    """The largest number of PQ sub-vectors up to `requested` that divides the dimensions."""
+    return next(m for m in range(min(requested, dimensions), 0, -1) if dimensions % m == 0)
+
+def _build_ivf_pq(vectors: np.ndarray, metric_type: int, ivf_config: dict) -> faiss.Index:
+    num_vectors, dimensions = vectors.shape
+    # About 4 * sqrt(n) lists, with enough training points for each
+    nlist = ivf_config.get("nlist") or int(4 * np.sqrt(num_vectors))
+    nlist = max(1, min(nlist, num_vectors // 39))
+    pq_m = _pq_subquantizers(dimensions, ivf_config.get("pq_m", 32))
+    quantizer = faiss.IndexFlatIP(dimensions) if metric_type == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dimensions)
+    index = faiss.IndexIVFPQ(quantizer, dimensions, nlist, pq_m, ivf_config.get("pq_bits", 8), metric_type)
+    train_size = min(num_vectors, max(ivf_config.get("train_size", 100000), nlist * 39))
+    sample = vectors[np.random.default_rng(0).choice(num_vectors, train_size, replace=False)]
+    index.train(sample)
+    index.add(vectors)
+    return index
+
+def build_index(documents: List[Document], metric: str = "prob", index_type: Optional[str] = None) -> faiss.Index:
+    """
+    Build the index of document vectors.
+
+    Small corpora get the same exact flat index `FAISSRetriever` builds; larger ones an
+    approximate HNSW or IVF-PQ index, see `choose_index_type`. "sq8" is a flat index of
+    vectors quantized to 8 bits per dimension, searched without decoding them.
+
+    Args:
+        documents (List[Document]): Embedded chunks, in database order.
+        metric (str): "prob" or "cosine" for inner product on normalized vectors, "euclidean" for L2.
+        index_type (str, optional): "flat", "sq8", "hnsw" or "ivf_pq"; chosen by size if not given.
+
+    Returns:
+        faiss.Index: The index; position i holds the vector of documents[i].
+    """
+    vectors = document_vectors(documents)
+    if metric == "euclidean":
+        metric_type = faiss.METRIC_L2
+    else:
+        faiss.normalize_L2(vectors)
+        metric_type = faiss.METRIC_INNER_PRODUCT
+
+    index_config = get_index_config()
+    index_type = index_type or choose_index_type(len(vectors), index_config)
+    if index_type == "ivf_pq":
+        # Every PQ centroid needs about 39 training points; fewer vectors cannot train the codebooks
+        min_vectors = 2 ** index_config.get("ivf_pq", {}).get("pq_bits", 8) * 39
+        if len(vectors) < min_vectors:
+            index_type = "flat" if len(vectors) <= index_config.get("flat_max_chunks", 100000) else "hnsw"
+            logger.warning(f"IVF-PQ needs at least {min_vectors} vectors to train, "
+                           f"using a {index_type} index for {len(vectors)} chunks")
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(vectors.shape[1]) if metric_type == faiss.METRIC_L2 else faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+    elif index_type == "hnsw":
+        hnsw_config = index_config.get("hnsw", {})
+        index = faiss.IndexHNSWFlat(vectors.shape[1], hnsw_config.get("M", 32), metric_type)
+        index.hnsw.efConstruction = hnsw_config.get("ef_construction", 200)
+        index.add(vectors)
+    elif index_type == "sq8":
+        # Per-dimension ranges are learned from the vectors themselves
+        index = faiss.IndexScalarQuantizer(vectors.shape[1], faiss.ScalarQuantizer.QT_8bit, metric_type)
+        index.train(vectors)
+        index.add(vectors)
+    elif index_type == "ivf_pq":
+        index = _build_ivf_pq(vectors, metric_type, index_config.get("ivf_pq", {}))
+    else:
+        raise ValueError(f"Unsupported index type: {index_type}")
+    configure_search(index, index_config)
+    return index
+
+def configure_search(index: faiss.Index, index_config: Optional[dict] = None) -> None:
+    """
+    Apply the search settings of `vector_index` in embedder.json to an approximate index.
+
+    The settings are not fixed at build time, so changing `nprobe` or `ef_search` takes
+    effect the next time an index is opened.
+
+    Args:
+        index (faiss.Index): The index; flat indexes are left unchanged.
+        index_config (dict, optional): The index settings; defaults to `get_index_config()`.
+    """
+    index_config = get_index_config() if index_config is None else index_config
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = index_config.get("hnsw", {}).get("ef_search", 128)
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(index.nlist, index_config.get("ivf_pq", {}).get("nprobe", 32))
+
+def is_quantized(index: faiss.Index) -> bool:
+    """Whether an index holds lossy codes instead of the vectors, so its scores are approximate."""
+    return isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ, faiss.IndexScalarQuantizer,
+                              faiss.IndexIVFScalarQuantizer))
+
+def _filter_parameters(index: faiss.Index, selector: faiss.IDSelector, fraction: float) -> faiss.SearchParameters:
+    """
+    Search parameters that restrict a search to selected ids.
+
+    Graph and inverted-list searches only keep selected results, so they look further the
+    smaller the selected `fraction` of the index is: `efSearch` or `nprobe` grow with its
+    inverse square root, up to 8 times the configured value.
+    """
+    widen = min(8.0, 1.0 / np.sqrt(max(fraction, 1e-6)))
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(index.hnsw.efSearch * widen))
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(index.nlist, int(index.nprobe * widen)))
+    return faiss.SearchParameters(sel=selector)
+
+def save_index(documents: List[Document], index_path: str, metric: str = "prob") -> None:
+    """
+    Build the index of a database and write it next to the database.
+
+    The file is written under a temporary name and renamed, so readers never see
+    a partial index.
+
+    Args:
+        documents (List[Document]): Embedded chunks, in database order.
+        index_path (str): The index path, see `get_index_path`.
+        metric (str): The retriever metric.
+    """
+    if not documents:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        return
+    index = build_index(documents, metric)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+    logger.info(f"Saved {type(index).__name__} with {index.ntotal} vectors to {index_path}")
+
+def load_index(index_path: str, expected_size: Optional[int] = None) -> Optional[faiss.Index]:
+    """
+    Open a saved index memory-mapped and read-only.
+
+    Args:
+        index_path (str): The index path, see `get_index_path`.
+        expected_size (int, optional): The number of chunks in the database; an index of
+            any other size is stale and ignored.
+
+    Returns:
+        Optional[faiss.Index]: The index, or None if it is missing, unreadable or stale.
+    """
+    if not os.path.exists(index_path):
+        return None
+    try:
+        index = faiss.read_index(index_path, _MMAP_FLAGS)
+    except RuntimeError as e:
+        logger.error(f"Error reading FAISS index {index_path}: {e}")
+        return None
+    if expected_size is not None and index.ntotal != expected_size:
+        logger.warning(f"Ignoring stale FAISS index {index_path}: {index.ntotal} vectors, expected {expected_size}")
+        return None
+    configure_search(index)
+    return index
+
+class PrebuiltFAISSRetriever(FAISSRetriever):
+    """
+    `FAISSRetriever` over an index that was built at indexing time, e.g. one
+    returned by `load_index`, instead of one rebuilt from document vectors.
+
+    Quantized indexes can re-score their results: `rescore_factor` times `top_k`
+    candidates are taken from the index and ranked again by their full vectors, read
+    from the memory-mapped chunk store.
+
+    Searches can be restricted to `allowed` chunk positions. Up to `filter_exact_max_chunks`
+    of them are ranked exactly from the chunk store without touching the index; larger
+    sets are passed to FAISS as a bitmap, so excluded vectors are never scored.
+
+    Args:
+        index (faiss.Index): The index; position i must hold the vector of documents[i].
+        embedder (Embedder, optional): Embeds string queries.
+        top_k (int): Number of chunks to retrieve.
+        documents (Any, optional): The indexed documents; a `ChunkStore` provides vectors for re-scoring.
+        metric (str): The metric the index was built for.
+        rescore_factor (int): Candidates per result to re-score, or 0 to keep the index scores.
+        filter_exact_max_chunks (int): Largest filtered subset searched exactly from the chunk store.
+    """
+
+    def __init__(self, index: faiss.Index, embedder: Optional[Embedder] = None, top_k: int = 5,
+                 documents: Optional[Any] = None, metric: str = "prob", rescore_factor: int = 0,
+                 filter_exact_max_chunks: int = 0, **kwargs):
+        super().__init__(embedder=embedder, top_k=top_k, metric=metric, **kwargs)
+        self.index = index
+        self.dimensions = index.d
+        self.total_documents = index.ntotal
+        self.documents = documents
+        self.indexed = True
+        has_vectors = hasattr(documents, "get_vectors")
+        self.rescore_factor = rescore_factor if is_quantized(index) and has_vectors else 0
+        self.filter_exact_max_chunks = filter_exact_max_chunks if has_vectors else 0
+        # The last allowed chunks and their bitmap; a repeated filter passes the same array
+        self._allowed_bitmap = None
+
+    def _rescore(self, query: np.ndarray, candidates: np.ndarray, top_k: int) -> RetrieverOutput:
+        """Rank candidate chunks of one query by their full vectors."""
+        candidates = candidates[candidates >= 0]
+        vectors = self.documents.get_vectors(candidates)
+        squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+        if self.metric == "euclidean":
+            scores = 2 * (vectors @ query) - squared_norms - query @ query
+        else:
+            scores = (vectors @ query) / np.maximum(np.sqrt(squared_norms), 1e-12) / max(np.linalg.norm(query), 1e-12)
+        if len(scores) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            best = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            best = np.argsort(-scores, kind="stable")
+        scores = scores[best]
+        if self.metric == "euclidean":
+            scores = -scores
+        elif self.metric == "prob":
+            scores = self._convert_cosine_similarity_to_probability(scores)
+        return RetrieverOutput(doc_indices=candidates[best].tolist(), doc_scores=scores.tolist())
+
+    def _bitmap(self, allowed: np.ndarray) -> np.ndarray:
+        """The allowed chunks as a bitmap over the index ids, for `faiss.IDSelectorBitmap`."""
+        cached = self._allowed_bitmap
+        if cached is not None and cached[0] is allowed:
+            return cached[1]
+        mask = np.zeros(self.index.ntotal, dtype=bool)
+        mask[allowed] = True
+        bitmap = np.packbits(mask, bitorder="little")
+        self._allowed_bitmap = (allowed, bitmap)
+        return bitmap
+
+    def retrieve_embedding_queries(self, input, top_k: Optional[int] = None,
+                                   allowed: Optional[np.ndarray] = None) -> List[RetrieverOutput]:
+        """
+        Retrieve the top k chunks of each query vector, best first.
+
+        Args:
+            allowed (np.ndarray, optional): Sorted positions of the chunks that may be
+                returned, e.g. from `FilterIndex.allowed_chunks`; all chunks if None.
+        """
+        if allowed is None and not self.rescore_factor:
+            return super().retrieve_embedding_queries(input, top_k)
+        xq = np.atleast_2d(np.asarray(input, dtype=np.float32))
+        top_k = top_k or self.top_k
+        if allowed is not None and len(allowed) <= self.filter_exact_max_chunks:
+            return [self._rescore(query, allowed, top_k) for query in xq]
+
+        params = None
+        if allowed is not None:
+            # The selector reads the bitmap in place, so both must outlive the search
+            bitmap = self._bitmap(allowed)
+            selector = faiss.IDSelectorBitmap(self.index.ntotal, faiss.swig_ptr(bitmap))
+            params = _filter_parameters(self.index, selector, len(allowed) / max(self.index.ntotal, 1))
+        if self.rescore_factor:
+            _, candidates = self.index.search(xq, top_k * self.rescore_factor, params=params)
+            return [self._rescore(query, row, top_k) for query, row in zip(xq, candidates)]
+
+        distances, indices = self.index.search(xq, top_k, params=params)
+        if self.metric == "prob":
+            distances = self._convert_cosine_similarity_to_probability(distances)
+        # Restrictive filters can leave fewer than top_k results, padded with -1
+        return [RetrieverOutput(doc_indices=row_indices[row_indices >= 0].tolist(),
+                                doc_scores=row_scores[row_indices >= 0].tolist())
+                for row_indices, row_scores in zip(indices, distances)]
+
+    def retrieve_string_queries(self, input, top_k: Optional[int] = None,
+                                allowed: Optional[np.ndarray] = None) -> List[RetrieverOutput]:
+        if allowed is None and not self.rescore_factor:
+            return super().retrieve_string_queries(input, top_k)
+        queries = [input] if isinstance(input, str) else list(input)
+        outputs = [RetrieverOutput(doc_indices=[], doc_scores=[], query=query) for query in queries]
+        valid = [i for i, query in enumerate(queries) if query]
+        if valid:
+            embeddings = self.embedder([queries[i] for i in valid])
+            results = self.retrieve_embedding_queries([data.embedding for data in embeddings.data], top_k, allowed)
+            for i, result in zip(valid, results):
+                outputs[i].doc_indices = result.doc_indices
+                outputs[i].doc_scores = result.doc_scores
+        return outputs
+
+    def call(self, input, top_k: Optional[int] = None, allowed: Optional[np.ndarray] = None) -> List[RetrieverOutput]:
+        if isinstance(input, str) or (isinstance(input, (list, tuple)) and input and isinstance(input[0], str)):
+            return self.retrieve_string_queries(input, top_k, allowed)
+        return self.retrieve_embedding_queries(input, top_k, allowed)